@@ -0,0 +1,1366 @@
+"""
+Benchmarks do Power Paste que rodam fora do macOS (backends falsos).
+
+Uso:
+    python3 benchmark.py watcher
+    python3 benchmark.py search --items 100000
+    python3 benchmark.py menu --visible 100
+    python3 benchmark.py writer --adds 1000
+    python3 benchmark.py thumbnails --images 50   (requer Pillow)
+    python3 benchmark.py hash
+    python3 benchmark.py format --items 10000
+    python3 benchmark.py fuzzy --items 50000
+    python3 benchmark.py startup --items 5000
+    python3 benchmark.py workloads --output resultados.json
+    python3 benchmark.py stats
+    python3 benchmark.py ipc --clients 32
+    python3 benchmark.py retention
+    python3 benchmark.py neardup --items 10000
+    python3 benchmark.py imagedup --images 20   (requer Pillow)
+    python3 benchmark.py sections --items 5000
+    python3 benchmark.py display --visible 100
+    python3 benchmark.py polling --hours 8
+    python3 benchmark.py helper --calls 500
+"""
+import argparse
+import contextlib
+import hashlib
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from clipboard_engine import ClipboardEngine
+from command_helper import HelperRunner, SubprocessRunner, default_command
+from content_hash import content_hash
+from fuzzy_index import TrigramIndex
+from history_codec import decode_history, encode_history
+from history_model import History
+from history_sqlite import SQLiteHistoryStore
+from history_store import HistoryJournal, HistoryWriter
+from image_ingest import ImageIngest
+from image_store import ImageStore
+from instrumentation import Stats
+from ipc_client import IPCClient
+from ipc_server import HistoryRequests, IPCServer
+from near_duplicates import NearDuplicateIndex, hamming
+from perceptual_hash import ImageDuplicateIndex, dhash
+from poll_scheduler import AdaptivePoller
+from retention import RetentionPolicy
+from text_blobs import TextBlobStore
+from thumbnails import MemoryLRU, ThumbnailCache
+from menu_model import (FakeMenu, FakeMenuItem, FakeSubmenuItem, HistoryMenu, HistorySections,
+                        display_record, display_time, fake_item_factory, history_entries,
+                        split_history, text_preview)
+from pasteboard import ClipboardWatcher, FakePasteboard
+
+WORDS = ("python", "clipboard", "menu", "imagem", "texto", "histórico", "função", "config",
+         "rumps", "pasteboard", "journal", "sqlite", "busca", "commit", "deploy", "teste",
+         "erro", "janela", "arquivo", "script", "usuário", "servidor", "request", "token")
+
+
+def synthetic_text(rng, words=12):
+    """Gera um texto aleatório a partir de um vocabulário fixo."""
+    return ' '.join(rng.choice(WORDS) + str(rng.randrange(1000)) for _ in range(words))
+
+
+def synthetic_item(rng, i):
+    return {
+        "type": "text",
+        "content": synthetic_text(rng),
+        "timestamp": "2025-05-01 12:00:00",
+        "hash": f"{i:032x}"
+    }
+
+
+def bench_watcher(args):
+    """Mede o custo de um tick ocioso e de um tick com mudança."""
+    pb = FakePasteboard()
+    pb.set_text("texto inicial para o benchmark")
+    watcher = ClipboardWatcher(pb)
+    watcher.poll()
+
+    # Ticks sem mudança: só o changeCount deve ser lido
+    start = time.perf_counter()
+    for _ in range(args.ticks):
+        watcher.poll()
+    idle = (time.perf_counter() - start) / args.ticks
+
+    idle_calls = dict(pb.calls)
+
+    # Ticks com mudança a cada chamada
+    start = time.perf_counter()
+    for i in range(args.ticks):
+        pb.set_text(f"texto {i}")
+        watcher.poll()
+    busy = (time.perf_counter() - start) / args.ticks
+
+    print(f"tick ocioso:     {idle * 1e6:8.2f} us")
+    print(f"tick com mudança: {busy * 1e6:8.2f} us")
+    print(f"chamadas após {args.ticks} ticks ociosos: {idle_calls}")
+    print(f"processos pbpaste evitados: {args.ticks * 2 - idle_calls['png_fallback'] - idle_calls['tiff']}")
+
+
+def bench_search(args):
+    """Mede inserções e buscas FTS5 no backend SQLite."""
+    rng = random.Random(42)
+    workdir = tempfile.mkdtemp(prefix="power_paste_bench_")
+    try:
+        store = SQLiteHistoryStore(os.path.join(workdir, "history.db"))
+        store.rewrite([synthetic_item(rng, i) for i in range(args.items)])
+
+        # Inserções individuais, como no tick do check_clipboard
+        start = time.perf_counter()
+        for i in range(args.inserts):
+            store.append(synthetic_item(rng, args.items + i))
+        insert = (time.perf_counter() - start) / args.inserts
+
+        print(f"itens: {args.items}")
+        print(f"inserção: {insert * 1e3:8.3f} ms")
+
+        # Buscas típicas (palavra + início do número) e amplas (só prefixo)
+        for label, make_query in (
+                ("típica", lambda: f"{rng.choice(WORDS)}{rng.randrange(100)}"),
+                ("ampla", lambda: rng.choice(WORDS)[:4])):
+            timings = []
+            for _ in range(args.queries):
+                query = make_query()
+                start = time.perf_counter()
+                store.search(query)
+                timings.append(time.perf_counter() - start)
+            timings.sort()
+            print(f"busca {label} p50: {timings[len(timings) // 2] * 1e3:8.3f} ms")
+            print(f"busca {label} p99: {timings[int(len(timings) * 0.99)] * 1e3:8.3f} ms")
+        store.close()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def bench_menu(args):
+    """Compara operações de menu: reconstrução completa x diferença."""
+    rng = random.Random(42)
+    entries = [(f"{i:032x}", f"12:00 | {synthetic_text(rng, 4)}", None)
+               for i in range(args.visible)]
+    fixed = ("separator", "search", "clear", "about", "quit")
+
+    def full_rebuild(menu, entries):
+        menu.clear()
+        for item_hash, title, callback in entries:
+            menu.add(fake_item_factory(title, callback, item_hash))
+        for title in fixed:
+            menu.add(FakeMenuItem(title))
+
+    full_menu = FakeMenu()
+    diff_menu = FakeMenu()
+    model = HistoryMenu(diff_menu, fake_item_factory, "vazio")
+    model.build(entries)
+    for title in fixed:
+        diff_menu.add(FakeMenuItem(title))
+    full_rebuild(full_menu, entries)
+    full_menu.ops = dict.fromkeys(full_menu.ops, 0)
+    diff_menu.ops = dict.fromkeys(diff_menu.ops, 0)
+
+    next_id = args.visible
+    diff_time = 0.0
+    for copy in range(args.copies):
+        if copy % 4 == 3:
+            # Recópia de um item antigo: volta ao topo com outro horário
+            item_hash, title, callback = entries.pop(rng.randrange(1, len(entries)))
+            entries.insert(0, (item_hash, "12:01" + title[5:], callback))
+        else:
+            entries.insert(0, (f"{next_id:032x}", f"12:01 | {synthetic_text(rng, 4)}", None))
+            next_id += 1
+            entries = entries[:args.visible]
+        full_rebuild(full_menu, entries)
+        start = time.perf_counter()
+        model.update(entries)
+        diff_time += time.perf_counter() - start
+
+    print(f"itens visíveis: {args.visible}, cópias: {args.copies}")
+    print(f"reconstrução completa: {full_menu.total_ops / args.copies:8.1f} operações/cópia")
+    print(f"diferença:             {diff_menu.total_ops / args.copies:8.1f} operações/cópia {diff_menu.ops}")
+    print(f"tempo do diff:         {diff_time / args.copies * 1e6:8.1f} us/cópia")
+
+
+def bench_writer(args):
+    """Conta as gravações em disco de uma rajada de cópias com o HistoryWriter."""
+    rng = random.Random(42)
+    workdir = tempfile.mkdtemp(prefix="power_paste_bench_")
+    try:
+        journal = HistoryJournal(os.path.join(workdir, "history.log"))
+        writer = HistoryWriter(journal, debounce=args.debounce_ms / 1000.0)
+        history = History()
+
+        # Mesmo caminho do add_history_item: histórico em memória + fila de gravação
+        start = time.perf_counter()
+        for i in range(args.adds):
+            item = synthetic_item(rng, i)
+            item["timestamp"] = int(time.time())
+            history.add(item)
+            writer.append(item)
+        enqueue = time.perf_counter() - start
+        writer.close()
+
+        reloaded = HistoryJournal(journal.path).load()
+        print(f"cópias: {args.adds}, janela: {args.debounce_ms} ms")
+        print(f"tempo no chamador: {enqueue / args.adds * 1e6:8.2f} us/cópia")
+        print(f"gravações em disco: {journal.writes}")
+        print(f"itens recarregados: {len(reloaded)}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def bench_thumbnails(args):
+    """Compara montar o menu a partir das miniaturas x das imagens inteiras."""
+    from PIL import Image
+
+    workdir = tempfile.mkdtemp(prefix="power_paste_bench_")
+    try:
+        # Capturas de tela sintéticas (gradiente, compressão parecida com a real)
+        base = Image.linear_gradient('L').resize((args.width, args.height)).convert('RGBA')
+        paths = []
+        for i in range(args.images):
+            path = os.path.join(workdir, f"{i:032x}.png")
+            base.rotate(i % 4 * 90, expand=False).save(path, "PNG", compress_level=1)
+            paths.append(path)
+
+        cache = ThumbnailCache(os.path.join(workdir, "thumbnails"))
+        start = time.perf_counter()
+        for path in paths:
+            cache.generate(os.path.basename(path)[:-4], path)
+        generate = (time.perf_counter() - start) / args.images
+
+        def load_full(path):
+            with Image.open(path) as img:
+                img.load()
+                return img.size
+
+        def load_thumb(image_hash):
+            with Image.open(cache.get(image_hash)) as img:
+                img.load()
+                return img.size
+
+        start = time.perf_counter()
+        for path in paths:
+            load_full(path)
+        full = time.perf_counter() - start
+
+        memory = MemoryLRU(args.images * 2, load_thumb)
+        start = time.perf_counter()
+        for path in paths:
+            memory.get(os.path.basename(path)[:-4])
+        cold = time.perf_counter() - start
+        start = time.perf_counter()
+        for path in paths:
+            memory.get(os.path.basename(path)[:-4])
+        warm = time.perf_counter() - start
+
+        print(f"imagens: {args.images} de {args.width}x{args.height}")
+        print(f"geração da miniatura (no processamento): {generate * 1e3:8.2f} ms/imagem")
+        print(f"menu com imagens inteiras:    {full * 1e3:8.2f} ms")
+        print(f"menu com miniaturas (disco):  {cold * 1e3:8.2f} ms")
+        print(f"menu com miniaturas (memória): {warm * 1e3:8.2f} ms")
+        print(f"cache em disco: {cache.total_bytes} bytes")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def bench_hash(args):
+    """Compara algoritmos de hash e o custo da cópia do buffer por tamanho."""
+    algorithms = [
+        ("md5 (anterior)", lambda data: hashlib.md5(data).hexdigest()),
+        ("md5 + tobytes()", lambda data: hashlib.md5(data.tobytes()).hexdigest()),
+        ("sha1", lambda data: hashlib.sha1(data).hexdigest()),
+        ("sha256", lambda data: hashlib.sha256(data).hexdigest()),
+        ("blake2b-128 (atual)", content_hash),
+    ]
+    try:
+        import xxhash
+        algorithms.append(("xxh3-128", lambda data: xxhash.xxh3_128_hexdigest(data)))
+    except ImportError:
+        pass
+
+    for size in (1024, 64 * 1024, 1024 * 1024, 16 * 1024 * 1024):
+        # memoryview, como o buffer do NSData entregue pelo pasteboard
+        data = memoryview(os.urandom(size))
+        repeat = max(3, (64 * 1024 * 1024) // size)
+        print(f"payload {size // 1024} KiB:")
+        for name, func in algorithms:
+            start = time.perf_counter()
+            for _ in range(repeat):
+                func(data)
+            elapsed = (time.perf_counter() - start) / repeat
+            throughput = size / elapsed / (1024 * 1024)
+            print(f"  {name:22s} {elapsed * 1e6:10.1f} us  {throughput:8.0f} MiB/s")
+
+
+def bench_format(args):
+    """Compara tamanho e tempo de gravação/leitura dos formatos do histórico."""
+    rng = random.Random(42)
+    items = [synthetic_item(rng, i) for i in range(args.items)]
+    workdir = tempfile.mkdtemp(prefix="power_paste_bench_")
+
+    def legacy_save(path):
+        # save_history/load_history anteriores: JSON indentado
+        with open(path, 'w') as f:
+            json.dump(items, f, indent=2)
+
+    def legacy_load(path):
+        with open(path, 'r') as f:
+            return json.load(f)
+
+    def journal_save(path):
+        journal = HistoryJournal(path)
+        journal.rewrite(items)
+        journal.close()
+        return journal.snapshot_path
+
+    def journal_load(path):
+        return HistoryJournal(path).load()
+
+    def codec_format(codec):
+        def save(path):
+            with open(path, 'wb') as f:
+                f.write(encode_history(items, codec=codec))
+
+        def load(path):
+            with open(path, 'rb') as f:
+                return decode_history(f.read())
+        return save, load
+
+    formats = [
+        ("json indent=2 (anterior)", legacy_save, legacy_load),
+        ("json compacto", *codec_format("none")),
+        ("zlib", *codec_format("zlib")),
+        ("journal (snapshot zlib)", journal_save, journal_load),
+    ]
+    try:
+        import zstandard  # noqa: F401
+        formats.append(("zstd", *codec_format("zstd")))
+    except ImportError:
+        print("zstandard não instalado: zstd fora da comparação")
+
+    try:
+        print(f"{'formato':26s} {'tamanho':>10s} {'gravar':>10s} {'ler':>10s}")
+        for index, (name, save, load) in enumerate(formats):
+            path = os.path.join(workdir, f"history{index}.log")
+            start = time.perf_counter()
+            written = save(path) or path
+            save_time = time.perf_counter() - start
+            start = time.perf_counter()
+            loaded = load(path)
+            load_time = time.perf_counter() - start
+            assert len(loaded) == len(items)
+            size = sum(os.path.getsize(p) for p in {path, written} if os.path.exists(p))
+            print(f"{name:26s} {size / 1024:8.0f} KB {save_time * 1000:7.1f} ms {load_time * 1000:7.1f} ms")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def bench_fuzzy(args):
+    """Mede o índice de trigramas: montagem, consultas aproximadas e atualização."""
+    rng = random.Random(42)
+    texts = {}
+    for i in range(args.items):
+        texts[f"{i:032x}"] = synthetic_text(rng)
+
+    # Como no ClipboardEngine.load: montagem e bitsets comuns, em segundo plano
+    index = TrigramIndex()
+    start = time.perf_counter()
+    for item_hash, text in texts.items():
+        index.add(item_hash, text)
+    build = time.perf_counter() - start
+    start = time.perf_counter()
+    index.warm()
+    warm = time.perf_counter() - start
+    print(f"itens: {args.items}")
+    print(f"montagem do índice: {build:8.2f} s  (em segundo plano, fora do lock)")
+    print(f"bitsets comuns:     {warm:8.2f} s  ({len(index._bits)} trigramas)")
+    print(f"memória após montar: {_peak_rss_kb() / 1024:7.0f} MB (pico)")
+
+    # Trechos de itens reais, metade com um erro de digitação
+    hashes = list(texts)
+    queries = []
+    for _ in range(args.queries):
+        text = texts[rng.choice(hashes)]
+        begin = rng.randrange(len(text) - 12)
+        query = text[begin:begin + rng.randrange(4, 12)]
+        if len(query) > 5 and rng.random() < 0.5:
+            pos = rng.randrange(len(query))
+            query = query[:pos] + "x" + query[pos + 1:]
+        queries.append(query)
+
+    def measure(label, search):
+        timings = []
+        for query in queries:
+            start = time.perf_counter()
+            search(query)
+            timings.append(time.perf_counter() - start)
+        timings.sort()
+        print(f"{label} p50: {timings[len(timings) // 2] * 1e3:8.3f} ms"
+              f"  p99: {timings[int(len(timings) * 0.99)] * 1e3:8.3f} ms")
+
+    # Primeira passada: os trigramas raros ainda não têm bitset; na segunda já estão em cache
+    measure("consulta (fria)  ", index.query)
+    measure("consulta (quente)", index.query)
+    index._bits.clear()
+    measure("fria, sem warm() ", index.query)
+    lowered = [text.lower() for text in texts.values()]
+    measure("varredura linear ", lambda query: [t for t in lowered if query.lower() in t])
+
+    # Atualização incremental, como em add_history_item
+    start = time.perf_counter()
+    for i in range(args.inserts):
+        index.add(f"new{i}", synthetic_text(rng))
+        index.remove(hashes[i], texts[hashes[i]])
+    update = (time.perf_counter() - start) / args.inserts
+    print(f"inclusão + remoção: {update * 1e3:8.3f} ms")
+    print(f"pico de memória:    {_peak_rss_kb() / 1024:8.0f} MB  (textos: "
+          f"{sum(len(text) for text in texts.values()) / 2 ** 20:.0f} MB)")
+
+
+# Caminho de inicialização do app sem o rumps, em um interpretador novo:
+# os módulos do próprio app que o power_paste importa, o PowerPaste.__init__
+# (armazenamento, núcleo, load_history) e o primeiro build_history_menu
+STARTUP_SCRIPT = """
+import ast, importlib, json, os, sys, time
+start = time.perf_counter()
+# Lidos do próprio power_paste.py: a lista acompanha o app
+with open("power_paste.py") as f:
+    tree = ast.parse(f.read())
+local = [node.module for node in tree.body if isinstance(node, ast.ImportFrom)
+         and node.module and os.path.exists(node.module + ".py")]
+for name in local:
+    importlib.import_module(name)
+from clipboard_engine import ClipboardEngine
+from history_store import HistoryJournal, HistoryWriter
+from image_ingest import ImageIngest
+from image_store import ImageStore
+from menu_model import (FakeMenu, FakeSubmenuItem, HistoryMenu, HistorySections,
+                        fake_item_factory, history_entries, split_history)
+from near_duplicates import NearDuplicateIndex
+from pasteboard import ClipboardWatcher, FakePasteboard
+from perceptual_hash import ImageDuplicateIndex
+from retention import RetentionPolicy
+from text_blobs import TextBlobStore
+from thumbnails import ThumbnailCache
+imported = time.perf_counter()
+
+path, visible = sys.argv[1], int(sys.argv[2])
+images = ImageStore(path + ".images")
+thumbnails = ThumbnailCache(path + ".thumbnails")
+blobs = TextBlobStore(path + ".blobs")
+ingest = ImageIngest(images, thumbnails)
+store = HistoryWriter(HistoryJournal(path))
+blobs.schedule = store.call
+engine = ClipboardEngine(ClipboardWatcher(FakePasteboard(), hash_images=False), store, images,
+                         blobs, ingest, thumbnails, retention=RetentionPolicy.from_config(),
+                         near_duplicates=NearDuplicateIndex.from_config(),
+                         image_duplicates=ImageDuplicateIndex.from_config())
+engine.load(store.load())
+loaded = time.perf_counter()
+
+labels = {"processing": "processando", "image": "imagem", "unknown": "?"}
+make_entries = lambda items: history_entries(items, labels)
+titles = {key: key for key in ("earlier_today", "yesterday", "this_week", "older", "more")}
+sections = HistorySections(FakeSubmenuItem, fake_item_factory, make_entries, titles, "vazio")
+head, grouped = split_history(engine.history, visible, time.time())
+HistoryMenu(FakeMenu(), sections.make_item, "vazio").build(make_entries(head) + sections.entries(grouped))
+built = time.perf_counter()
+
+# O índice de busca termina em segundo plano, depois do menu
+engine.fuzzy_ready.wait()
+indexed = time.perf_counter()
+store.close()
+heavy = [name for name in ("PIL", "sqlite3", "concurrent.futures", "numpy", "zstandard")
+         if name in sys.modules]
+print(json.dumps({"import": imported - start, "load": loaded - imported, "menu": built - loaded,
+                  "index": indexed - loaded, "modules": len(local), "heavy": heavy}))
+"""
+
+
+def bench_startup(args):
+    """Mede a inicialização (imports + histórico + primeiro menu) em processos novos."""
+    rng = random.Random(42)
+    workdir = tempfile.mkdtemp(prefix="power_paste_bench_")
+    here = os.path.dirname(os.path.abspath(__file__))
+    try:
+        path = os.path.join(workdir, "history.log")
+        # Uma cópia por minuto até agora (várias seções), no formato gravado pelo app
+        now = int(time.time())
+        items = []
+        for i in range(args.items):
+            item = dict(synthetic_item(rng, i), hash=f"b2-{i:032x}",
+                        timestamp=now - (args.items - i) * 60)
+            item["display"] = display_record(item)
+            items.append(item)
+        journal = HistoryJournal(path)
+        journal.rewrite(list(reversed(items)))
+        journal.close()
+
+        runs = []
+        for _ in range(args.runs):
+            result = subprocess.run([sys.executable, "-c", STARTUP_SCRIPT, path, str(args.visible)],
+                                    cwd=here, capture_output=True, text=True, check=True)
+            runs.append(json.loads(result.stdout.strip().splitlines()[-1]))
+
+        def median(key):
+            values = sorted(run[key] for run in runs)
+            return values[len(values) // 2]
+
+        total = median("import") + median("load") + median("menu")
+        print(f"itens: {args.items}  (mediana de {args.runs} processos)")
+        print(f"imports:         {median('import') * 1e3:8.1f} ms"
+              f"  ({runs[-1]['modules']} módulos do app, sem rumps/PyObjC)")
+        print(f"histórico:       {median('load') * 1e3:8.1f} ms  (ClipboardEngine.load)")
+        print(f"primeiro menu:   {median('menu') * 1e3:8.1f} ms  (itens recentes + seções)")
+        print(f"total:           {total * 1e3:8.1f} ms")
+        print(f"índice de busca: {median('index') * 1e3:8.1f} ms  (em segundo plano, após a carga)")
+        print(f"módulos pesados carregados: {', '.join(runs[-1]['heavy']) or 'nenhum'}")
+
+        # No macOS mede também o import do aplicativo (rumps + PyObjC)
+        probe = subprocess.run([sys.executable, "-c", "import rumps"], capture_output=True)
+        if probe.returncode == 0:
+            timings = []
+            for _ in range(args.runs):
+                result = subprocess.run(
+                    [sys.executable, "-c",
+                     "import time; s = time.perf_counter(); import power_paste; "
+                     "print(time.perf_counter() - s)"],
+                    cwd=here, capture_output=True, text=True, check=True)
+                timings.append(float(result.stdout.strip().splitlines()[-1]))
+            timings.sort()
+            print(f"import power_paste: {timings[len(timings) // 2] * 1e3:8.1f} ms")
+        else:
+            print("rumps indisponível: import do rumps/PyObjC não medido (os demais módulos estão em 'imports')")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+WORKLOADS = ("idle", "bursty_text", "large_images", "history_100k")
+MENU_LABELS = {"processing": "processando", "image": "imagem", "unknown": "?"}
+
+
+def _percentiles(timings):
+    if not timings:
+        return {}
+    timings = sorted(timings)
+
+    def pick(q):
+        return timings[min(len(timings) - 1, int(len(timings) * q))] * 1e3
+    return {"count": len(timings), "p50_ms": pick(0.5), "p95_ms": pick(0.95),
+            "p99_ms": pick(0.99), "max_ms": timings[-1] * 1e3}
+
+
+def _directory_bytes(path):
+    if not os.path.isdir(path):
+        return 0
+    return sum(entry.stat().st_size for entry in os.scandir(path) if entry.is_file())
+
+
+def _peak_rss_kb():
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS informa bytes; Linux, kilobytes
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+def _workload_script(name, rng, args):
+    """Retorna (itens pré-carregados, eventos por tick) do workload.
+
+    Cada evento é None (tick ocioso), ("text", texto) ou ("png", bytes).
+    """
+    if name == "idle":
+        return 1000, [None] * args.ticks
+    if name == "bursty_text":
+        events = []
+        recent = []
+        while len(events) < args.ticks:
+            # Rajada de cópias seguidas, algumas repetindo textos recentes
+            for _ in range(20):
+                if recent and rng.random() < 0.2:
+                    events.append(("text", rng.choice(recent)))
+                else:
+                    text = synthetic_text(rng, rng.randrange(3, 60))
+                    recent = (recent + [text])[-50:]
+                    events.append(("text", text))
+            events.extend([None] * 50)
+        return 1000, events[:args.ticks]
+    if name == "large_images":
+        from PIL import Image
+        images = []
+        for i in range(args.images):
+            img = Image.effect_noise((args.width, args.height), 40 + i).convert("RGB")
+            buf = io.BytesIO()
+            img.save(buf, "PNG", compress_level=1)
+            images.append(buf.getvalue())
+        events = []
+        for i in range(args.ticks):
+            events.append(("png", images[(i // 10) % len(images)]) if i % 10 == 0 else None)
+        return 100, events
+    if name == "history_100k":
+        events = []
+        for i in range(args.ticks):
+            events.append(("text", synthetic_text(rng)) if i % 5 == 0 else None)
+        return 100000, events
+    raise ValueError(name)
+
+
+def run_workload(name, args):
+    """Executa um workload no processo atual e retorna as métricas."""
+    rng = random.Random(42)
+    preload, events = _workload_script(name, rng, args)
+    workdir = tempfile.mkdtemp(prefix="power_paste_bench_")
+    try:
+        now = [1746100000.0]
+        journal = HistoryJournal(os.path.join(workdir, "history.log"))
+        # Itens já no formato atual (hash BLAKE2b, timestamp inteiro), sem migração
+        journal.rewrite([dict(synthetic_item(rng, i), hash=f"b2-{i:032x}", timestamp=int(now[0]) - i * 5)
+                         for i in range(preload)])
+        journal.close()
+        journal = HistoryJournal(journal.path)
+        base_rss = _peak_rss_kb()
+
+        pasteboard = FakePasteboard()
+        images = ImageStore(os.path.join(workdir, "images"))
+        thumbnails = ThumbnailCache(os.path.join(workdir, "thumbnails"))
+        blobs = TextBlobStore(os.path.join(workdir, "blobs"))
+        store = HistoryWriter(journal, debounce=args.debounce_ms / 1000.0)
+        engine = ClipboardEngine(ClipboardWatcher(pasteboard, hash_images=False), store,
+                                 images, blobs, ImageIngest(images, thumbnails), thumbnails,
+                                 clock=lambda: now[0])
+        menu = HistoryMenu(FakeMenu(), fake_item_factory, "vazio")
+
+        # Logs do núcleo não entram na medição
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            engine.load(store.load())
+            menu.build(history_entries(engine.history.newest(args.visible), MENU_LABELS))
+            startup = time.perf_counter() - start
+            # O índice de busca é montado em segundo plano: fora das medições por tick
+            engine.fuzzy_ready.wait()
+
+            idle, busy = [], []
+            for event in events:
+                now[0] += 1
+                if event is not None:
+                    kind, data = event
+                    if kind == "text":
+                        pasteboard.set_text(data)
+                    else:
+                        pasteboard.set_png(data)
+                start = time.perf_counter()
+                if engine.tick():
+                    menu.update(history_entries(engine.history.newest(args.visible), MENU_LABELS))
+                elapsed = time.perf_counter() - start
+                (idle if event is None else busy).append(elapsed)
+
+            start = time.perf_counter()
+            engine.close()
+            shutdown = time.perf_counter() - start
+
+        return {
+            "workload": name,
+            "preloaded_items": preload,
+            "ticks": len(events),
+            "final_items": len(engine.history),
+            "startup_ms": startup * 1e3,
+            "shutdown_ms": shutdown * 1e3,
+            "idle_tick": _percentiles(idle),
+            "change_tick": _percentiles(busy),
+            "menu_ops": menu.menu.total_ops,
+            "history_writes": journal.writes,
+            "bytes_written": {
+                "history": journal.bytes_written,
+                "images": _directory_bytes(images.directory),
+                "thumbnails": _directory_bytes(thumbnails.directory),
+                "blobs": _directory_bytes(blobs.directory),
+            },
+            "rss_before_kb": base_rss,
+            "peak_rss_kb": _peak_rss_kb(),
+        }
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def bench_workloads(args):
+    """Reproduz workloads sintéticos no núcleo com pasteboard e menu falsos."""
+    if args.child:
+        # Processo filho: um workload só, resultado em JSON na última linha
+        print(json.dumps(run_workload(args.child, args)))
+        return
+
+    here = os.path.abspath(__file__)
+    names = args.only or list(WORKLOADS)
+    results = []
+    for name in names:
+        # Um processo por workload para o pico de memória ser só dele
+        command = [sys.executable, here, "workloads", "--child", name,
+                   "--ticks", str(args.ticks), "--visible", str(args.visible),
+                   "--debounce-ms", str(args.debounce_ms), "--images", str(args.images),
+                   "--width", str(args.width), "--height", str(args.height)]
+        result = subprocess.run(command, capture_output=True, text=True)
+        if result.returncode != 0:
+            print(f"{name}: falhou\n{result.stderr.strip()}")
+            continue
+        results.append(json.loads(result.stdout.strip().splitlines()[-1]))
+
+    print(f"{'workload':14s} {'ocioso p50/p99 (ms)':>20s} {'mudança p50/p99 (ms)':>21s} "
+          f"{'bytes gravados':>15s} {'pico RSS':>10s}")
+    for r in results:
+        idle, busy = r["idle_tick"], r["change_tick"]
+        idle_text = f"{idle['p50_ms']:.3f}/{idle['p99_ms']:.3f}" if idle else "-"
+        busy_text = f"{busy['p50_ms']:.3f}/{busy['p99_ms']:.3f}" if busy else "-"
+        written = sum(r["bytes_written"].values())
+        print(f"{r['workload']:14s} {idle_text:>20s} {busy_text:>21s} "
+              f"{written / 1024:12.0f} KB {r['peak_rss_kb'] / 1024:7.0f} MB")
+
+    if args.output:
+        report = {
+            "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "results": results,
+        }
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"resultados salvos em {args.output}")
+
+
+def bench_stats(args):
+    """Mede o custo da instrumentação desativada e ativada por chamada."""
+    stats = Stats()
+    pb = FakePasteboard()
+    pb.set_text("texto inicial para o benchmark")
+    watcher = ClipboardWatcher(pb)
+    watcher.poll()
+
+    def bare():
+        watcher.poll()
+
+    def timed():
+        with stats.timer("clipboard.probe"):
+            watcher.poll()
+
+    def run(func):
+        start = time.perf_counter()
+        for _ in range(args.calls):
+            func()
+        return (time.perf_counter() - start) / args.calls
+
+    baseline = run(bare)
+    stats.enable(False)
+    disabled = run(timed)
+    stats.enable(True)
+    enabled = run(timed)
+    print(f"tick ocioso sem instrumentação: {baseline * 1e6:8.3f} us")
+    print(f"instrumentação desativada:      {disabled * 1e6:8.3f} us  (+{(disabled - baseline) * 1e9:.0f} ns)")
+    print(f"instrumentação ativada:         {enabled * 1e6:8.3f} us  (+{(enabled - baseline) * 1e9:.0f} ns)")
+    print(stats.summary())
+
+
+def bench_ipc(args):
+    """Mede o servidor local com vários clientes enquanto o núcleo recebe cópias."""
+    rng = random.Random(42)
+    workdir = tempfile.mkdtemp(prefix="power_paste_bench_")
+    server = None
+    try:
+        now = [1746100000.0]
+        journal = HistoryJournal(os.path.join(workdir, "history.log"))
+        items = [dict(synthetic_item(rng, i), hash=f"b2-{i:032x}", timestamp=int(now[0]) - i * 5)
+                 for i in range(args.items)]
+        journal.rewrite(items)
+        pasteboard = FakePasteboard()
+        images = ImageStore(os.path.join(workdir, "images"))
+        engine = ClipboardEngine(ClipboardWatcher(pasteboard, hash_images=False),
+                                 HistoryWriter(journal), images,
+                                 TextBlobStore(os.path.join(workdir, "blobs")),
+                                 ImageIngest(images, None), clock=lambda: now[0])
+        path = os.path.join(workdir, "bench.sock")
+        server = IPCServer(path, HistoryRequests(engine))
+        queries = [synthetic_text(rng, 2) for _ in range(50)]
+
+        def copy_and_tick(timings):
+            now[0] += 1
+            pasteboard.set_text(synthetic_text(rng))
+            tick_start = time.perf_counter()
+            engine.tick()
+            timings.append(time.perf_counter() - tick_start)
+            time.sleep(0.005)
+
+        # Início a frio: a primeira busca chega enquanto o índice ainda é montado
+        cold_ticks, first_query = [], []
+
+        def first_client():
+            with IPCClient(path) as conn:
+                start = time.perf_counter()
+                conn.call("search", query=queries[0], limit=20)
+                first_query.append(time.perf_counter() - start)
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            load_start = time.perf_counter()
+            engine.load(journal.load())
+            if not server.start():
+                return
+            thread = threading.Thread(target=first_client)
+            thread.start()
+            while thread.is_alive() or not engine.fuzzy_ready.is_set():
+                copy_and_tick(cold_ticks)
+            index_elapsed = time.perf_counter() - load_start
+            thread.join()
+
+        hashes = [item["hash"] for item in items[:1000]]
+        latencies = []
+        lock = threading.Lock()
+
+        def client(seed):
+            local_rng = random.Random(seed)
+            timings = []
+            with IPCClient(path) as conn:
+                for i in range(args.requests):
+                    start = time.perf_counter()
+                    kind = i % 3
+                    if kind == 0:
+                        conn.call("list", limit=20)
+                    elif kind == 1:
+                        conn.call("search", query=local_rng.choice(queries), limit=20)
+                    else:
+                        conn.call("get", hash=local_rng.choice(hashes))
+                    timings.append(time.perf_counter() - start)
+            with lock:
+                latencies.extend(timings)
+
+        # A thread principal continua recebendo cópias enquanto os clientes consultam
+        threads = [threading.Thread(target=client, args=(seed,)) for seed in range(args.clients)]
+        ticks = []
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            while any(thread.is_alive() for thread in threads):
+                copy_and_tick(ticks)
+            elapsed = time.perf_counter() - start
+
+        total = len(latencies)
+        served, tick = _percentiles(latencies), _percentiles(ticks)
+        cold = _percentiles(cold_ticks)
+        print(f"itens: {args.items}  clientes: {args.clients}  pedidos: {total}")
+        print(f"a frio: índice pronto em {index_elapsed * 1000:8.1f} ms  "
+              f"primeira busca: {first_query[0] * 1000:8.3f} ms")
+        print(f"tick a frio p50: {cold['p50_ms']:8.3f} ms  p99: {cold['p99_ms']:8.3f} ms"
+              f"  máx: {cold['max_ms']:8.3f} ms  ({cold['count']} ticks com cópia)")
+        print(f"vazão: {total / elapsed:8.0f} pedidos/s")
+        print(f"pedido  p50: {served['p50_ms']:8.3f} ms  p99: {served['p99_ms']:8.3f} ms"
+              f"  máx: {served['max_ms']:8.3f} ms")
+        print(f"tick    p50: {tick['p50_ms']:8.3f} ms  p99: {tick['p99_ms']:8.3f} ms"
+              f"  máx: {tick['max_ms']:8.3f} ms  ({tick['count']} ticks com cópia)")
+    finally:
+        if server is not None:
+            server.stop()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def bench_retention(args):
+    """Mede a inclusão com despejo por quantidade e bytes em históricos cheios."""
+    rng = random.Random(42)
+    texts = [synthetic_text(rng) for _ in range(1000)]
+    for size in args.sizes:
+        workdir = tempfile.mkdtemp(prefix="power_paste_bench_")
+        try:
+            now = [1746100000.0]
+            items = [dict(synthetic_item(rng, i), hash=f"b2-{i:032x}", timestamp=int(now[0]) - i)
+                     for i in range(size)]
+            policy = RetentionPolicy(max_items=size, max_bytes=sum(len(item["content"]) for item in items),
+                                     quotas={"text": (size, None)})
+            journal = HistoryJournal(os.path.join(workdir, "history.log"))
+            images = ImageStore(os.path.join(workdir, "images"))
+            engine = ClipboardEngine(None, HistoryWriter(journal, debounce=60), images,
+                                     TextBlobStore(os.path.join(workdir, "blobs")),
+                                     ImageIngest(images, None), retention=policy,
+                                     clock=lambda: now[0])
+            with contextlib.redirect_stdout(io.StringIO()):
+                start = time.perf_counter()
+                engine.load(items)
+                load = time.perf_counter() - start
+                engine.fuzzy_ready.wait()
+
+                timings = []
+                for i in range(args.adds):
+                    now[0] += 1
+                    start = time.perf_counter()
+                    engine.add_item("text", texts[i % len(texts)] + str(i), f"new-{i}")
+                    timings.append(time.perf_counter() - start)
+            result = _percentiles(timings)
+            print(f"{size:7d} itens  carga: {load * 1e3:8.1f} ms  inclusão com despejo"
+                  f" p50: {result['p50_ms']:7.3f} ms  p99: {result['p99_ms']:7.3f} ms"
+                  f"  despejados: {engine.retention.evicted}")
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+def _edit(rng, text):
+    """Uma edição pequena: troca um caractere, reindenta ou acrescenta espaços."""
+    kind = rng.randrange(3)
+    if kind == 0:
+        pos = rng.randrange(len(text))
+        return text[:pos] + rng.choice("abcxyz") + text[pos + 1:]
+    if kind == 1:
+        return "\n".join("    " + line for line in text.split("\n"))
+    return text + "  \n"
+
+
+def bench_neardup(args):
+    """Mede o custo do SimHash na inclusão e quantas edições pequenas são agrupadas."""
+    rng = random.Random(42)
+    items = [dict(synthetic_item(rng, i), hash=f"b2-{i:032x}", timestamp=1746100000 - args.items + i)
+             for i in range(args.items)]
+    for words in args.words:
+        texts = [synthetic_text(rng, words) for _ in range(args.adds)]
+        edits = [_edit(rng, text) for text in texts]
+        row = []
+        for near in (None, NearDuplicateIndex()):
+            workdir = tempfile.mkdtemp(prefix="power_paste_bench_")
+            try:
+                now = [1746100000.0]
+                images = ImageStore(os.path.join(workdir, "images"))
+                engine = ClipboardEngine(None, HistoryWriter(HistoryJournal(os.path.join(workdir, "h.log")),
+                                                             debounce=60),
+                                         images, TextBlobStore(os.path.join(workdir, "blobs")),
+                                         ImageIngest(images, None), retention=RetentionPolicy(ttl=None),
+                                         near_duplicates=near, clock=lambda: now[0])
+                with contextlib.redirect_stdout(io.StringIO()):
+                    start = time.perf_counter()
+                    engine.load([dict(item) for item in reversed(items)])
+                    load = time.perf_counter() - start
+                    # Impressões do histórico calculadas em segundo plano
+                    engine.duplicates_ready.wait()
+                    build = time.perf_counter() - start
+                    engine.fuzzy_ready.wait()
+                    timings = []
+                    # Cada texto novo seguido de uma versão levemente editada
+                    for i, (text, edited) in enumerate(zip(texts, edits)):
+                        for j, content in enumerate((text, edited)):
+                            now[0] += 1
+                            start = time.perf_counter()
+                            engine.add_item("text", content, f"new-{i}-{j}")
+                            timings.append(time.perf_counter() - start)
+                row.append((load, build, _percentiles(timings), near.collapsed if near else 0))
+            finally:
+                shutil.rmtree(workdir, ignore_errors=True)
+        (_, _, plain, _), (load, build, simhash, collapsed) = row
+        print(f"{words:4d} palavras (~{len(texts[0]):5d} caracteres)  inclusão p50: "
+              f"{plain['p50_ms']:.3f} -> {simhash['p50_ms']:.3f} ms  p99: "
+              f"{plain['p99_ms']:.3f} -> {simhash['p99_ms']:.3f} ms  "
+              f"agrupados: {collapsed}/{len(edits)}  carga: {load * 1e3:.0f} ms"
+              f"  impressões prontas em: {build * 1e3:.0f} ms")
+
+
+def _screenshot(seed, width, height, cursor=False):
+    """Janela sintética: barra de título e linhas de "texto" de tamanhos aleatórios."""
+    from PIL import Image, ImageDraw
+    rng = random.Random(seed)
+    img = Image.new("RGB", (width, height), (250, 250, 250))
+    draw = ImageDraw.Draw(img)
+    draw.rectangle([0, 0, width, 40], fill=(rng.randrange(40, 90),) * 3)
+    for row in range(rng.randrange(5, 40)):
+        y = 60 + row * 22
+        x = 20 + rng.randrange(0, 200)
+        draw.rectangle([x, y, x + rng.randrange(50, width - 250), y + 12], fill=(rng.randrange(60),) * 3)
+    if cursor:
+        draw.rectangle([width // 2, height // 2, width // 2 + 3, height // 2 + 20], fill=(0, 0, 0))
+    buf = io.BytesIO()
+    img.save(buf, "PNG", compress_level=1)
+    return buf.getvalue()
+
+
+def bench_imagedup(args):
+    """Mede o dHash no processamento, a busca no índice e o agrupamento de capturas repetidas."""
+    rng = random.Random(42)
+    workdir = tempfile.mkdtemp(prefix="power_paste_bench_")
+    try:
+        # Cada janela capturada duas vezes (a segunda com o cursor piscando)
+        shots = []
+        for i in range(args.images):
+            shots.append(_screenshot(i, args.width, args.height))
+            shots.append(_screenshot(i, args.width, args.height, cursor=True))
+
+        def run(fingerprint):
+            now = [1746100000.0]
+            directory = os.path.join(workdir, "dhash" if fingerprint else "plain")
+            pasteboard = FakePasteboard()
+            images = ImageStore(os.path.join(directory, "images"))
+            thumbnails = ThumbnailCache(os.path.join(directory, "thumbnails"))
+            ingest = ImageIngest(images, thumbnails, fingerprint=fingerprint)
+            engine = ClipboardEngine(ClipboardWatcher(pasteboard, hash_images=False),
+                                     HistoryWriter(HistoryJournal(os.path.join(directory, "h.log"))),
+                                     images, TextBlobStore(os.path.join(directory, "blobs")), ingest,
+                                     thumbnails, image_duplicates=ImageDuplicateIndex() if fingerprint else None,
+                                     clock=lambda: now[0])
+            with contextlib.redirect_stdout(io.StringIO()):
+                engine.load([])
+                engine.duplicates_ready.wait()
+                start = time.perf_counter()
+                for data in shots:
+                    now[0] += 1
+                    pasteboard.set_png(data)
+                    engine.tick()
+                    # Espera o processamento, como se as capturas fossem espaçadas
+                    while any(item.get("processing") for item in engine.history):
+                        time.sleep(0.001)
+                        engine.tick()
+                elapsed = time.perf_counter() - start
+                engine.close()
+            return elapsed / len(shots), len(engine.history), _directory_bytes(images.directory)
+
+        plain = run(None)
+        deduped = run(dhash)
+        print(f"capturas: {len(shots)} de {args.width}x{args.height} ({args.images} janelas, cada uma duas vezes)")
+        print(f"sem dHash: {plain[0] * 1e3:7.1f} ms por imagem  itens: {plain[1]:4d}"
+              f"  disco: {plain[2] / 1024:8.0f} KB")
+        print(f"com dHash: {deduped[0] * 1e3:7.1f} ms por imagem  itens: {deduped[1]:4d}"
+              f"  disco: {deduped[2] / 1024:8.0f} KB")
+
+        # Busca no índice em baldes x varredura linear
+        index = ImageDuplicateIndex()
+        fingerprints = [rng.getrandbits(64) for _ in range(args.indexed)]
+        for i, fingerprint in enumerate(fingerprints):
+            index.add(i, fingerprint)
+        probes = [fingerprint ^ (1 << rng.randrange(64)) for fingerprint in fingerprints[:1000]]
+        start = time.perf_counter()
+        for probe in probes:
+            index.find(probe)
+        bucketed = (time.perf_counter() - start) / len(probes)
+        start = time.perf_counter()
+        for probe in probes[:100]:
+            min(fingerprints, key=lambda fingerprint: hamming(probe, fingerprint))
+        linear = (time.perf_counter() - start) / 100
+        print(f"busca entre {args.indexed} impressões: índice {bucketed * 1e6:7.1f} us"
+              f"  varredura {linear * 1e6:9.1f} us")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def bench_sections(args):
+    """Compara o menu com o histórico inteiro x itens recentes e seções montadas sob demanda."""
+    rng = random.Random(42)
+    now = time.time()
+    # Histórico espalhado pela última semana, do mais recente para o mais antigo
+    ages = sorted(rng.uniform(0, 7 * 86400) for _ in range(args.items))
+    history = [{"type": "text", "content": synthetic_text(rng), "timestamp": int(now - age),
+                "hash": f"{i:032x}"} for i, age in enumerate(ages)]
+
+    def make_entries(items):
+        return history_entries(items, MENU_LABELS)
+
+    def copy(next_id):
+        history.insert(0, {"type": "text", "content": synthetic_text(rng), "timestamp": int(now),
+                           "hash": f"{next_id:032x}"})
+
+    # Tudo no menu principal, como seria sem o limite de itens visíveis
+    flat = HistoryMenu(FakeMenu(), fake_item_factory, "vazio")
+    start = time.perf_counter()
+    flat.build(make_entries(history))
+    flat_build = time.perf_counter() - start
+    flat.menu.ops = dict.fromkeys(flat.menu.ops, 0)
+    start = time.perf_counter()
+    for i in range(args.copies):
+        copy(args.items + i)
+        flat.update(make_entries(history))
+    flat_copy = (time.perf_counter() - start) / args.copies
+    flat_ops = flat.menu.total_ops / args.copies
+    del history[:args.copies]
+
+    # Itens recentes + cabeçalhos das seções
+    sections = HistorySections(FakeSubmenuItem, fake_item_factory, make_entries,
+                               {key: key for key in ("earlier_today", "yesterday", "this_week", "older", "more")},
+                               "vazio")
+
+    def entries():
+        visible, grouped = split_history(history, args.visible, now)
+        return make_entries(visible) + sections.entries(grouped)
+
+    lazy = HistoryMenu(FakeMenu(), sections.make_item, "vazio")
+    start = time.perf_counter()
+    lazy.build(entries())
+    lazy_build = time.perf_counter() - start
+    lazy.menu.ops = dict.fromkeys(lazy.menu.ops, 0)
+    start = time.perf_counter()
+    for i in range(args.copies):
+        copy(args.items + args.copies + i)
+        lazy.update(entries())
+    lazy_copy = (time.perf_counter() - start) / args.copies
+    lazy_ops = lazy.menu.total_ops / args.copies
+
+    print(f"itens: {args.items}, visíveis: {args.visible}, cópias: {args.copies}")
+    print(f"histórico inteiro no menu: montagem {flat_build * 1e3:8.2f} ms"
+          f"  por cópia {flat_copy * 1e3:7.3f} ms  {flat_ops:6.1f} operações")
+    print(f"recentes + seções:         montagem {lazy_build * 1e3:8.2f} ms"
+          f"  por cópia {lazy_copy * 1e3:7.3f} ms  {lazy_ops:6.1f} operações")
+    # Abre cada seção e as duas primeiras páginas seguintes
+    for key in ("earlier_today", "yesterday", "this_week", "older", "this_week:1", "this_week:2"):
+        section = sections.sections.get(key)
+        if section is None:
+            continue
+        start = time.perf_counter()
+        section.open()
+        first = time.perf_counter() - start
+        start = time.perf_counter()
+        section.open()
+        again = time.perf_counter() - start
+        print(f"  {key:14} {len(section.items):4} itens: primeira abertura {first * 1e3:6.2f} ms"
+              f"  reabertura {again * 1e3:6.3f} ms")
+    print(f"  submenus montados: {len(sections.sections)} de "
+          f"{sum(-(-len(items) // sections.page) for _, items in split_history(history, args.visible, now)[1])} páginas")
+
+
+def bench_display(args):
+    """Compara montar as entradas do menu com e sem os registros de exibição."""
+    rng = random.Random(42)
+    items = []
+    for i in range(args.visible):
+        # Metade curtos, metade perto do limite dos textos guardados em linha
+        words = 8 if i % 2 else args.chars // 8
+        items.append({"type": "text", "content": synthetic_text(rng, words), "timestamp": int(time.time()),
+                      "hash": f"{i:032x}"})
+
+    def measure(build):
+        start = time.perf_counter()
+        for _ in range(args.rebuilds):
+            build()
+        return (time.perf_counter() - start) / args.rebuilds
+
+    # O que cada montagem fazia antes: prévia e horário de todos os itens
+    computed = measure(lambda: [f"{display_time(item['timestamp'])} | {text_preview(item['content'])}"
+                                for item in items])
+    start = time.perf_counter()
+    for item in items:
+        item["display"] = display_record(item)
+    once = time.perf_counter() - start
+    stored = measure(lambda: history_entries(items, MENU_LABELS))
+    extra = sum(len(json.dumps(item["display"], ensure_ascii=False)) for item in items) / len(items)
+    print(f"itens visíveis: {args.visible} (metade com ~{args.chars // 1024} KB)")
+    print(f"entradas calculando prévia e horário: {computed * 1e3:8.3f} ms/montagem")
+    print(f"entradas com registro de exibição:    {stored * 1e3:8.3f} ms/montagem")
+    print(f"cálculo dos registros (uma vez):      {once * 1e3:8.3f} ms  (+{extra:.0f} bytes/item gravados)")
+
+
+def bench_polling(args):
+    """Simula um dia de cópias com relógio falso: timer fixo de 1 s x intervalo adaptativo."""
+    rng = random.Random(42)
+    # Rajadas de cópias separadas por longos períodos ociosos
+    copies = []
+    now = 0.0
+    duration = args.hours * 3600
+    while True:
+        now += rng.expovariate(1 / (args.idle_minutes * 60))
+        if now >= duration:
+            break
+        for _ in range(rng.randint(1, args.burst)):
+            copies.append(now)
+            now += rng.uniform(args.gap_min, args.gap_max)
+
+    def simulate(adaptive):
+        pb = FakePasteboard()
+        watcher = ClipboardWatcher(pb)
+        clock = [0.0]
+        poller = AdaptivePoller(clock=lambda: clock[0]) if adaptive else None
+        interval = 1.0 if poller is None else poller.interval
+        index = seen = 0
+        latency = 0.0
+        while clock[0] < duration:
+            clock[0] += interval
+            last_copy = None
+            while index < len(copies) and copies[index] <= clock[0]:
+                pb.set_text(f"cópia número {index}")
+                last_copy = copies[index]
+                index += 1
+            missed = watcher.missed
+            change = watcher.poll()
+            if change is not None:
+                seen += 1
+                latency += clock[0] - last_copy
+            if poller is not None:
+                interval = poller.record(change is not None, watcher.missed - missed)
+        return watcher.ticks, len(copies) - seen, watcher.missed, latency / max(seen, 1)
+
+    print(f"{args.hours} h, {len(copies)} cópias em rajadas de até {args.burst}"
+          f" ({args.gap_min}-{args.gap_max} s entre cópias)")
+    for label, adaptive in (("fixo 1 s", False), ("adaptativo", True)):
+        ticks, lost, estimated, latency = simulate(adaptive)
+        print(f"{label:11} verificações: {ticks:7} ({ticks / args.hours:7.0f}/h)  cópias perdidas: {lost:4}"
+              f" (estimadas {estimated:4})  atraso médio: {latency * 1e3:6.0f} ms")
+
+
+def bench_helper(args):
+    """Um processo por comando x processo auxiliar persistente (em modo substituto)."""
+    # Fora do macOS: o cat faz o papel do pbcopy/pbpaste (um binário pequeno,
+    # então o custo por processo aqui é o mínimo; osascript é bem mais lento)
+    payload = "texto copiado " * 20
+
+    def measure(runner, commands):
+        timings = []
+        for i in range(args.calls):
+            start = time.perf_counter()
+            runner.run(commands[i % len(commands)], input=payload, timeout=5)
+            timings.append(time.perf_counter() - start)
+        timings.sort()
+        return timings
+
+    spawner = SubprocessRunner()
+    helper = HelperRunner(command=default_command() + ["--stand-in"])
+    try:
+        start = time.perf_counter()
+        helper.start()
+        startup = time.perf_counter() - start
+        print(f"{args.calls} comandos; auxiliar iniciado em {startup * 1e3:.1f} ms")
+        for label, runner, commands in (("processo/comando", spawner, [["cat"]]),
+                                        ("auxiliar", helper, [["pbcopy"], ["pbpaste"]])):
+            timings = measure(runner, commands)
+            print(f"{label:17} média: {sum(timings) / len(timings) * 1e3:7.3f} ms"
+                  f"  p99: {timings[int(len(timings) * 0.99)] * 1e3:7.3f} ms"
+                  f"  processos criados: {runner.spawns}")
+
+        # Comando travado: o auxiliar é encerrado e o próximo pedido inicia outro
+        try:
+            helper.run(["sleep", "5"], timeout=args.timeout)
+        except subprocess.TimeoutExpired:
+            pass
+        start = time.perf_counter()
+        helper.run(["pbpaste"], timeout=5)
+        print(f"após estourar o prazo ({args.timeout} s): pedido seguinte em"
+              f" {(time.perf_counter() - start) * 1e3:.1f} ms, reinícios: {helper.restarts}")
+    finally:
+        helper.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks do Power Paste")
+    sub = parser.add_subparsers(dest="command")
+
+    p = sub.add_parser("watcher", help="custo por tick do observador da área de transferência")
+    p.add_argument("--ticks", type=int, default=100000)
+    p.set_defaults(func=bench_watcher)
+
+    p = sub.add_parser("search", help="inserção e busca FTS5 no backend SQLite")
+    p.add_argument("--items", type=int, default=100000)
+    p.add_argument("--inserts", type=int, default=200)
+    p.add_argument("--queries", type=int, default=200)
+    p.set_defaults(func=bench_search)
+
+    p = sub.add_parser("menu", help="operações de menu por cópia (reconstrução x diferença)")
+    p.add_argument("--visible", type=int, default=100)
+    p.add_argument("--copies", type=int, default=1000)
+    p.set_defaults(func=bench_menu)
+
+    p = sub.add_parser("writer", help="gravações em disco de uma rajada de cópias")
+    p.add_argument("--adds", type=int, default=1000)
+    p.add_argument("--debounce-ms", type=int, default=500)
+    p.set_defaults(func=bench_writer)
+
+    p = sub.add_parser("thumbnails", help="menu com miniaturas x imagens inteiras (requer Pillow)")
+    p.add_argument("--images", type=int, default=50)
+    p.add_argument("--width", type=int, default=2880)
+    p.add_argument("--height", type=int, default=1800)
+    p.set_defaults(func=bench_thumbnails)
+
+    p = sub.add_parser("hash", help="algoritmos de hash por tamanho de payload")
+    p.set_defaults(func=bench_hash)
+
+    p = sub.add_parser("format", help="tamanho e tempo dos formatos do histórico em disco")
+    p.add_argument("--items", type=int, default=10000)
+    p.set_defaults(func=bench_format)
+
+    p = sub.add_parser("fuzzy", help="índice de trigramas para a busca aproximada")
+    p.add_argument("--items", type=int, default=50000)
+    p.add_argument("--queries", type=int, default=200)
+    p.add_argument("--inserts", type=int, default=1000)
+    p.set_defaults(func=bench_fuzzy)
+
+    p = sub.add_parser("startup", help="tempo de inicialização (imports + histórico + primeiro menu)")
+    p.add_argument("--items", type=int, default=5000)
+    p.add_argument("--visible", type=int, default=25)
+    p.add_argument("--runs", type=int, default=5)
+    p.set_defaults(func=bench_startup)
+
+    p = sub.add_parser("workloads", help="workloads sintéticos no núcleo (latência, bytes, memória)")
+    p.add_argument("--only", action="append", choices=WORKLOADS,
+                   help="roda só este workload (pode repetir)")
+    p.add_argument("--ticks", type=int, default=2000)
+    p.add_argument("--visible", type=int, default=25)
+    p.add_argument("--debounce-ms", type=int, default=500)
+    p.add_argument("--images", type=int, default=5)
+    p.add_argument("--width", type=int, default=2880)
+    p.add_argument("--height", type=int, default=1800)
+    p.add_argument("--output", help="arquivo JSON para comparar execuções")
+    p.add_argument("--child", choices=WORKLOADS, help=argparse.SUPPRESS)
+    p.set_defaults(func=bench_workloads)
+
+    p = sub.add_parser("stats", help="custo da instrumentação desativada e ativada")
+    p.add_argument("--calls", type=int, default=100000)
+    p.set_defaults(func=bench_stats)
+
+    p = sub.add_parser("ipc", help="servidor local com vários clientes simultâneos")
+    p.add_argument("--items", type=int, default=10000)
+    p.add_argument("--clients", type=int, default=32)
+    p.add_argument("--requests", type=int, default=200, help="pedidos por cliente")
+    p.set_defaults(func=bench_ipc)
+
+    p = sub.add_parser("retention", help="inclusão com despejo por quantidade e bytes")
+    p.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    p.add_argument("--adds", type=int, default=2000)
+    p.set_defaults(func=bench_retention)
+
+    p = sub.add_parser("neardup", help="custo do SimHash na inclusão e taxa de agrupamento")
+    p.add_argument("--items", type=int, default=10000)
+    p.add_argument("--adds", type=int, default=500)
+    p.add_argument("--words", type=int, nargs="+", default=[8, 40, 400])
+    p.set_defaults(func=bench_neardup)
+
+    p = sub.add_parser("imagedup", help="dHash no processamento e agrupamento de capturas repetidas")
+    p.add_argument("--images", type=int, default=20)
+    p.add_argument("--width", type=int, default=1600)
+    p.add_argument("--height", type=int, default=1000)
+    p.add_argument("--indexed", type=int, default=100000, help="impressões no teste de busca")
+    p.set_defaults(func=bench_imagedup)
+
+    p = sub.add_parser("sections", help="menu com o histórico inteiro x seções montadas sob demanda")
+    p.add_argument("--items", type=int, default=5000)
+    p.add_argument("--visible", type=int, default=25)
+    p.add_argument("--copies", type=int, default=200)
+    p.set_defaults(func=bench_sections)
+
+    p = sub.add_parser("display", help="entradas do menu com e sem registros de exibição")
+    p.add_argument("--visible", type=int, default=100)
+    p.add_argument("--chars", type=int, default=60000)
+    p.add_argument("--rebuilds", type=int, default=200)
+    p.set_defaults(func=bench_display)
+
+    p = sub.add_parser("polling", help="timer fixo x intervalo adaptativo em um dia simulado")
+    p.add_argument("--hours", type=float, default=8)
+    p.add_argument("--idle-minutes", type=float, default=10, help="intervalo médio entre rajadas")
+    p.add_argument("--burst", type=int, default=6, help="máximo de cópias por rajada")
+    p.add_argument("--gap-min", type=float, default=0.2, help="menor intervalo entre cópias da rajada (s)")
+    p.add_argument("--gap-max", type=float, default=3.0, help="maior intervalo entre cópias da rajada (s)")
+    p.set_defaults(func=bench_polling)
+
+    p = sub.add_parser("helper", help="um processo por comando x processo auxiliar persistente")
+    p.add_argument("--calls", type=int, default=500)
+    p.add_argument("--timeout", type=float, default=0.2, help="prazo do comando travado (s)")
+    p.set_defaults(func=bench_helper)
+
+    args = parser.parse_args()
+    if not hasattr(args, "func"):
+        parser.print_help()
+        return
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
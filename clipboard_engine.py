@@ -0,0 +1,556 @@
+"""
+Núcleo do Power Paste, sem interface gráfica.
+
+Junta o observador da área de transferência, o histórico em memória, o
+armazenamento e os arquivos (imagens e textos grandes). O app rumps cuida
+só do menu e das janelas; os benchmarks usam o mesmo núcleo com o
+pasteboard e o menu falsos.
+
+O app altera o histórico na thread principal; leituras de outras threads
+(o servidor local de comandos) passam pelo `lock`, mantido só durante
+operações em memória.
+
+O índice de trigramas da busca é montado em uma thread ao carregar o
+histórico, fora do `lock`; as inclusões e remoções feitas enquanto isso
+ficam registradas e são reaplicadas fora do `lock`, em lotes, até restarem
+poucas para a troca. A partir daí ele é mantido a cada cópia. Até ficar
+pronto, a busca usa o armazenamento.
+
+Os índices de quase iguais (SimHash e dHash) seguem o mesmo caminho: as
+impressões que faltam são calculadas na thread de montagem e, até a
+troca, as cópias novas entram sem agrupar.
+"""
+import threading
+import time
+
+from fuzzy_index import TrigramIndex, searchable_text
+from history_model import History
+from content_hash import is_legacy_hash
+from instrumentation import STATS
+from menu_model import display_record, display_time, text_preview
+from near_duplicates import FingerprintIndex
+from retention import RetentionIndex
+
+# Mudanças pendentes do índice aplicadas dentro do lock na troca
+FUZZY_REPLAY_BATCH = 32
+
+
+class ClipboardEngine:
+    """Estado do histórico e as regras aplicadas a cada cópia."""
+
+    def __init__(self, watcher, store, images, blobs, ingest, thumbnails=None,
+                 retention=None, near_duplicates=None, image_duplicates=None, clock=time.time):
+        self.watcher = watcher
+        self.store = store
+        self.images = images
+        self.blobs = blobs
+        self.ingest = ingest
+        self.thumbnails = thumbnails
+        # Idade, quantidade e bytes por tipo (RetentionPolicy; padrão: 7 dias)
+        self.retention = RetentionIndex(retention)
+        # Agrupa textos e imagens quase iguais (NearDuplicateIndex e
+        # ImageDuplicateIndex; None = desativado)
+        self.near_duplicates = near_duplicates
+        self.image_duplicates = image_duplicates
+        self._duplicates_log = None  # Mudanças feitas durante a montagem desses índices
+        self._duplicates_generation = 0
+        self.duplicates_ready = threading.Event()
+        self.duplicates_ready.set()
+        self.clock = clock
+        self.history = History()  # Histórico vazio, indexado por hash
+        self.fuzzy = TrigramIndex()  # Índice de trigramas (None enquanto é montado)
+        self._fuzzy_log = None  # Mudanças feitas durante a montagem do índice
+        self._fuzzy_generation = 0
+        self.fuzzy_ready = threading.Event()
+        self.fuzzy_ready.set()
+        self.lock = threading.RLock()  # Protege o histórico e o índice
+
+    def load(self, items):
+        """Carrega os itens lidos do armazenamento e recalcula as referências."""
+        with self.lock:
+            if items:
+                self.history = History(items)
+            # Itens gravados antes dos registros de exibição
+            displayed = 0
+            for item in self.history:
+                if "display" not in item:
+                    item["display"] = display_record(item)
+                    displayed += 1
+            # Aplica a política (que pode ter mudado desde a última execução)
+            self.retention.clear()
+            for item in reversed(list(self.history)):
+                self.track(item)
+            evicted = self.retention.evict(self.clock())
+            for item_hash in evicted:
+                self.history.remove(item_hash)
+            if evicted:
+                STATS.count("history.evicted", len(evicted))
+            # Imagens gravadas com MD5: o processamento calcula também o hash antigo
+            self.ingest.legacy_hashes = any(
+                item.get("type") == "image" and is_legacy_hash(item["hash"]) for item in self.history)
+            # Persiste os timestamps convertidos do formato antigo, os despejos
+            # e os registros de exibição calculados agora
+            if self.history.migrated or evicted or displayed:
+                self.save()
+            # Conta as referências às imagens e agenda os arquivos órfãos
+            self.images.rebuild(self.history)
+            self.blobs.rebuild(self.history)
+            self.build_fuzzy_index()
+            self.build_duplicate_index()
+
+    def save(self):
+        """Reescreve o armazenamento com o histórico atual (compactação completa)."""
+        try:
+            # Placeholders de imagens em processamento não são persistidos
+            self.store.rewrite([item for item in self.history if not item.get("processing")])
+        except Exception as e:
+            print(f"Erro ao salvar histórico: {e}")
+
+    def tick(self):
+        """Verifica a área de transferência; retorna True se o histórico mudou."""
+        with STATS.timer("clipboard.tick"), self.lock:
+            return self._tick()
+
+    def _tick(self):
+        changed = False
+        # Recolhe as imagens que terminaram de ser processadas em segundo plano
+        for result in self.ingest.drain():
+            self.finish_image_item(result)
+            changed = True
+
+        # Só consulta o conteúdo quando o changeCount do pasteboard muda
+        with STATS.timer("clipboard.probe"):
+            change = self.watcher.poll()
+        if change is None:
+            # Aproveita os ticks ociosos para apagar algumas imagens órfãs
+            if self.images.pending:
+                self.images.collect()
+            return changed
+
+        if change.kind == "text":
+            self.add_item("text", change.data, change.hash)
+            return True
+
+        # Imagem: hash, conversão e gravação rodam no pool de processamento
+        token = self.ingest.submit(change.data, change.fmt)
+        if token is None:
+            # Fila cheia: relê a área de transferência no próximo tick
+            self.watcher.retry()
+            return changed
+
+        # Mostra o item imediatamente enquanto a imagem é processada
+        placeholder = {
+            "type": "image",
+            "content": "",
+            "timestamp": int(self.clock()),
+            "hash": token,
+            "processing": True
+        }
+        self.history.add(placeholder)
+        placeholder["display"] = display_record(placeholder)
+        return True
+
+    def finish_image_item(self, result):
+        """Troca o placeholder de uma imagem processada pelo item definitivo."""
+        self.history.remove(result.token)
+        if result.path is None:
+            print(f"Erro ao processar imagem do clipboard: {result.error}")
+            return
+
+        # A mesma imagem, gravada por uma versão anterior (hash MD5): a nova a substitui
+        if result.legacy_hash is not None and result.hash not in self.history:
+            old_item = self.history.remove(result.legacy_hash)
+            if old_item is not None:
+                self.retention.remove(result.legacy_hash)
+                self.forget(old_item)
+                print(f"Imagem antiga substituída: hash: {result.legacy_hash[:8]}")
+
+        self.add_item("image", result.path, result.hash, result.fingerprint)
+        # Libera a referência do processamento (o item do histórico tem a sua)
+        self.images.release(result.path)
+
+    def add_item(self, item_type, content, item_hash, fingerprint=None):
+        """Adiciona um novo item ao histórico.
+
+        `fingerprint` é a impressão perceptual das imagens (calculada no
+        processamento); a dos textos é calculada aqui.
+        """
+        try:
+            timestamp = int(self.clock())
+
+            # Consulta o índice por hash
+            item = self.history.get(item_hash)
+            if item is not None:
+                # Item recopiado: volta ao topo com timestamp novo
+                item["timestamp"] = timestamp
+                print(f"Item movido para o topo: {item_type}, hash: {item_hash[:8]}")
+            else:
+                # Cria o item
+                item = {
+                    "type": item_type,
+                    "content": content,
+                    "timestamp": timestamp,
+                    "hash": item_hash
+                }
+                if item_type == "image":
+                    self.images.retain(content)
+                    item["size"] = self.images.size(content)
+                    if self.image_duplicates is not None and fingerprint is not None:
+                        item["dhash"] = fingerprint
+                        if self.duplicates_ready.is_set():
+                            self.collapse_duplicate(item, self.image_duplicates, fingerprint,
+                                                    self._same_picture(item_hash))
+                else:
+                    if self.near_duplicates is not None:
+                        fingerprint = self.near_duplicates.fingerprint(content)
+                        if fingerprint is not None:
+                            item["simhash"] = fingerprint
+                            # Até o índice ficar pronto, nada é agrupado
+                            if self.duplicates_ready.is_set():
+                                self.collapse_duplicate(item, self.near_duplicates, fingerprint)
+                    if self.blobs.should_store(content):
+                        # Texto grande: corpo em arquivo, só prévia e metadados em memória
+                        item["size"] = self.blobs.write(item_hash, content)
+                        item["preview"] = text_preview(content)
+                        item["content"] = ""
+                        item["blob"] = True
+
+            # Adiciona (ou move) ao início do histórico
+            self.history.add(item)
+            # Registro de exibição: calculado uma vez; o item recopiado só muda de horário
+            display = item.get("display")
+            if display is None:
+                item["display"] = display_record(item)
+            else:
+                display["time"] = display_time(item["timestamp"])
+            self.track(item)
+            index, fingerprint = self._duplicates_of(item)
+            if index is not None and fingerprint is not None:
+                self._index_duplicate(index, item_hash, fingerprint)
+            if item_type == "text":
+                self._index_text(item_hash, searchable_text(item))
+
+            # Anexa o item ao journal
+            self.store.append(item)
+
+            # Despeja os itens mais antigos que passaram dos limites de retenção
+            evicted = self.retention.evict(timestamp, keep=item_hash)
+            for old_hash in evicted:
+                self.forget(self.history.remove(old_hash))
+            if evicted:
+                STATS.count("history.evicted", len(evicted))
+
+            # Log para depuração
+            print(f"Item adicionado ao histórico: {item_type}, hash: {item_hash[:8]}")
+        except Exception as e:
+            print(f"Erro ao adicionar item ao histórico: {e}")
+
+    def track(self, item):
+        """Registra o item (com o tamanho em bytes) no índice de retenção."""
+        size = item.get("size")
+        if item.get("type") == "image":
+            if size is None:
+                # Itens gravados antes da retenção por bytes
+                size = item["size"] = self.images.size(item.get("content", ""))
+        elif not item.get("blob"):
+            display = item.get("display")
+            size = display["size"] if display else len(item.get("content", "").encode('utf-8'))
+        self.retention.add(item["hash"], item.get("type"), item.get("timestamp", 0), size or 0)
+
+    def _duplicates_of(self, item):
+        """Índice de quase iguais do tipo do item e a impressão guardada nele."""
+        if item.get("type") == "image":
+            return self.image_duplicates, item.get("dhash")
+        return self.near_duplicates, item.get("simhash")
+
+    def build_duplicate_index(self, background=True):
+        """Monta os índices de quase iguais fora do lock e troca o conteúdo dos atuais.
+
+        As impressões dos textos gravados antes do agrupamento são calculadas
+        na montagem; enquanto ela não termina, nenhum item é agrupado.
+        """
+        with self.lock:
+            self._duplicates_generation += 1
+            generation = self._duplicates_generation
+            if self.near_duplicates is None and self.image_duplicates is None:
+                self._duplicates_log = None
+                self.duplicates_ready.set()
+                return
+            entries = []
+            for item in reversed(list(self.history)):
+                index, fingerprint = self._duplicates_of(item)
+                if index is None or item.get("blob"):
+                    continue
+                # Imagens antigas ficam de fora (a impressão vem do processamento)
+                if fingerprint is None and item.get("type") != "text":
+                    continue
+                text = item.get("content", "") if fingerprint is None else None
+                entries.append((index, item["hash"], fingerprint, text))
+            self._duplicates_log = []
+            self.duplicates_ready.clear()
+        if background:
+            threading.Thread(target=self._build_duplicates, args=(entries, generation),
+                             name="duplicate-index", daemon=True).start()
+        else:
+            self._build_duplicates(entries, generation)
+
+    def _build_duplicates(self, entries, generation):
+        built = {}
+        computed = {}
+        try:
+            with STATS.timer("history.duplicates_build"):
+                for index, item_hash, fingerprint, text in entries:
+                    if fingerprint is None:
+                        # Textos gravados antes do agrupamento (ou fora dos limites de tamanho)
+                        fingerprint = index.fingerprint(text)
+                        if fingerprint is None:
+                            continue
+                        computed[item_hash] = fingerprint
+                    fresh = built.get(index)
+                    if fresh is None:
+                        fresh = built[index] = FingerprintIndex(index.max_distance)
+                    fresh.add(item_hash, fingerprint)
+        except Exception as e:
+            print(f"Erro ao montar índice de quase iguais: {e}")
+            built = {}
+            computed = {}
+        with self.lock:
+            if generation != self._duplicates_generation:
+                return
+            for index in (self.near_duplicates, self.image_duplicates):
+                if index is not None:
+                    index.replace(built.get(index) or FingerprintIndex(index.max_distance))
+            # Mudanças feitas durante a montagem
+            for op, index, item_hash, fingerprint in self._duplicates_log:
+                if op == "add":
+                    index.add(item_hash, fingerprint)
+                else:
+                    index.remove(item_hash)
+            self._duplicates_log = None
+            saved = 0
+            for item_hash, fingerprint in computed.items():
+                item = self.history.get(item_hash)
+                if item is not None and "simhash" not in item:
+                    item["simhash"] = fingerprint
+                    saved += 1
+            # Persiste as impressões calculadas agora
+            if saved:
+                self.save()
+            self.duplicates_ready.set()
+
+    def _index_duplicate(self, index, item_hash, fingerprint):
+        if self._duplicates_log is None:
+            index.add(item_hash, fingerprint)
+        else:
+            self._duplicates_log.append(("add", index, item_hash, fingerprint))
+
+    def _unindex_duplicate(self, index, item_hash):
+        if self._duplicates_log is None:
+            index.remove(item_hash)
+        else:
+            self._duplicates_log.append(("remove", index, item_hash, None))
+
+    def _same_picture(self, image_hash):
+        """Confirmação dos candidatos a imagem repetida pelas miniaturas."""
+        if self.thumbnails is None:
+            return None
+        thumbnail = self.thumbnails.path_for(image_hash)
+        return lambda other_hash: self.image_duplicates.same_picture(
+            thumbnail, self.thumbnails.path_for(other_hash))
+
+    def collapse_duplicate(self, item, index, fingerprint, accept=None):
+        """Tira do histórico a versão quase igual ao item novo, se houver."""
+        match = index.find(fingerprint, exclude=item["hash"], accept=accept)
+        if match is None:
+            return
+        old_item = self.history.remove(match)
+        if old_item is None:
+            return
+        # A versão nova substitui a antiga (entra no topo logo em seguida)
+        self.retention.remove(match)
+        self.forget(old_item)
+        index.collapsed += 1
+        STATS.count("history.collapsed")
+        print(f"Item quase igual substituído: {item['type']}, hash: {match[:8]}")
+
+    def forget(self, item):
+        """Libera o que pertence a um item já retirado do histórico."""
+        self.store.delete(item.get("hash"))
+        self._unindex_text(item)
+        index, _ = self._duplicates_of(item)
+        if index is not None:
+            self._unindex_duplicate(index, item.get("hash"))
+        if item.get("type") == "image":
+            self.images.release(item.get("content"))
+        elif item.get("blob"):
+            self.blobs.delete(item["hash"])
+
+    def clean(self):
+        """Remove do histórico imagens e textos grandes cujo arquivo não existe mais."""
+        with self.lock:
+            missing = [item["hash"] for item in self.history
+                       if (item.get("type") == "image"
+                           and item.get("content") and not self.images.exists(item["content"]))
+                       or (item.get("blob") and not self.blobs.exists(item["hash"]))]
+
+            for item_hash in missing:
+                removed = self.history.remove(item_hash)
+                self.retention.remove(item_hash)
+                self._unindex_text(removed)
+                index, _ = self._duplicates_of(removed)
+                if index is not None:
+                    self._unindex_duplicate(index, item_hash)
+                if removed.get("type") == "image":
+                    self.images.release(removed.get("content"))
+
+            # Atualiza o histórico
+            self.save()
+
+    def clear(self):
+        """Apaga o histórico e todos os arquivos associados."""
+        with self.lock:
+            self.history.clear()
+            self.retention.clear()
+            for index in (self.near_duplicates, self.image_duplicates):
+                if index is not None:
+                    index.clear()
+            # Descarta uma montagem em andamento
+            self._duplicates_generation += 1
+            self._duplicates_log = None
+            self.duplicates_ready.set()
+            self.store.clear()
+            # Descarta uma montagem em andamento
+            self._fuzzy_generation += 1
+            self._fuzzy_log = None
+            self.fuzzy = TrigramIndex()
+            self.fuzzy_ready.set()
+
+        # Limpa os arquivos de imagens, as miniaturas e os textos grandes
+        self.blobs.clear()
+        self.images.clear()
+        if self.thumbnails is not None:
+            self.thumbnails.clear()
+
+    def item_text(self, item):
+        """Retorna o texto completo do item (lendo do disco se estiver fora de linha)."""
+        if item.get("blob"):
+            try:
+                return self.blobs.read(item["hash"])
+            except OSError as e:
+                print(f"Erro ao ler texto do histórico: {e}")
+                return ""
+        return item.get("content", "")
+
+    def newest(self, count):
+        """Cópias dos `count` itens mais recentes (seguro fora da thread principal)."""
+        with self.lock:
+            return [dict(item) for item in self.history.newest(count)]
+
+    def find(self, item_hash):
+        """Cópia do item com o hash (ou prefixo único do hash) dado, ou None."""
+        with self.lock:
+            item = self.history.get(item_hash)
+            if item is None and item_hash:
+                matches = [item for item in self.history if item["hash"].startswith(item_hash)]
+                item = matches[0] if len(matches) == 1 else None
+            return dict(item) if item is not None else None
+
+    def build_fuzzy_index(self, background=True):
+        """Monta o índice de trigramas do histórico fora do lock e o troca pelo atual."""
+        with self.lock:
+            # Do mais antigo ao mais recente, para os ids seguirem a ordem do histórico
+            texts = [(item["hash"], searchable_text(item)) for item in reversed(list(self.history))
+                     if item.get("type") == "text"]
+            self._fuzzy_generation += 1
+            generation = self._fuzzy_generation
+            self._fuzzy_log = []
+            self.fuzzy = None
+            self.fuzzy_ready.clear()
+        if background:
+            threading.Thread(target=self._build_fuzzy, args=(texts, generation),
+                             name="fuzzy-index", daemon=True).start()
+        else:
+            self._build_fuzzy(texts, generation)
+
+    def _build_fuzzy(self, texts, generation):
+        try:
+            with STATS.timer("search.index_build"):
+                index = TrigramIndex()
+                for item_hash, text in texts:
+                    index.add(item_hash, text)
+                # Bitsets dos trigramas mais comuns: a primeira busca já os encontra prontos
+                index.warm()
+        except Exception as e:
+            print(f"Erro ao montar índice de busca: {e}")
+            index = None
+        # Mudanças feitas durante a montagem: aplicadas fora do lock até sobrarem poucas
+        while True:
+            with self.lock:
+                if generation != self._fuzzy_generation:
+                    return
+                pending, self._fuzzy_log = self._fuzzy_log, []
+                if index is None or len(pending) <= FUZZY_REPLAY_BATCH:
+                    if index is not None:
+                        self._replay_fuzzy(index, pending)
+                    self.fuzzy = index
+                    self._fuzzy_log = None
+                    self.fuzzy_ready.set()
+                    return
+            self._replay_fuzzy(index, pending)
+
+    @staticmethod
+    def _replay_fuzzy(index, pending):
+        for op, item_hash, text in pending:
+            if op == "add":
+                index.add(item_hash, text)
+            else:
+                index.remove(item_hash, text)
+
+    def _index_text(self, item_hash, text):
+        if self.fuzzy is not None:
+            self.fuzzy.add(item_hash, text)
+        elif self._fuzzy_log is not None:
+            self._fuzzy_log.append(("add", item_hash, text))
+
+    def _unindex_text(self, item):
+        item_hash, text = item.get("hash"), searchable_text(item)
+        if self.fuzzy is not None:
+            self.fuzzy.remove(item_hash, text)
+        elif self._fuzzy_log is not None:
+            self._fuzzy_log.append(("remove", item_hash, text))
+
+    def search(self, text, limit=20):
+        """Busca aproximada em memória; o armazenamento fica como alternativa."""
+        results = []
+        with self.lock:
+            # Índice ainda em montagem: só o armazenamento responde
+            if self.fuzzy is not None:
+                matches = self.fuzzy.query(text, limit=limit)
+                results = [self.history.get(item_hash) for item_hash, score in matches]
+                results = [dict(item) for item in results if item is not None]
+        # O armazenamento aguarda as gravações pendentes: fica fora do lock
+        if not results:
+            results = self.store.search(text, limit=limit)
+        return results
+
+    def close(self):
+        """Termina o processamento de imagens, grava o histórico e coleta os órfãos."""
+        # Termina as imagens em processamento para não perdê-las
+        try:
+            self.ingest.shutdown(wait=True)
+            for result in self.ingest.drain():
+                self.finish_image_item(result)
+        except Exception as e:
+            print(f"Erro ao finalizar processamento de imagens: {e}")
+
+        # Grava as mudanças pendentes e fecha o histórico
+        try:
+            self.store.close()
+        except Exception as e:
+            print(f"Erro ao fechar histórico: {e}")
+
+        # Apaga as imagens que não são mais referenciadas pelo histórico
+        try:
+            self.images.collect(None)
+        except Exception as e:
+            print(f"Erro ao coletar imagens: {e}")
@@ -0,0 +1,449 @@
+"""
+Processo auxiliar persistente para osascript, pbpaste e pbcopy.
+
+Cada chamada ao osascript/pbpaste/pbcopy cria um processo novo (o fluxo
+de configurações chega a cinco em sequência). O HelperRunner mantém um
+pequeno grupo de processos auxiliares vivos e envia os pedidos por pipe;
+o auxiliar executa o AppleScript com NSAppleScript e lê/grava o
+pasteboard com NSPasteboard, sem criar processos. Comandos que ele não
+sabe executar em processo são repassados ao subprocess, lá dentro.
+
+Protocolo (stdin/stdout do auxiliar, um pedido por vez):
+    pedido:   {"args": [...], "input": n}\\n + n bytes
+    resposta: {"returncode": r, "stdout": n, "stderr": m}\\n + n + m bytes
+Ao iniciar, o auxiliar escreve {"ready": true}\\n.
+
+Quem chama usa run_command(), com a mesma cara do subprocess.run
+(CompletedProcess, TimeoutExpired, CalledProcessError). O executor é
+substituível com set_runner(): o padrão cria um processo por chamada; o
+app instala o HelperRunner e os benchmarks usam o auxiliar em modo
+substituto (--stand-in), que imita os comandos em memória.
+
+Um auxiliar que estoura o prazo é encerrado (com os processos que ele
+criou) e outro é iniciado no pedido seguinte; um auxiliar que morreu
+antes de receber o pedido é trocado e o pedido é reenviado. O prazo do
+pedido inclui a espera por um auxiliar livre: com todos ocupados, o
+pedido estoura o prazo (TimeoutExpired) sem travar quem chamou.
+"""
+import json
+import os
+import select
+import signal
+import subprocess
+import sys
+import threading
+import time
+
+from instrumentation import STATS
+
+# Padrões da seção "command_helper" da configuração
+DEFAULT_COMMAND_HELPER = {
+    "enabled": True,
+    "pool_size": 2,        # auxiliares vivos ao mesmo tempo (um diálogo aberto ocupa um)
+    "start_timeout": 10,   # segundos para o auxiliar iniciar e responder {"ready": true}
+}
+# Falhas seguidas ao iniciar antes de voltar a um processo por chamada
+MAX_START_FAILURES = 3
+
+READY = b'{"ready": true}\n'
+# errAENoUserInteraction: o AppleScript pediu interação que o auxiliar não oferece
+NO_USER_INTERACTION = -1713
+
+
+class HelperError(OSError):
+    """Auxiliar não iniciou ou morreu no meio de um pedido."""
+
+
+def _completed(args, returncode, stdout, stderr, text, check):
+    if text:
+        stdout = stdout.decode('utf-8', errors='replace')
+        stderr = stderr.decode('utf-8', errors='replace')
+    if check and returncode:
+        raise subprocess.CalledProcessError(returncode, args, stdout, stderr)
+    return subprocess.CompletedProcess(args, returncode, stdout, stderr)
+
+
+class SubprocessRunner:
+    """Executor padrão: um processo novo por chamada."""
+
+    def __init__(self):
+        self.spawns = 0
+        self.requests = 0
+
+    def run(self, args, input=None, timeout=None, text=False, check=False):
+        if isinstance(input, str):
+            input = input.encode('utf-8')
+        self.requests += 1
+        self.spawns += 1
+        STATS.count("subprocess.spawn")
+        result = subprocess.run(args, input=input, capture_output=True, timeout=timeout)
+        return _completed(args, result.returncode, result.stdout, result.stderr, text, check)
+
+    def close(self):
+        pass
+
+
+def default_command():
+    """Linha de comando que inicia o auxiliar com o mesmo interpretador."""
+    return [sys.executable, "-c", "import command_helper; command_helper.main()"]
+
+
+class _Helper:
+    """Um processo auxiliar e a leitura das respostas com prazo."""
+
+    def __init__(self, command, env, start_timeout):
+        # Sessão própria: encerrar o auxiliar encerra também o que ele criou
+        self.process = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                        env=env, start_new_session=True)
+        self._fd = self.process.stdout.fileno()
+        self._buffer = bytearray()
+        try:
+            ready = self._read_line(time.monotonic() + start_timeout)
+        except (HelperError, subprocess.TimeoutExpired) as e:
+            self.kill()
+            raise HelperError(f"auxiliar não iniciou: {e}")
+        if ready != READY:
+            self.kill()
+            raise HelperError(f"resposta inesperada do auxiliar: {ready!r}")
+
+    def request(self, args, data, timeout):
+        header = json.dumps({"args": list(args), "input": len(data)}).encode('utf-8')
+        try:
+            self.process.stdin.write(header + b"\n" + data)
+            self.process.stdin.flush()
+        except (BrokenPipeError, ValueError):
+            # Morreu antes de receber o pedido: pode ser reenviado a outro
+            raise BrokenPipeError("auxiliar encerrado")
+        deadline = None if timeout is None else time.monotonic() + timeout
+        try:
+            response = json.loads(self._read_line(deadline))
+            stdout = self._read_exact(response["stdout"], deadline)
+            stderr = self._read_exact(response["stderr"], deadline)
+        except subprocess.TimeoutExpired:
+            raise subprocess.TimeoutExpired(args, timeout)
+        return response["returncode"], stdout, stderr
+
+    def _fill(self, deadline):
+        if deadline is not None:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not select.select([self._fd], [], [], remaining)[0]:
+                raise subprocess.TimeoutExpired("helper", remaining)
+        chunk = os.read(self._fd, 65536)
+        if not chunk:
+            raise HelperError("auxiliar encerrado")
+        self._buffer += chunk
+
+    def _read_line(self, deadline):
+        while True:
+            end = self._buffer.find(b"\n")
+            if end >= 0:
+                line = bytes(self._buffer[:end + 1])
+                del self._buffer[:end + 1]
+                return line
+            self._fill(deadline)
+
+    def _read_exact(self, size, deadline):
+        while len(self._buffer) < size:
+            self._fill(deadline)
+        data = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        return data
+
+    def kill(self):
+        try:
+            os.killpg(self.process.pid, signal.SIGKILL)
+        except OSError:
+            pass
+        self.process.wait()
+        for pipe in (self.process.stdin, self.process.stdout):
+            try:
+                pipe.close()
+            except OSError:
+                pass
+
+    def close(self):
+        # EOF no stdin encerra o laço do auxiliar
+        try:
+            self.process.stdin.close()
+            self.process.wait(timeout=1)
+        except (OSError, subprocess.TimeoutExpired):
+            pass
+        self.kill()
+
+
+class HelperRunner:
+    """Executor que envia os comandos a auxiliares persistentes."""
+
+    def __init__(self, command=None, size=DEFAULT_COMMAND_HELPER["pool_size"],
+                 start_timeout=DEFAULT_COMMAND_HELPER["start_timeout"]):
+        self.command = command or default_command()
+        self.size = size
+        self.start_timeout = start_timeout
+        # O auxiliar importa este módulo do mesmo diretório (ou zip do app)
+        self.env = dict(os.environ)
+        here = os.path.dirname(os.path.abspath(__file__))
+        self.env["PYTHONPATH"] = os.pathsep.join(filter(None, [here, self.env.get("PYTHONPATH")]))
+        self._idle = []
+        self._alive = 0
+        self._cond = threading.Condition()
+        self._fallback = SubprocessRunner()
+        self._closed = False
+        self.failures = 0  # falhas seguidas ao iniciar
+        self.spawns = 0
+        self.restarts = 0
+        self.requests = 0
+
+    @classmethod
+    def from_config(cls, config=None):
+        """Cria o executor a partir da seção "command_helper" (None se desativado)."""
+        merged = dict(DEFAULT_COMMAND_HELPER)
+        merged.update(config or {})
+        if not merged["enabled"]:
+            return None
+        return cls(size=merged["pool_size"], start_timeout=merged["start_timeout"])
+
+    def start(self):
+        """Inicia um auxiliar antes do primeiro pedido (fora da thread principal)."""
+        try:
+            self._release(self._acquire())
+        except HelperError as e:
+            print(f"Erro ao iniciar processo auxiliar: {e}")
+
+    def run(self, args, input=None, timeout=None, text=False, check=False):
+        if self.failures >= MAX_START_FAILURES:
+            return self._fallback.run(args, input, timeout, text, check)
+        data = input.encode('utf-8') if isinstance(input, str) else (input or b"")
+        self.requests += 1
+        # O prazo vale também para a espera por um auxiliar livre
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for attempt in range(2):
+            try:
+                helper = self._acquire(deadline)
+            except HelperError as e:
+                print(f"Erro ao iniciar processo auxiliar: {e}")
+                return self._fallback.run(args, input, timeout, text, check)
+            except subprocess.TimeoutExpired:
+                raise subprocess.TimeoutExpired(args, timeout)
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                # Livre só no fim do prazo: devolve sem encerrar um auxiliar saudável
+                self._release(helper)
+                raise subprocess.TimeoutExpired(args, timeout)
+            try:
+                with STATS.timer("helper.request"):
+                    returncode, stdout, stderr = helper.request(args, data, remaining)
+            except BrokenPipeError:
+                self._discard(helper)
+                if attempt:
+                    raise HelperError("auxiliar encerrado")
+                continue
+            except BaseException:
+                # Prazo estourado ou auxiliar morto no meio do pedido
+                self._discard(helper)
+                raise
+            self._release(helper)
+            return _completed(args, returncode, stdout, stderr, text, check)
+
+    def close(self):
+        """Encerra todos os auxiliares (os ocupados são encerrados ao terminar)."""
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._alive -= len(idle)
+            self._cond.notify_all()
+        for helper in idle:
+            helper.close()
+
+    def _acquire(self, deadline=None):
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise HelperError("executor encerrado")
+                if self._idle:
+                    return self._idle.pop()
+                if self._alive < self.size:
+                    self._alive += 1
+                    break
+                if deadline is None:
+                    self._cond.wait()
+                    continue
+                # Todos ocupados (diálogo aberto, imagem grande): espera até o prazo
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    STATS.count("helper.pool_timeout")
+                    raise subprocess.TimeoutExpired("helper", 0)
+                self._cond.wait(remaining)
+        try:
+            helper = _Helper(self.command, self.env, self.start_timeout)
+        except (HelperError, OSError) as e:
+            with self._cond:
+                self._alive -= 1
+                self.failures += 1
+                self._cond.notify()
+            raise HelperError(str(e))
+        self.failures = 0
+        self.spawns += 1
+        STATS.count("subprocess.spawn")
+        return helper
+
+    def _release(self, helper):
+        with self._cond:
+            if not self._closed:
+                self._idle.append(helper)
+                self._cond.notify()
+                return
+            self._alive -= 1
+        helper.close()
+
+    def _discard(self, helper):
+        helper.kill()
+        self.restarts += 1
+        STATS.count("helper.restart")
+        with self._cond:
+            self._alive -= 1
+            self._cond.notify()
+
+
+# Executor em uso (substituível com set_runner)
+_runner = SubprocessRunner()
+
+
+def set_runner(runner):
+    """Troca o executor dos comandos; retorna o anterior."""
+    global _runner
+    previous, _runner = _runner, runner
+    return previous
+
+
+def get_runner():
+    return _runner
+
+
+def run_command(args, input=None, timeout=None, text=False, check=False):
+    """Executa o comando com o executor atual (interface do subprocess.run)."""
+    return _runner.run(args, input=input, timeout=timeout, text=text, check=check)
+
+
+# --- Lado do auxiliar ---
+
+def native_handlers():
+    """Comandos executados dentro do auxiliar com as APIs do macOS."""
+    from AppKit import NSPasteboard, NSPasteboardTypeString
+    from Foundation import NSAppleScript
+
+    def osascript(args, data):
+        # Só a forma usada pelo app: osascript -e <linha> [-e <linha> ...]
+        if not args or len(args) % 2 or any(flag != '-e' for flag in args[0::2]):
+            return None
+        script = NSAppleScript.alloc().initWithSource_('\n'.join(args[1::2]))
+        result, error = script.executeAndReturnError_(None)
+        if result is None:
+            error = error or {}
+            if error.get("NSAppleScriptErrorNumber") == NO_USER_INTERACTION:
+                # Diálogo fora do System Events: só o osascript pode mostrá-lo
+                return None
+            message = error.get("NSAppleScriptErrorMessage", "erro")
+            return 1, b"", f"{message}\n".encode('utf-8')
+        return 0, f"{result.stringValue() or ''}\n".encode('utf-8'), b""
+
+    def pbpaste(args, data):
+        pb = NSPasteboard.generalPasteboard()
+        if len(args) == 2 and args[0] == '-Prefer' and '.' in args[1]:
+            # Tipo UTI (public.png, public.tiff): lê os bytes direto
+            content = pb.dataForType_(args[1])
+            return (0, bytes(content), b"") if content else (1, b"", b"")
+        if args:
+            return None
+        text = pb.stringForType_(NSPasteboardTypeString)
+        return 0, (str(text) if text else "").encode('utf-8'), b""
+
+    def pbcopy(args, data):
+        try:
+            text = data.decode('utf-8')
+        except UnicodeDecodeError:
+            return None
+        if args:
+            return None
+        pb = NSPasteboard.generalPasteboard()
+        pb.clearContents()
+        return (0 if pb.setString_forType_(text, NSPasteboardTypeString) else 1), b"", b""
+
+    return {"osascript": osascript, "pbpaste": pbpaste, "pbcopy": pbcopy}
+
+
+def stand_in_handlers():
+    """Comandos imitados em memória (benchmarks e testes fora do macOS)."""
+    clipboard = [b""]
+
+    def pbcopy(args, data):
+        clipboard[0] = data
+        return 0, b"", b""
+
+    def pbpaste(args, data):
+        return 0, clipboard[0], b""
+
+    def osascript(args, data):
+        return 0, b"\n", b""
+
+    def sleep(args, data):
+        time.sleep(float(args[0]))
+        return 0, b"", b""
+
+    return {"osascript": osascript, "pbpaste": pbpaste, "pbcopy": pbcopy, "sleep": sleep}
+
+
+def _execute(handlers, args, data):
+    handler = handlers.get(args[0]) if args else None
+    try:
+        if handler is not None:
+            result = handler(args[1:], data)
+            if result is not None:
+                return result
+        process = subprocess.run(args, input=data, capture_output=True)
+        return process.returncode, process.stdout, process.stderr
+    except FileNotFoundError as e:
+        return 127, b"", f"{e}\n".encode('utf-8')
+    except Exception as e:
+        return 1, b"", f"{e}\n".encode('utf-8')
+
+
+def serve(handlers, stdin, stdout):
+    """Atende pedidos até o fim do stdin."""
+    stdout.write(READY)
+    stdout.flush()
+    while True:
+        line = stdin.readline()
+        if not line:
+            return
+        request = json.loads(line)
+        data = stdin.read(request.get("input", 0))
+        returncode, out, err = _execute(handlers, request["args"], data)
+        header = json.dumps({"returncode": returncode, "stdout": len(out), "stderr": len(err)})
+        stdout.write(header.encode('utf-8') + b"\n" + out + err)
+        stdout.flush()
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    stdin, stdout = sys.stdin.buffer, sys.stdout.buffer
+    # Nada além das respostas pode sair no stdout
+    sys.stdout = sys.stderr
+    if "--stand-in" in argv:
+        handlers = stand_in_handlers()
+    else:
+        try:
+            handlers = native_handlers()
+        except ImportError:
+            # Sem PyObjC: repassa tudo ao subprocess
+            handlers = {}
+    # O app encerra o auxiliar pelo pipe; Ctrl+C no terminal não deve gerar traceback
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    try:
+        serve(handlers, stdin, stdout)
+    except BrokenPipeError:
+        # O app encerrou sem fechar o auxiliar
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""
+Hash do conteúdo copiado (texto e imagens).
+
+Usa BLAKE2b com digest de 128 bits sobre qualquer objeto com buffer
+(bytes, memoryview, NSData), sem copiar os dados. O ganho vem de evitar a
+cópia, não do algoritmo: no `benchmark.py hash` (16 MiB) o BLAKE2b fica
+em ~590 MiB/s, o MD5 em ~550 MiB/s e o MD5 com a cópia de antes em ~420
+MiB/s. O SHA-256 é mais rápido (~1200 MiB/s) só em CPUs com instruções
+SHA, que nem todo Mac tem.
+
+Os hashes novos levam o prefixo "b2-" para não se confundirem com os MD5
+gravados pelas versões anteriores. Textos são migrados na leitura; as
+imagens antigas guardam o MD5 dos bytes originais, que só existem de
+novo quando a mesma imagem é copiada outra vez (ver `legacy_hash`).
+"""
+import hashlib
+
+from instrumentation import STATS
+
+HASH_PREFIX = "b2-"
+
+
+def content_hash(data):
+    """Retorna o hash de `data` (bytes ou qualquer objeto com buffer)."""
+    if STATS.enabled:
+        STATS.count("hash.bytes", memoryview(data).nbytes)
+    return HASH_PREFIX + hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def text_hash(text):
+    """Retorna o hash de um texto já normalizado."""
+    return content_hash(text.encode('utf-8', 'ignore'))
+
+
+def legacy_hash(data):
+    """Hash MD5 usado pelas versões anteriores (para achar imagens antigas)."""
+    return hashlib.md5(data).hexdigest()
+
+
+def is_legacy_hash(item_hash):
+    """Indica se o hash foi gerado pelas versões anteriores (MD5)."""
+    return bool(item_hash) and not item_hash.startswith(HASH_PREFIX)
+
+
+def upgrade_legacy_hash(item):
+    """Recalcula o hash MD5 de um item de texto; retorna True se mudou.
+
+    Imagens mantêm o hash MD5 (é também o nome do arquivo gravado).
+    """
+    if item.get("type") != "text" or not is_legacy_hash(item.get("hash")):
+        return False
+    item["hash"] = text_hash(item.get("content", ""))
+    return True
@@ -0,0 +1,249 @@
+"""
+Índice de trigramas em memória para a filtragem aproximada do histórico.
+
+Cada texto (normalizado: minúsculas, sem acentos, espaços colapsados) é
+quebrado em trigramas; o índice invertido guarda, por trigrama (um
+código inteiro), os ids dos documentos que o contêm em um array('I'),
+4 bytes por ocorrência. Ids crescem a cada inserção, então id maior
+significa item mais recente. Nada é guardado por documento além do id:
+a remoção recalcula os trigramas a partir do texto.
+
+Na consulta, as listas dos trigramas da busca viram bitsets (inteiros do
+Python, em cache) e são somadas por um contador "bit-sliced": cada bit
+de cada plano é o bit de uma contagem, e as operações são AND/XOR sobre
+o histórico inteiro de uma vez. Os resultados saem por faixa de trigramas
+em comum e, dentro da faixa, do mais recente ao mais antigo. Isso tolera
+erros de digitação e encontra trechos no meio das palavras.
+
+Montar o bitset de um trigrama comum custa alguns milissegundos com 50
+mil itens; warm() monta os dos trigramas mais frequentes logo depois da
+montagem do índice (fora da thread da UI), e add() os mantém em dia.
+Trigramas raros são montados na hora, bit a bit.
+"""
+import unicodedata
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict, deque
+from itertools import repeat
+
+# Só o início de cada texto entra no índice
+INDEX_PREFIX = 2048
+# Fração mínima dos trigramas da busca que o item precisa ter
+MIN_SCORE = 0.5
+# Bitsets mantidos em cache (os trigramas consultados recentemente)
+BITSET_CACHE = 2048
+
+
+class _Fold(dict):
+    """Tabela para str.translate que tira acentos, preenchida sob demanda."""
+
+    def __missing__(self, code):
+        decomposed = unicodedata.normalize('NFKD', chr(code))
+        folded = ''.join(c for c in decomposed if not unicodedata.combining(c))
+        self[code] = folded
+        return folded
+
+
+_FOLD = _Fold()
+# Converte um byte por item (0/1) em dígitos binários
+_BINARY_DIGITS = bytes.maketrans(b"\x00\x01", b"01")
+
+
+def searchable_text(item):
+    """Texto pesquisável do item (a prévia, para textos guardados fora de linha)."""
+    if item.get("type") != "text":
+        return ""
+    return item.get("preview", "") if item.get("blob") else item.get("content", "")
+
+
+def normalize(text):
+    """Minúsculas, sem acentos e com espaços colapsados."""
+    text = text[:INDEX_PREFIX].lower()
+    if not text.isascii():
+        text = text.translate(_FOLD)
+    return ' '.join(text.split())
+
+
+def trigrams(text):
+    """Trigramas de um texto já normalizado, com bordas no início e no fim."""
+    if not text:
+        return set()
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _bitset(ids, size):
+    if len(ids) * 16 < size:
+        # Poucos ids: liga os bits direto em um buffer de size/8 bytes
+        buf = bytearray((size >> 3) + 1)
+        for doc_id in ids:
+            buf[doc_id >> 3] |= 1 << (doc_id & 7)
+        return int.from_bytes(buf, 'little')
+    # Loop em C: um byte por item, depois conversão direta para inteiro
+    buf = bytearray(size)
+    deque(map(buf.__setitem__, ids, repeat(1)), maxlen=0)
+    return int(buf.translate(_BINARY_DIGITS)[::-1], 2)
+
+
+class TrigramIndex:
+    """Índice invertido de trigramas com consulta aproximada ordenada."""
+
+    def __init__(self, min_score=MIN_SCORE):
+        self.min_score = min_score
+        self._grams = {}             # trigrama -> código (int)
+        self._postings = []          # código -> array('I') de ids, em ordem crescente
+        self._bits = OrderedDict()   # código -> bitset (cache LRU)
+        self._docs = {}              # hash -> id
+        self._hashes = {}            # id -> hash
+        self._next_id = 0
+
+    def __len__(self):
+        return len(self._docs)
+
+    def __contains__(self, item_hash):
+        return item_hash in self._docs
+
+    def _codes(self, text, create=False):
+        """Códigos dos trigramas do texto (criados sob demanda com `create`)."""
+        codes = []
+        for gram in trigrams(normalize(text)):
+            code = self._grams.get(gram)
+            if code is None:
+                if not create:
+                    continue
+                code = self._grams[gram] = len(self._postings)
+                self._postings.append(array('I'))
+            codes.append(code)
+        return codes
+
+    def add(self, item_hash, text):
+        """Indexa (ou reindexa como mais recente) o texto do item."""
+        if item_hash in self._docs:
+            self.remove(item_hash, text)
+        if self._next_id > 2 * len(self._docs) + 1024:
+            self._renumber()
+        doc_id = self._next_id
+        self._next_id += 1
+        codes = self._codes(text, create=True)
+        # Ids sempre crescem: o append mantém cada lista ordenada
+        postings = self._postings
+        for code in codes:
+            postings[code].append(doc_id)
+        if self._bits:
+            bit = 1 << doc_id
+            for code in codes:
+                if code in self._bits:
+                    self._bits[code] |= bit
+        self._docs[item_hash] = doc_id
+        self._hashes[doc_id] = item_hash
+
+    def remove(self, item_hash, text):
+        """Tira o item do índice (retenção ou remoção manual).
+
+        `text` é o mesmo texto indexado: os trigramas são recalculados dele.
+        Um id que sobrar em alguma lista é ignorado na consulta e some na
+        próxima renumeração.
+        """
+        doc_id = self._docs.pop(item_hash, None)
+        if doc_id is None:
+            return
+        del self._hashes[doc_id]
+        mask = ~(1 << doc_id)
+        for code in self._codes(text):
+            ids = self._postings[code]
+            pos = bisect_left(ids, doc_id)
+            if pos < len(ids) and ids[pos] == doc_id:
+                del ids[pos]
+            if code in self._bits:
+                if ids:
+                    self._bits[code] &= mask
+                else:
+                    del self._bits[code]
+
+    def clear(self):
+        self._grams.clear()
+        self._postings.clear()
+        self._bits.clear()
+        self._docs.clear()
+        self._hashes.clear()
+        self._next_id = 0
+
+    def query(self, text, limit=20):
+        """Retorna [(hash, pontuação)] dos itens mais parecidos com `text`.
+
+        A pontuação é a fração dos trigramas da busca presentes no item.
+        """
+        grams = trigrams(normalize(text))
+        if not grams:
+            return []
+        needed = max(1, int(len(grams) * self.min_score + 0.999))
+        codes = [self._grams.get(gram) for gram in grams]
+        postings = [self._bitset_for(code) for code in codes
+                    if code is not None and self._postings[code]]
+        if len(postings) < needed:
+            return []
+
+        # Contador bit-sliced: planes[i] guarda o bit i da contagem de cada item
+        planes = []
+        for bits in postings:
+            carry = bits
+            for i in range(len(planes)):
+                if not carry:
+                    break
+                planes[i], carry = planes[i] ^ carry, planes[i] & carry
+            if carry:
+                planes.append(carry)
+
+        universe = (1 << self._next_id) - 1
+        hashes = self._hashes
+        results = []
+        for count in range(len(postings), needed - 1, -1):
+            if count >> len(planes):
+                # Nenhum item chega a essa contagem (sem plano para o bit mais alto)
+                continue
+            mask = universe
+            for i, plane in enumerate(planes):
+                mask &= plane if count >> i & 1 else ~plane
+                if not mask:
+                    break
+            # Dentro da faixa, do mais recente para o mais antigo
+            while mask and len(results) < limit:
+                doc_id = mask.bit_length() - 1
+                mask ^= 1 << doc_id
+                item_hash = hashes.get(doc_id)
+                if item_hash is not None:
+                    results.append((item_hash, count / len(grams)))
+            if len(results) >= limit:
+                break
+        return results
+
+    def warm(self, count=BITSET_CACHE):
+        """Monta os bitsets dos `count` trigramas mais frequentes (os mais caros)."""
+        postings = self._postings
+        common = sorted(range(len(postings)), key=lambda code: len(postings[code]), reverse=True)
+        for code in reversed(common[:count]):
+            if postings[code]:
+                self._bitset_for(code)
+
+    def _bitset_for(self, code):
+        bits = self._bits.get(code)
+        if bits is None:
+            bits = _bitset(self._postings[code], self._next_id)
+            self._bits[code] = bits
+            if len(self._bits) > BITSET_CACHE:
+                self._bits.popitem(last=False)
+        else:
+            self._bits.move_to_end(code)
+        return bits
+
+    def _renumber(self):
+        """Recompacta os ids (mantendo a ordem) para os bitsets não crescerem."""
+        alive = sorted(self._hashes)
+        renumbered = dict(zip(alive, range(len(alive))))
+        for code, ids in enumerate(self._postings):
+            self._postings[code] = array('I', map(renumbered.__getitem__,
+                                                  filter(renumbered.__contains__, ids)))
+        self._bits.clear()
+        self._hashes = {renumbered[doc_id]: item_hash for doc_id, item_hash in self._hashes.items()}
+        self._docs = {item_hash: doc_id for doc_id, item_hash in self._hashes.items()}
+        self._next_id = len(alive)
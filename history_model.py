@@ -0,0 +1,89 @@
+"""
+Histórico em memória indexado pelo hash do conteúdo.
+
+Os itens ficam em um OrderedDict (hash -> item) do mais antigo ao mais
+recente: verificar duplicatas é uma consulta no dicionário e levar um
+item recopiado ao topo é um move_to_end, ambos O(1).
+
+Os timestamps são inteiros (segundos desde a época) e a ordem de
+inserção é também a ordem cronológica, então nada precisa ser ordenado.
+"""
+import time
+from collections import OrderedDict
+from itertools import islice
+
+from content_hash import upgrade_legacy_hash
+
+# Formato usado pelas versões anteriores ("2025-05-01 12:00:00")
+LEGACY_TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def to_epoch(value):
+    """Converte um timestamp (inteiro ou texto legado) em segundos desde a época."""
+    if isinstance(value, (int, float)):
+        return int(value)
+    try:
+        return int(time.mktime(time.strptime(value, LEGACY_TIMESTAMP_FORMAT)))
+    except (TypeError, ValueError):
+        return 0
+
+
+class History:
+    """Lista de itens do histórico (mais recente primeiro) com índice por hash."""
+
+    def __init__(self, items=()):
+        self._items = OrderedDict()
+        self.migrated = 0  # itens convertidos de formatos legados (timestamp, hash)
+        # Os itens chegam do mais recente para o mais antigo
+        for item in reversed(list(items)):
+            if not item.get("hash"):
+                continue
+            migrated = upgrade_legacy_hash(item)
+            if not isinstance(item.get("timestamp"), int):
+                item["timestamp"] = to_epoch(item.get("timestamp"))
+                migrated = True
+            if item["hash"] in self._items:
+                continue
+            self.migrated += migrated
+            self._items[item["hash"]] = item
+
+    def __len__(self):
+        return len(self._items)
+
+    def __iter__(self):
+        """Percorre os itens do mais recente para o mais antigo."""
+        return reversed(self._items.values())
+
+    def __contains__(self, item_hash):
+        return item_hash in self._items
+
+    def get(self, item_hash):
+        """Retorna o item com o hash dado ou None."""
+        return self._items.get(item_hash)
+
+    def newest(self, count):
+        """Retorna os `count` itens mais recentes."""
+        return list(islice(reversed(self._items.values()), count))
+
+    def newest_timestamp(self):
+        """Retorna o timestamp do item mais recente (0 se vazio)."""
+        if not self._items:
+            return 0
+        return next(reversed(self._items.values())).get("timestamp", 0)
+
+    def add(self, item):
+        """Insere o item no topo (ou move para o topo se já existir)."""
+        # Mantém a ordem cronológica mesmo se o relógio voltar
+        newest = self.newest_timestamp()
+        if item.get("timestamp", 0) < newest:
+            item["timestamp"] = newest
+        item_hash = item["hash"]
+        self._items[item_hash] = item
+        self._items.move_to_end(item_hash)
+
+    def remove(self, item_hash):
+        """Remove e retorna o item com o hash dado (ou None)."""
+        return self._items.pop(item_hash, None)
+
+    def clear(self):
+        self._items.clear()
@@ -0,0 +1,155 @@
+"""
+Histórico em SQLite com índice FTS5 sobre o conteúdo dos textos.
+
+Alternativa opcional ao journal (config "history_backend": "sqlite"),
+com a mesma interface de armazenamento mais uma busca textual ordenada
+por relevância (bm25).
+"""
+import json
+import os
+import sqlite3
+import threading
+
+from fuzzy_index import searchable_text
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS items (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    hash TEXT NOT NULL UNIQUE,
+    type TEXT NOT NULL,
+    body TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS items_fts USING fts5(
+    body, content='items', content_rowid='seq', prefix='2 3',
+    tokenize='unicode61 remove_diacritics 2'
+);
+CREATE TRIGGER IF NOT EXISTS items_ai AFTER INSERT ON items BEGIN
+    INSERT INTO items_fts(rowid, body) VALUES (new.seq, new.body);
+END;
+CREATE TRIGGER IF NOT EXISTS items_ad AFTER DELETE ON items BEGIN
+    INSERT INTO items_fts(items_fts, rowid, body) VALUES ('delete', old.seq, old.body);
+END;
+"""
+
+
+def fts_query(text):
+    """Converte o texto digitado em uma consulta FTS5 (prefixo por termo)."""
+    terms = [t.replace('"', '""') for t in text.split()]
+    return ' '.join(f'"{t}"*' for t in terms if t)
+
+
+def _body(item):
+    # Só o conteúdo de textos entra no índice (imagens guardam um caminho);
+    # textos grandes, guardados fora de linha, são indexados pela prévia
+    return searchable_text(item)
+
+
+class SQLiteHistoryStore:
+    """Histórico persistido em SQLite (WAL) com busca FTS5."""
+
+    def __init__(self, path):
+        self.path = path
+        self._conn = None
+        self._lock = threading.Lock()
+        self.writes = 0  # transações gravadas (para medições)
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def _connect(self):
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            # WAL mantém as inserções baratas o bastante para o timer
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def load(self):
+        """Retorna os itens (mais recente primeiro)."""
+        with self._lock:
+            rows = self._connect().execute("SELECT data FROM items ORDER BY seq DESC").fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def append(self, item):
+        """Insere um item novo (ou reinserido) no topo do histórico."""
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.execute("DELETE FROM items WHERE hash = ?", (item["hash"],))
+                conn.execute(
+                    "INSERT INTO items (hash, type, body, data) VALUES (?, ?, ?, ?)",
+                    (item["hash"], item.get("type", ""), _body(item),
+                     json.dumps(item, ensure_ascii=False))
+                )
+
+    def apply_batch(self, ops):
+        """Aplica várias mutações ("add", item) / ("del", hash) em uma transação."""
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                for op, value in ops:
+                    if op == "add":
+                        conn.execute("DELETE FROM items WHERE hash = ?", (value["hash"],))
+                        conn.execute(
+                            "INSERT INTO items (hash, type, body, data) VALUES (?, ?, ?, ?)",
+                            (value["hash"], value.get("type", ""), _body(value),
+                             json.dumps(value, ensure_ascii=False))
+                        )
+                    elif op == "del":
+                        conn.execute("DELETE FROM items WHERE hash = ?", (value,))
+            self.writes += 1
+
+    def delete(self, item_hash):
+        """Remove um item pelo hash."""
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.execute("DELETE FROM items WHERE hash = ?", (item_hash,))
+
+    def clear(self):
+        """Remove todos os itens."""
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.execute("DELETE FROM items")
+                conn.execute("INSERT INTO items_fts(items_fts) VALUES ('rebuild')")
+
+    def rewrite(self, items):
+        """Substitui o conteúdo pelos itens dados (mais recente primeiro)."""
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.execute("DELETE FROM items")
+                conn.executemany(
+                    "INSERT OR IGNORE INTO items (hash, type, body, data) VALUES (?, ?, ?, ?)",
+                    [(item["hash"], item.get("type", ""), _body(item),
+                      json.dumps(item, ensure_ascii=False))
+                     for item in reversed(items) if item.get("hash")]
+                )
+                conn.execute("INSERT INTO items_fts(items_fts) VALUES ('rebuild')")
+
+    def search(self, text, limit=20):
+        """Retorna os itens de texto que casam com a busca, por relevância."""
+        query = fts_query(text)
+        if not query:
+            return []
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT items.data FROM items_fts "
+                "JOIN items ON items.seq = items_fts.rowid "
+                "WHERE items_fts MATCH ? ORDER BY rank LIMIT ?",
+                (query, limit)
+            ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
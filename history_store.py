@@ -0,0 +1,446 @@
+"""
+Armazenamento do histórico em um log apenas de anexação (journal).
+
+Cada linha do arquivo é um registro JSON:
+    {"op": "add", "item": {...}}   novo item (ou item reinserido)
+    {"op": "del", "hash": "..."}   remoção (tombstone)
+    {"op": "clear"}                limpeza completa (tombstone)
+
+Copiar um item custa uma linha anexada em vez de reescrever o histórico
+inteiro. Quando o lixo (registros que não descrevem mais itens vivos)
+passa do limite, uma compactação em segundo plano grava os itens vivos
+em um snapshot comprimido (history_codec) e o log recomeça vazio. Na
+inicialização o snapshot é lido e o log é reproduzido por cima dele.
+
+O log começa com {"op": "base", "generation": N}. O snapshot registra a
+geração e o offset do log que ele cobre: se a troca do log for
+interrompida, o log antigo é reproduzido só a partir desse offset.
+
+O HistoryWriter tira a persistência do timer: as mutações vão para uma
+fila e uma thread dedicada grava cada rajada de uma vez só.
+"""
+import json
+import os
+import queue
+import threading
+from collections import OrderedDict
+
+from fuzzy_index import searchable_text
+from instrumentation import STATS
+from history_codec import encode_history, read_history_file, read_snapshot
+
+# Compacta quando o lixo passa de max(COMPACT_MIN_GARBAGE, vivos * COMPACT_RATIO)
+COMPACT_MIN_GARBAGE = 200
+COMPACT_RATIO = 1.0
+
+# Janela (segundos) em que mutações seguidas são agrupadas em uma gravação
+WRITE_DEBOUNCE = 0.5
+
+
+def _encode(record):
+    return json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n'
+
+
+def _write_atomic(path, data):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class HistoryJournal:
+    """Histórico persistido como log de registros com compactação."""
+
+    def __init__(self, path, min_garbage=COMPACT_MIN_GARBAGE, ratio=COMPACT_RATIO,
+                 snapshot_path=None, codec="zlib"):
+        self.path = path
+        self.snapshot_path = snapshot_path or os.path.splitext(path)[0] + '.snapshot'
+        self.codec = codec
+        self.min_garbage = min_garbage
+        self.ratio = ratio
+        self._live = OrderedDict()  # hash -> item, do mais antigo ao mais recente
+        self._records = 0
+        self._generation = 1  # geração do log atual
+        self._offset = 0      # tamanho do log atual em bytes
+        self._lock = threading.Lock()
+        self._file = None
+        self._compacting = None  # registros anexados durante a compactação
+        self._compact_thread = None
+        self.writes = 0  # gravações no arquivo (para medições)
+        self.bytes_written = 0
+
+    @property
+    def garbage(self):
+        """Número de registros no log que não descrevem itens vivos."""
+        return self._records - len(self._live)
+
+    def exists(self):
+        return os.path.exists(self.path) or os.path.exists(self.snapshot_path)
+
+    def load(self):
+        """Lê o snapshot, reproduz o log e retorna os itens (mais recente primeiro)."""
+        live = OrderedDict()
+        records = 0
+        snapshot_generation = 0
+        snapshot_offset = 0
+        if os.path.exists(self.snapshot_path):
+            snapshot = read_snapshot(self.snapshot_path)
+            snapshot_generation = snapshot.get("generation", 0)
+            snapshot_offset = snapshot.get("offset", 0)
+            for item in reversed(snapshot["items"]):
+                live[item["hash"]] = item
+            records = len(live)
+        generation = snapshot_generation + 1
+        offset = 0
+        torn = False
+        if os.path.exists(self.path):
+            with open(self.path, 'rb') as f:
+                first = f.readline()
+                try:
+                    base = json.loads(first)
+                except ValueError:
+                    base = {}
+                # Log sem cabeçalho: formato anterior, geração 0
+                generation = base.get("generation", 0) if base.get("op") == "base" else 0
+                if generation == snapshot_generation and snapshot_offset:
+                    # A troca do log não terminou: o início já está no snapshot
+                    f.seek(snapshot_offset)
+                else:
+                    if generation != snapshot_generation + 1 and snapshot_generation:
+                        print("Journal do histórico não corresponde ao snapshot; reproduzindo tudo")
+                    f.seek(0)
+                offset = f.tell()
+                for line in f:
+                    if not line.endswith(b'\n'):
+                        # Última linha sem fim (queda durante a escrita): cortada abaixo
+                        print("Registro incompleto descartado no fim do journal do histórico")
+                        break
+                    offset += len(line)
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        print("Registro inválido ignorado no journal do histórico")
+                        continue
+                    op = record.get("op")
+                    if op == "base":
+                        continue
+                    records += 1
+                    if op == "add":
+                        item = record.get("item") or {}
+                        item_hash = item.get("hash")
+                        if item_hash:
+                            live.pop(item_hash, None)
+                            live[item_hash] = item
+                    elif op == "del":
+                        live.pop(record.get("hash"), None)
+                    elif op == "clear":
+                        live.clear()
+                torn = f.seek(0, os.SEEK_END) > offset
+            if torn:
+                # Sem o corte, o próximo registro seria anexado à linha incompleta
+                # e se perderia na leitura seguinte
+                with open(self.path, 'r+b') as f:
+                    f.truncate(offset)
+                if offset == 0:
+                    generation = snapshot_generation + 1
+        with self._lock:
+            self._live = live
+            self._records = records
+            self._generation = generation
+            self._offset = offset
+        return list(reversed(live.values()))
+
+    def append(self, item):
+        """Anexa um item novo (ou reinserido) ao log."""
+        with self._lock:
+            self._live.pop(item["hash"], None)
+            self._live[item["hash"]] = item
+            self._write(_encode({"op": "add", "item": item}))
+        self.maybe_compact()
+
+    def delete(self, item_hash):
+        """Registra a remoção de um item."""
+        with self._lock:
+            if self._live.pop(item_hash, None) is None:
+                return
+            self._write(_encode({"op": "del", "hash": item_hash}))
+        self.maybe_compact()
+
+    def clear(self):
+        """Registra a limpeza completa do histórico."""
+        with self._lock:
+            self._live.clear()
+            self._write(_encode({"op": "clear"}))
+        self.maybe_compact()
+
+    def apply_batch(self, ops):
+        """Grava várias mutações ("add", item) / ("del", hash) de uma vez."""
+        chunks = []
+        with self._lock:
+            for op, value in ops:
+                if op == "add":
+                    self._live.pop(value["hash"], None)
+                    self._live[value["hash"]] = value
+                    chunks.append(_encode({"op": "add", "item": value}))
+                elif op == "del" and self._live.pop(value, None) is not None:
+                    chunks.append(_encode({"op": "del", "hash": value}))
+            if chunks:
+                self._write(''.join(chunks), len(chunks))
+        self.maybe_compact()
+
+    def rewrite(self, items):
+        """Substitui o histórico pelos itens dados (mais recente primeiro)."""
+        self.wait_compaction()
+        with self._lock:
+            self._live = OrderedDict((item["hash"], item) for item in reversed(items) if item.get("hash"))
+            snapshot = list(self._live.values())
+            position = (self._generation, self._offset)
+        self._replace_file(snapshot, position)
+
+    def search(self, text, limit=20):
+        """Busca linear (sem diferenciar maiúsculas) nos itens de texto."""
+        terms = text.lower().split()
+        if not terms:
+            return []
+        with self._lock:
+            items = list(reversed(self._live.values()))
+        results = []
+        for item in items:
+            if item.get("type") != "text":
+                continue
+            content = searchable_text(item).lower()
+            if all(term in content for term in terms):
+                results.append(item)
+                if len(results) >= limit:
+                    break
+        return results
+
+    def maybe_compact(self):
+        """Inicia a compactação em segundo plano se o lixo passou do limite."""
+        with self._lock:
+            if self._compacting is not None:
+                return False
+            if self.garbage < max(self.min_garbage, len(self._live) * self.ratio):
+                return False
+            self._compacting = []
+            snapshot = list(self._live.values())
+            position = (self._generation, self._offset)
+        self._compact_thread = threading.Thread(target=self._compact, args=(snapshot, position), daemon=True)
+        self._compact_thread.start()
+        return True
+
+    def wait_compaction(self, timeout=None):
+        """Aguarda o término de uma compactação em andamento."""
+        thread = self._compact_thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def close(self):
+        """Aguarda a compactação e fecha o arquivo."""
+        self.wait_compaction()
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def _base_record(self, generation):
+        return _encode({"op": "base", "generation": generation}).encode('utf-8')
+
+    def _write(self, data, records=1):
+        # Deve ser chamado com o lock adquirido
+        if self._file is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._file = open(self.path, 'ab')
+            if self._offset == 0:
+                header = self._base_record(self._generation)
+                self._file.write(header)
+                self._offset = len(header)
+        encoded = data.encode('utf-8')
+        self._file.write(encoded)
+        self._file.flush()
+        self._offset += len(encoded)
+        self.bytes_written += len(encoded)
+        self.writes += 1
+        self._records += records
+        if self._compacting is not None:
+            self._compacting.append(encoded)
+
+    def _compact(self, snapshot, position):
+        try:
+            with STATS.timer("history.compact"):
+                self._replace_file(snapshot, position)
+        except Exception as e:
+            print(f"Erro ao compactar histórico: {e}")
+            with self._lock:
+                self._compacting = None
+
+    def _replace_file(self, snapshot, position):
+        """Grava os itens vivos no snapshot comprimido e recomeça o log.
+
+        `position` é (geração, offset) do log no instante do snapshot.
+        """
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        generation, offset = position
+        self.writes += 1
+        meta = {"generation": generation, "offset": offset}
+        data = encode_history(list(reversed(snapshot)), codec=self.codec, meta=meta)
+        _write_atomic(self.snapshot_path, data)
+        self.bytes_written += len(data)
+        # Registros anexados enquanto o snapshot era gravado vão para o log novo
+        with self._lock:
+            tail = self._compacting or []
+            data = self._base_record(generation + 1) + b''.join(tail)
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            _write_atomic(self.path, data)
+            self.bytes_written += len(data)
+            self._generation = generation + 1
+            self._offset = len(data)
+            self._records = len(snapshot) + len(tail)
+            self._compacting = None
+
+
+class HistoryWriter:
+    """Aplica as mutações do histórico em uma thread própria, em lotes.
+
+    Expõe a mesma interface do armazenamento que envolve. A primeira
+    mutação de uma rajada abre uma janela de `debounce` segundos; tudo o
+    que chegar nesse intervalo é consolidado e gravado de uma só vez.
+    """
+
+    def __init__(self, store, debounce=WRITE_DEBOUNCE):
+        self.store = store
+        self.debounce = debounce
+        self._queue = queue.Queue()
+        self._flush_now = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="history-writer", daemon=True)
+        self._thread.start()
+
+    # Leituras vão direto ao armazenamento, depois das gravações pendentes
+    def exists(self):
+        return self.store.exists()
+
+    def load(self):
+        self.flush()
+        return self.store.load()
+
+    def search(self, text, limit=20):
+        self.flush()
+        return self.store.search(text, limit=limit)
+
+    # Mutações entram na fila
+    def append(self, item):
+        self._queue.put(("add", item))
+
+    def delete(self, item_hash):
+        self._queue.put(("del", item_hash))
+
+    def clear(self):
+        self._queue.put(("clear", None))
+
+    def rewrite(self, items):
+        self._queue.put(("rewrite", list(items)))
+
+    def call(self, func):
+        """Executa `func` na thread de gravação (arquivos que acompanham os itens)."""
+        self._queue.put(("call", func))
+
+    def flush(self):
+        """Grava imediatamente o que estiver pendente e aguarda a gravação."""
+        if not self._queue.unfinished_tasks:
+            return
+        self._flush_now.set()
+        self._queue.join()
+
+    def close(self):
+        """Grava as mutações pendentes, encerra a thread e fecha o armazenamento."""
+        self.flush()
+        self._queue.put(None)
+        self._thread.join()
+        self.store.close()
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                self._queue.task_done()
+                return
+            # Janela de agrupamento (interrompida por flush)
+            self._flush_now.wait(self.debounce)
+            self._flush_now.clear()
+            batch = [first]
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = batch[-1] is None
+            ops = [op for op in batch if op is not None]
+            try:
+                with STATS.timer("history.write"):
+                    self._apply(ops)
+            except Exception as e:
+                print(f"Erro ao salvar histórico: {e}")
+            for _ in batch:
+                self._queue.task_done()
+            if stop:
+                return
+
+    def _apply(self, ops):
+        """Consolida as mutações do lote e aplica no armazenamento."""
+        reset = None
+        pending = OrderedDict()  # hash -> ("add", item) ou ("del", hash)
+        calls = []
+        for op, value in ops:
+            if op == "call":
+                calls.append(value)
+            elif op in ("clear", "rewrite"):
+                # Limpeza/reescrita anula tudo o que veio antes no lote
+                reset = (op, value)
+                pending.clear()
+            elif op == "add":
+                pending.pop(value["hash"], None)
+                pending[value["hash"]] = (op, value)
+            else:
+                pending.pop(value, None)
+                pending[value] = (op, value)
+        # Arquivos dos textos grandes antes dos registros que apontam para eles
+        for func in calls:
+            try:
+                func()
+            except Exception as e:
+                print(f"Erro ao gravar arquivo do histórico: {e}")
+        if reset is not None:
+            if reset[0] == "clear":
+                self.store.clear()
+            else:
+                self.store.rewrite(reset[1])
+        if pending:
+            self.store.apply_batch(list(pending.values()))
+
+
+def migrate_json_history(json_path, journal):
+    """Importa o histórico JSON legado para o journal (apenas uma vez)."""
+    if journal.exists() or not os.path.exists(json_path):
+        return False
+    history = read_history_file(json_path)
+    # Ordena por timestamp (mais recente primeiro)
+    history = sorted(
+        (item for item in history if item.get("hash")),
+        key=lambda x: x.get("timestamp", "2000-01-01 00:00:00"),
+        reverse=True
+    )
+    journal.rewrite(history)
+    # Mantém o arquivo antigo como backup
+    os.replace(json_path, json_path + '.bak')
+    return True
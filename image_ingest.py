@@ -0,0 +1,147 @@
+"""
+Processamento de imagens da área de transferência fora da thread da UI.
+
+Hash, decodificação, conversão TIFF -> PNG e gravação em disco rodam em
+um pool de threads com fila limitada. Quando a fila está cheia, submit()
+recusa o trabalho e quem chamou tenta de novo depois (contrapressão).
+A thread da UI só recolhe os resultados prontos com drain(). A miniatura
+de cada imagem (e, se pedida, a impressão perceptual) também é gerada
+aqui, uma única vez.
+"""
+import io
+import os
+import queue
+import threading
+from collections import namedtuple
+
+from content_hash import content_hash, legacy_hash
+from instrumentation import STATS
+
+# Número de threads e de imagens aceitas ao mesmo tempo (em processamento ou na fila)
+INGEST_WORKERS = 2
+INGEST_MAX_PENDING = 4
+
+# token: identificador do placeholder; path None indica erro;
+# fingerprint: impressão perceptual (None se desativada ou se falhou);
+# legacy_hash: MD5 dos mesmos bytes (só se há imagens antigas no histórico)
+IngestResult = namedtuple("IngestResult",
+                          ["token", "hash", "path", "error", "fingerprint", "legacy_hash"],
+                          defaults=(None, None))
+
+
+def write_tiff_as_png(data):
+    """Retorna uma função que converte os bytes TIFF e grava como PNG."""
+    def writer(path):
+        from PIL import Image
+        img = Image.open(io.BytesIO(data))
+        if img.mode not in ('RGBA', 'LA'):
+            img = img.convert('RGBA')
+        img.save(path, "PNG")
+    return writer
+
+
+class ImageIngest:
+    """Pool de threads que transforma bytes do pasteboard em arquivos PNG."""
+
+    def __init__(self, images, thumbnails=None, workers=INGEST_WORKERS, max_pending=INGEST_MAX_PENDING,
+                 fingerprint=None):
+        self.images = images
+        self.thumbnails = thumbnails
+        self.fingerprint = fingerprint  # função(caminho) -> impressão, ex.: dhash
+        self._thumbnail_requests = set()
+        self.workers = workers
+        self._executor = None  # criado na primeira imagem
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._results = queue.Queue()
+        self._next_token = 0
+        self.rejected = 0
+        self.in_flight = 0  # imagens aceitas cujo resultado a UI ainda não recolheu
+        # Calcula também o MD5 das versões anteriores (há imagens antigas no histórico)
+        self.legacy_hashes = False
+
+    def submit(self, data, fmt):
+        """Agenda o processamento; retorna o token ou None se a fila estiver cheia."""
+        if not self._slots.acquire(blocking=False):
+            self.rejected += 1
+            return None
+        self._next_token += 1
+        self.in_flight += 1
+        token = f"pending:{self._next_token}"
+        self._pool().submit(self._process, token, data, fmt)
+        return token
+
+    def generate_thumbnail(self, image_hash, path):
+        """Agenda a miniatura de uma imagem já gravada (itens antigos)."""
+        if self.thumbnails is None or image_hash in self._thumbnail_requests:
+            return
+        self._thumbnail_requests.add(image_hash)
+        self._pool().submit(self._make_thumbnail, image_hash, path)
+
+    def drain(self):
+        """Retorna os resultados prontos (chamado pela thread da UI)."""
+        results = []
+        while True:
+            try:
+                results.append(self._results.get_nowait())
+            except queue.Empty:
+                self.in_flight -= len(results)
+                return results
+
+    def shutdown(self, wait=True):
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+
+    def _pool(self):
+        if self._executor is None:
+            from concurrent.futures import ThreadPoolExecutor
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="image-ingest")
+        return self._executor
+
+    def _process(self, token, data, fmt):
+        with STATS.timer("image.ingest"):
+            self._ingest(token, data, fmt)
+
+    def _ingest(self, token, data, fmt):
+        path = None
+        try:
+            image_hash = content_hash(data)
+            old_hash = legacy_hash(data) if self.legacy_hashes else None
+            # Referência do trabalho: impede a coleta até a UI recolher o resultado
+            path = self.images.path_for(image_hash)
+            self.images.retain(path)
+            if fmt == "tiff":
+                self.images.put(image_hash, writer=write_tiff_as_png(data))
+            else:
+                self.images.put(image_hash, data=data)
+            self._make_thumbnail(image_hash, path)
+            self._results.put(IngestResult(token, image_hash, path, None,
+                                           self._fingerprint(image_hash, path), old_hash))
+        except Exception as e:
+            if path is not None:
+                self.images.release(path)
+            self._results.put(IngestResult(token, None, None, e))
+        finally:
+            self._slots.release()
+
+    def _fingerprint(self, image_hash, path):
+        if self.fingerprint is None:
+            return None
+        # A miniatura já gravada é bem mais barata de decodificar que o original
+        source = path
+        if self.thumbnails is not None:
+            thumbnail = self.thumbnails.path_for(image_hash)
+            if os.path.exists(thumbnail):
+                source = thumbnail
+        try:
+            return self.fingerprint(source)
+        except Exception as e:
+            print(f"Erro ao calcular impressão da imagem: {e}")
+            return None
+
+    def _make_thumbnail(self, image_hash, path):
+        if self.thumbnails is None:
+            return
+        try:
+            self.thumbnails.generate(image_hash, path)
+        except Exception as e:
+            print(f"Erro ao gerar miniatura: {e}")
@@ -0,0 +1,147 @@
+"""
+Armazenamento de imagens endereçado pelo conteúdo.
+
+Cada imagem é gravada uma única vez como <hash>.png, não importa
+quantas vezes seja copiada. Os itens do histórico que apontam para um
+arquivo são contados; quando a contagem chega a zero o arquivo entra na
+fila do coletor, que apaga alguns arquivos por chamada (incremental).
+"""
+import os
+import threading
+from collections import deque
+
+# Quantos arquivos o coletor apaga por chamada de collect()
+GC_BATCH = 8
+
+
+class ImageStore:
+    """Diretório de imagens com contagem de referências e coleta incremental."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._refs = {}        # caminho -> número de itens que o referenciam
+        self._garbage = deque()
+        # Referências são alteradas pela UI e pelas threads de processamento
+        self._lock = threading.Lock()
+        self.collected_files = 0
+        self.collected_bytes = 0
+
+    def path_for(self, image_hash):
+        return os.path.join(self.directory, f"{image_hash}.png")
+
+    def put(self, image_hash, data=None, writer=None):
+        """Grava a imagem (se ainda não existir) e retorna o caminho.
+
+        `data` são bytes PNG; alternativamente `writer(path)` grava o arquivo.
+        """
+        path = self.path_for(image_hash)
+        if os.path.exists(path):
+            return path
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            if writer is not None:
+                writer(tmp_path)
+            else:
+                with open(tmp_path, 'wb') as f:
+                    f.write(data)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return path
+
+    def exists(self, path):
+        return os.path.exists(path)
+
+    def size(self, path):
+        """Tamanho do arquivo em bytes (0 se não existir)."""
+        try:
+            return os.path.getsize(path)
+        except OSError:
+            return 0
+
+    def retain(self, path):
+        """Registra mais um item do histórico apontando para `path`."""
+        with self._lock:
+            self._refs[path] = self._refs.get(path, 0) + 1
+
+    def release(self, path):
+        """Remove uma referência; sem referências o arquivo vai para a coleta."""
+        with self._lock:
+            count = self._refs.get(path, 0) - 1
+            if count > 0:
+                self._refs[path] = count
+                return
+            self._refs.pop(path, None)
+            self._garbage.append(path)
+
+    def rebuild(self, items):
+        """Recalcula as referências a partir do histórico e agenda os órfãos."""
+        self._refs = {}
+        for item in items:
+            if item.get("type") == "image" and item.get("content"):
+                self.retain(item["content"])
+        self._garbage.clear()
+        if os.path.isdir(self.directory):
+            for name in os.listdir(self.directory):
+                path = os.path.join(self.directory, name)
+                if path not in self._refs:
+                    self._garbage.append(path)
+
+    @property
+    def pending(self):
+        """Número de arquivos aguardando a coleta."""
+        return len(self._garbage)
+
+    def collect(self, budget=GC_BATCH):
+        """Apaga até `budget` arquivos sem referências (todos se None)."""
+        removed = 0
+        while self._garbage and (budget is None or removed < budget):
+            with self._lock:
+                path = self._garbage.popleft()
+                # Pode ter sido referenciado de novo depois de liberado
+                if path in self._refs:
+                    continue
+                try:
+                    size = os.path.getsize(path)
+                    os.remove(path)
+                except OSError:
+                    continue
+            removed += 1
+            self.collected_files += 1
+            self.collected_bytes += size
+        return removed
+
+    def clear(self):
+        """Esquece todas as referências e apaga todos os arquivos."""
+        self._refs = {}
+        self._garbage.clear()
+        if os.path.isdir(self.directory):
+            for name in os.listdir(self.directory):
+                self._garbage.append(os.path.join(self.directory, name))
+        self.collect(None)
+
+    def disk_usage(self):
+        """Relatório de uso de disco do diretório de imagens."""
+        report = {
+            "files": 0,
+            "bytes": 0,
+            "referenced_files": 0,
+            "referenced_bytes": 0,
+            "pending_gc": len(self._garbage),
+            "collected_files": self.collected_files,
+            "collected_bytes": self.collected_bytes,
+        }
+        if not os.path.isdir(self.directory):
+            return report
+        for entry in os.scandir(self.directory):
+            if not entry.is_file():
+                continue
+            size = entry.stat().st_size
+            report["files"] += 1
+            report["bytes"] += size
+            if entry.path in self._refs:
+                report["referenced_files"] += 1
+                report["referenced_bytes"] += size
+        return report
@@ -0,0 +1,178 @@
+"""
+Contadores e histogramas de tempo dos caminhos quentes do Power Paste.
+
+Há uma única instância global, STATS, desativada por padrão: cada
+chamada então só testa `enabled` e retorna (o timer devolve um context
+manager vazio compartilhado). Ativada, cada métrica guarda totais desde
+o início (histograma em faixas de potência de 2 em microssegundos) e os
+valores do último minuto, de onde saem os percentis do resumo.
+"""
+import json
+import os
+import threading
+import time
+from collections import deque
+
+# Janela do resumo "último minuto"
+WINDOW_SECONDS = 60
+
+
+class _NullTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _Timer:
+    __slots__ = ("stats", "name", "start")
+
+    def __init__(self, stats, name):
+        self.stats = stats
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.stats.observe(self.name, time.perf_counter() - self.start)
+        return False
+
+
+def _percentile(values, q):
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+class Stats:
+    """Coletor de métricas; sem custo relevante enquanto `enabled` é False."""
+
+    def __init__(self, clock=time.monotonic, window=WINDOW_SECONDS):
+        self.enabled = False
+        self.clock = clock
+        self.window = window
+        self.started = clock()
+        self._lock = threading.Lock()
+        self._counters = {}  # nome -> total
+        self._timings = {}   # nome -> [quantidade, soma, máximo, faixas]
+        self._recent = {}    # nome -> deque de (instante, valor)
+
+    def enable(self, enabled=True):
+        self.enabled = enabled
+
+    def count(self, name, n=1):
+        """Soma `n` ao contador `name`."""
+        if not self.enabled:
+            return
+        now = self.clock()
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + n
+            self._remember(name, now, n)
+
+    def observe(self, name, seconds):
+        """Registra uma duração (em segundos) no histograma `name`."""
+        if not self.enabled:
+            return
+        now = self.clock()
+        bucket = int(seconds * 1e6).bit_length()  # faixa: < 2**bucket us
+        with self._lock:
+            timing = self._timings.get(name)
+            if timing is None:
+                timing = self._timings[name] = [0, 0.0, 0.0, {}]
+            timing[0] += 1
+            timing[1] += seconds
+            timing[2] = max(timing[2], seconds)
+            timing[3][bucket] = timing[3].get(bucket, 0) + 1
+            self._remember(name, now, seconds)
+
+    def timer(self, name):
+        """Context manager que mede o bloco em `name`."""
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, name)
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._timings.clear()
+            self._recent.clear()
+            self.started = self.clock()
+
+    def snapshot(self):
+        """Retorna um dicionário serializável com os totais e o último minuto."""
+        now = self.clock()
+        with self._lock:
+            for name in list(self._recent):
+                self._expire(name, now)
+            recent = {name: [value for _, value in events] for name, events in self._recent.items()}
+            counters = dict(self._counters)
+            timings = {name: [t[0], t[1], t[2], dict(t[3])] for name, t in self._timings.items()}
+
+        report = {"uptime_s": now - self.started, "counters": {}, "timings": {}}
+        for name, total in sorted(counters.items()):
+            report["counters"][name] = {"total": total, "last_minute": sum(recent.get(name, ()))}
+        for name, (count, total, peak, buckets) in sorted(timings.items()):
+            last = sorted(recent.get(name, ()))
+            entry = {
+                "count": count,
+                "mean_ms": total / count * 1e3,
+                "max_ms": peak * 1e3,
+                # Limite superior de cada faixa (us) -> quantidade
+                "histogram_us": {str(1 << bucket): n for bucket, n in sorted(buckets.items())},
+                "last_minute": {"count": len(last)},
+            }
+            if last:
+                entry["last_minute"].update({
+                    "p50_ms": _percentile(last, 0.5) * 1e3,
+                    "p95_ms": _percentile(last, 0.95) * 1e3,
+                    "p99_ms": _percentile(last, 0.99) * 1e3,
+                    "max_ms": last[-1] * 1e3,
+                })
+            report["timings"][name] = entry
+        return report
+
+    def summary(self):
+        """Resumo do último minuto em texto, para a janela de diagnóstico."""
+        report = self.snapshot()
+        lines = []
+        for name, entry in report["timings"].items():
+            last = entry["last_minute"]
+            if last["count"]:
+                lines.append(f"{name}: {last['count']}x  p50 {last['p50_ms']:.2f} ms  "
+                             f"p99 {last['p99_ms']:.2f} ms  máx {last['max_ms']:.2f} ms")
+        for name, entry in report["counters"].items():
+            if entry["last_minute"]:
+                lines.append(f"{name}: {entry['last_minute']}")
+        return "\n".join(lines)
+
+    def write(self, path):
+        """Grava o snapshot em JSON (troca atômica do arquivo)."""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.snapshot(), f, indent=2)
+        os.replace(tmp_path, path)
+
+    def _remember(self, name, now, value):
+        # Deve ser chamado com o lock adquirido
+        events = self._recent.get(name)
+        if events is None:
+            events = self._recent[name] = deque()
+        events.append((now, value))
+        self._expire(name, now)
+
+    def _expire(self, name, now):
+        events = self._recent[name]
+        cutoff = now - self.window
+        while events and events[0][0] < cutoff:
+            events.popleft()
+
+
+# Instância usada pelos módulos do app
+STATS = Stats()
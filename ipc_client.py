@@ -0,0 +1,138 @@
+"""
+Cliente de linha de comando do servidor local do Power Paste.
+
+Conversa com o app em execução pelo socket Unix (veja ipc_server.py) e
+só usa a biblioteca padrão, para abrir em poucos milissegundos.
+
+    power-paste list [-n 20] [--json]
+    power-paste search "texto" [-n 20] [--json]
+    power-paste get <hash>          (texto completo ou caminho da imagem)
+    power-paste copy <hash>         (coloca o item na área de transferência)
+    power-paste stats               (requer o diagnóstico ativo)
+
+O hash pode ser abreviado (qualquer prefixo único, como o da listagem).
+"""
+import argparse
+import json
+import os
+import socket
+import sys
+import time
+
+SOCKET_PATH = os.path.expanduser("~/.power_paste/power_paste.sock")
+# Caracteres do hash mostrados na listagem
+SHORT_HASH = 12
+TIMEOUT = 10
+
+
+class IPCClientError(Exception):
+    """App fora do ar ou pedido recusado pelo servidor."""
+
+
+class IPCClient:
+    """Conexão com o servidor local; vários pedidos podem usar a mesma conexão."""
+
+    def __init__(self, path=SOCKET_PATH, timeout=TIMEOUT):
+        self.path = path
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._sock.settimeout(timeout)
+        try:
+            self._sock.connect(path)
+        except OSError as e:
+            self._sock.close()
+            raise IPCClientError(f"Power Paste não está em execução ({path}): {e}")
+        self._file = self._sock.makefile('rb')
+
+    def call(self, op, **fields):
+        """Envia um pedido e retorna a resposta (levanta IPCClientError se falhou)."""
+        request = dict(fields, op=op)
+        self._sock.sendall(json.dumps(request, ensure_ascii=False).encode('utf-8') + b"\n")
+        line = self._file.readline()
+        if not line:
+            raise IPCClientError("conexão encerrada pelo app")
+        response = json.loads(line)
+        if not response.get("ok"):
+            raise IPCClientError(response.get("error", "erro desconhecido"))
+        return response
+
+    def close(self):
+        self._file.close()
+        self._sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+def format_item(record):
+    """Linha da listagem: hash curto, horário, tipo e prévia."""
+    when = time.strftime("%Y-%m-%d %H:%M", time.localtime(record.get("timestamp", 0)))
+    if record.get("processing"):
+        detail = "(processando)"
+    elif record.get("type") == "image":
+        detail = record.get("path", "")
+    else:
+        detail = record.get("preview", "")
+    return f"{record['hash'][:SHORT_HASH]}  {when}  {record.get('type', '?'):5}  {detail}"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="power-paste", description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--socket", default=os.environ.get("POWER_PASTE_SOCKET", SOCKET_PATH),
+                        help="caminho do socket do app")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("list", help="itens mais recentes")
+    p.add_argument("-n", "--limit", type=int, default=20)
+    p.add_argument("--json", action="store_true", help="saída em JSON")
+
+    p = sub.add_parser("search", help="busca aproximada no histórico")
+    p.add_argument("query")
+    p.add_argument("-n", "--limit", type=int, default=20)
+    p.add_argument("--json", action="store_true", help="saída em JSON")
+
+    p = sub.add_parser("get", help="conteúdo completo de um item")
+    p.add_argument("hash")
+    p.add_argument("--json", action="store_true", help="saída em JSON")
+
+    p = sub.add_parser("copy", help="copia o item de novo para a área de transferência")
+    p.add_argument("hash")
+
+    sub.add_parser("stats", help="estatísticas do diagnóstico")
+
+    args = parser.parse_args(argv)
+    try:
+        with IPCClient(args.socket) as client:
+            if args.command in ("list", "search"):
+                fields = {"limit": args.limit}
+                if args.command == "search":
+                    fields["query"] = args.query
+                items = client.call(args.command, **fields)["items"]
+                if args.json:
+                    print(json.dumps(items, ensure_ascii=False, indent=2))
+                else:
+                    for record in items:
+                        print(format_item(record))
+            elif args.command == "get":
+                record = client.call("get", hash=args.hash)["item"]
+                if args.json:
+                    print(json.dumps(record, ensure_ascii=False, indent=2))
+                elif record.get("type") == "image":
+                    print(record.get("path", ""))
+                else:
+                    sys.stdout.write(record.get("text", ""))
+            elif args.command == "copy":
+                client.call("copy", hash=args.hash)
+            elif args.command == "stats":
+                print(json.dumps(client.call("stats")["stats"], ensure_ascii=False, indent=2))
+    except (IPCClientError, OSError, ValueError) as e:
+        print(f"Erro: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
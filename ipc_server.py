@@ -0,0 +1,264 @@
+"""
+Servidor local de comandos do Power Paste (socket Unix).
+
+Scripts e plugins de editor consultam o histórico do app em execução sem
+ler os arquivos enquanto eles são regravados. O protocolo é JSON por
+linha: cada linha enviada é um pedido e recebe uma linha de resposta.
+
+    {"op": "list", "limit": 20}
+    {"op": "search", "query": "texto", "limit": 20}
+    {"op": "get", "hash": "b2-7b49b0"}      (hash completo ou prefixo único)
+    {"op": "copy", "hash": "b2-7b49b0"}
+    {"op": "stats"}
+    {"op": "ping"}
+
+Respostas: {"ok": true, ...} ou {"ok": false, "error": "..."}.
+
+O loop asyncio roda em uma thread própria, então o run loop do rumps
+nunca espera por clientes; os pedidos são atendidos em um pequeno pool
+de threads para que uma leitura lenta (texto grande em disco) não
+atrase as outras conexões.
+"""
+import asyncio
+import json
+import os
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from instrumentation import STATS
+from menu_model import display_record
+
+# Maior linha de pedido aceita
+MAX_REQUEST = 64 * 1024
+# Limite de itens por resposta de list/search
+MAX_LIMIT = 1000
+DEFAULT_LIMIT = 20
+# Threads que atendem os pedidos
+WORKERS = 4
+
+
+class IPCError(Exception):
+    """Pedido inválido; a mensagem vai para o cliente."""
+
+
+def item_record(item):
+    """Resumo serializável de um item (sem o conteúdo completo dos textos)."""
+    record = {
+        "hash": item.get("hash"),
+        "type": item.get("type"),
+        "timestamp": item.get("timestamp", 0),
+    }
+    if item.get("processing"):
+        record["processing"] = True
+    elif item.get("type") == "image":
+        record["path"] = item.get("content", "")
+    else:
+        display = item.get("display") or display_record(item)
+        record["preview"] = display["preview"]
+        record["size"] = display["size"]
+    return record
+
+
+class HistoryRequests:
+    """Atende os pedidos do protocolo usando o núcleo do app.
+
+    `copy_item(item)` coloca o item na área de transferência e retorna
+    True se conseguiu; sem ele, o pedido "copy" é recusado.
+    """
+
+    def __init__(self, engine, copy_item=None):
+        self.engine = engine
+        self.copy_item = copy_item
+
+    def __call__(self, request):
+        op = request.get("op")
+        handler = getattr(self, f"op_{op}", None) if isinstance(op, str) else None
+        if handler is None:
+            raise IPCError(f"operação desconhecida: {op}")
+        return handler(request)
+
+    def op_ping(self, request):
+        return {"ok": True}
+
+    def op_list(self, request):
+        items = self.engine.newest(_limit(request))
+        return {"ok": True, "items": [item_record(item) for item in items]}
+
+    def op_search(self, request):
+        query = request.get("query")
+        if not isinstance(query, str) or not query.strip():
+            raise IPCError("busca vazia")
+        items = self.engine.search(query, limit=_limit(request))
+        return {"ok": True, "items": [item_record(item) for item in items]}
+
+    def op_get(self, request):
+        item = self._find(request)
+        record = item_record(item)
+        if item.get("type") == "text":
+            # Textos grandes são lidos do disco fora do lock do histórico
+            record["text"] = self.engine.item_text(item)
+        return {"ok": True, "item": record}
+
+    def op_copy(self, request):
+        if self.copy_item is None:
+            raise IPCError("cópia indisponível")
+        item = self._find(request)
+        if item.get("processing"):
+            raise IPCError("imagem ainda em processamento")
+        if not self.copy_item(item):
+            raise IPCError("não foi possível copiar o item")
+        return {"ok": True, "item": item_record(item)}
+
+    def op_stats(self, request):
+        if not STATS.enabled:
+            raise IPCError("diagnóstico desativado")
+        return {"ok": True, "stats": STATS.snapshot()}
+
+    def _find(self, request):
+        item_hash = request.get("hash")
+        if not isinstance(item_hash, str) or not item_hash:
+            raise IPCError("hash ausente")
+        item = self.engine.find(item_hash)
+        if item is None:
+            raise IPCError(f"item não encontrado: {item_hash}")
+        return item
+
+
+def _limit(request):
+    limit = request.get("limit", DEFAULT_LIMIT)
+    if not isinstance(limit, int) or isinstance(limit, bool) or limit < 1:
+        raise IPCError("limite inválido")
+    return min(limit, MAX_LIMIT)
+
+
+def socket_in_use(path):
+    """True se já há um servidor aceitando conexões no socket."""
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(path)
+        return True
+    except OSError:
+        return False
+    finally:
+        probe.close()
+
+
+class IPCServer:
+    """Servidor asyncio em socket Unix, rodando em uma thread própria."""
+
+    def __init__(self, path, handler, workers=WORKERS):
+        self.path = path
+        self.handler = handler
+        self.workers = workers
+        self.connections = 0  # clientes conectados agora
+        self._loop = None
+        self._thread = None
+        self._executor = None
+        self._ready = threading.Event()
+        self._error = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """Abre o socket e começa a atender; retorna False se não conseguiu."""
+        if os.path.exists(self.path):
+            if socket_in_use(self.path):
+                print(f"Servidor local já em execução em {self.path}")
+                return False
+            # Socket de uma execução anterior que não foi encerrada
+            os.unlink(self.path)
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix="ipc")
+        self._thread = threading.Thread(target=self._run, name="ipc-server", daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        if self._error is not None:
+            print(f"Erro ao iniciar servidor local: {self._error}")
+            self._thread.join()
+            self._executor.shutdown(wait=False)
+            return False
+        return True
+
+    def stop(self):
+        """Fecha o socket, encerra as conexões e aguarda a thread."""
+        if not self.running:
+            return
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._executor.shutdown(wait=True)
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
+
+    def _run(self):
+        loop = self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        try:
+            server = loop.run_until_complete(
+                asyncio.start_unix_server(self._serve, path=self.path, limit=MAX_REQUEST)
+            )
+            # Só o próprio usuário conversa com o app
+            os.chmod(self.path, 0o600)
+        except Exception as e:
+            self._error = e
+            self._ready.set()
+            loop.close()
+            return
+        self._ready.set()
+        try:
+            loop.run_forever()
+        finally:
+            server.close()
+            # Cancela os clientes ainda conectados antes de aguardar o fechamento
+            tasks = [task for task in asyncio.all_tasks(loop) if not task.done()]
+            for task in tasks:
+                task.cancel()
+            loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+            loop.run_until_complete(server.wait_closed())
+            loop.close()
+
+    async def _serve(self, reader, writer):
+        self.connections += 1
+        loop = asyncio.get_event_loop()
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError:
+                    # Linha maior que MAX_REQUEST: responde e encerra
+                    writer.write(_encode({"ok": False, "error": "pedido grande demais"}))
+                    break
+                if not line:
+                    break
+                response = await loop.run_in_executor(self._executor, self._respond, line)
+                writer.write(response)
+                await writer.drain()
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            self.connections -= 1
+            writer.close()
+
+    def _respond(self, line):
+        with STATS.timer("ipc.request"):
+            try:
+                request = json.loads(line)
+                if not isinstance(request, dict):
+                    raise IPCError("pedido deve ser um objeto JSON")
+                return _encode(self.handler(request))
+            except (IPCError, ValueError) as e:
+                return _encode({"ok": False, "error": str(e)})
+            except Exception as e:
+                print(f"Erro ao atender pedido local: {e}")
+                return _encode({"ok": False, "error": "erro interno"})
+
+
+def _encode(response):
+    return json.dumps(response, ensure_ascii=False).encode('utf-8') + b"\n"
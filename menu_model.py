@@ -0,0 +1,400 @@
+"""
+Modelo da parte do menu que mostra o histórico.
+
+Em vez de limpar e recriar todos os itens a cada cópia, o HistoryMenu
+compara a lista visível anterior com a nova (chave: hash do item) e
+aplica no menu apenas inserções, remoções e reordenações. O FakeMenu
+imita o subconjunto do rumps.Menu usado aqui e conta as operações.
+
+O título de cada item vem do registro de exibição ("display": prévia,
+horário, tipo e tamanho), calculado uma vez quando o item entra no
+histórico e gravado com ele: montar o menu não examina o conteúdo.
+
+Só os N itens mais recentes entram direto no menu; os mais antigos são
+agrupados em seções por período ("Hoje mais cedo", "Ontem", "Esta
+semana", "Mais antigos"), cada uma em um submenu que só é montado
+quando aberto pela primeira vez e só é refeito se os itens dela mudarem.
+Seções grandes são paginadas: cada página termina em um item "Mais..."
+que abre a página seguinte, também montada sob demanda.
+"""
+import time
+from bisect import bisect_left
+from itertools import islice
+
+# Caractere invisível usado para diferenciar títulos repetidos
+# (o rumps usa o título como chave do item no menu)
+TITLE_DISAMBIGUATOR = "\u2060"
+
+# Tamanho da prévia de texto no menu e do trecho examinado para montá-la
+PREVIEW_LENGTH = 40
+PREVIEW_SCAN = 1024
+
+
+def text_preview(text, length=PREVIEW_LENGTH):
+    """Prévia de uma linha do texto, examinando só o início do conteúdo."""
+    preview = ' '.join(text[:PREVIEW_SCAN].split())
+    if len(preview) > length or len(text) > PREVIEW_SCAN:
+        preview = preview[:length] + "..."
+    return preview
+
+
+def display_time(timestamp):
+    """Horário (HH:MM) mostrado no menu."""
+    if not timestamp:
+        return "--:--"
+    return time.strftime("%H:%M", time.localtime(timestamp))
+
+
+def display_record(item):
+    """Registro de exibição do item: prévia, horário, tipo e tamanho em bytes."""
+    record = {
+        "preview": "",
+        "time": display_time(item.get("timestamp")),
+        "type": item.get("type"),
+        "size": item.get("size", 0),
+    }
+    if item.get("type") == "text":
+        if item.get("blob"):
+            # Textos grandes já trazem a prévia (o corpo está em disco)
+            record["preview"] = item.get("preview", "")
+        else:
+            content = item.get("content", "")
+            record["preview"] = text_preview(content)
+            record["size"] = len(content.encode('utf-8'))
+    return record
+
+
+def history_entries(items, labels, on_text=None, on_image=None):
+    """Monta as entradas (hash, título, callback) do menu para os itens dados.
+
+    `labels` traz os textos traduzidos: "processing", "image" e "unknown".
+    """
+    entries = []
+    for item in items:
+        # Itens criados fora do núcleo podem não ter o registro de exibição
+        display = item.get("display") or display_record(item)
+        display_time = display["time"]
+
+        # Formata o item com base no tipo
+        if display["type"] == "text":
+            entries.append((item.get("hash"), f"{display_time} | {display['preview']}", on_text))
+        elif item.get("processing"):
+            # Imagem ainda em processamento (não clicável)
+            entries.append((item.get("hash"), f"{display_time} | {labels['processing']}", None))
+        elif display["type"] == "image":
+            # Item direto para abrir no Preview
+            entries.append((item.get("hash"), f"{display_time} | {labels['image']}", on_image))
+        else:
+            # Tipo desconhecido
+            entries.append((item.get("hash"), f"{display_time} | {labels['unknown']}", None))
+    return entries
+
+
+def section_starts(now):
+    """Início (timestamp) de cada seção, da mais recente para a mais antiga.
+
+    "Esta semana" são os cinco dias antes de ontem; a última seção não tem início.
+    """
+    t = time.localtime(now)
+
+    def day(offset):
+        # mktime normaliza dias negativos (virada de mês) e o horário de verão
+        return time.mktime((t.tm_year, t.tm_mon, t.tm_mday - offset, 0, 0, 0, 0, 0, -1))
+    return [("earlier_today", day(0)), ("yesterday", day(1)), ("this_week", day(6)), ("older", None)]
+
+
+def split_history(items, visible, now):
+    """Separa os `visible` itens mais recentes e distribui os demais pelas seções.
+
+    `items` vem do mais recente para o mais antigo. Retorna (itens visíveis,
+    [(seção, itens)]) só com as seções que têm itens.
+    """
+    items = iter(items)
+    head = list(islice(items, visible))
+    starts = section_starts(now)
+    sections = []
+    index = 0
+    current = None
+    for item in items:
+        # Em ordem cronológica: a seção só avança
+        timestamp = item.get("timestamp", 0)
+        while starts[index][1] is not None and timestamp < starts[index][1]:
+            index += 1
+        key = starts[index][0]
+        if current is None or current[0] != key:
+            current = (key, [])
+            sections.append(current)
+        current[1].append(item)
+    return head, sections
+
+
+def stable_positions(sequence):
+    """Retorna os índices de uma maior subsequência crescente de `sequence`."""
+    tails = []       # menor final de cada comprimento
+    tail_idx = []    # índice em `sequence` desse final
+    parents = [-1] * len(sequence)
+    for i, value in enumerate(sequence):
+        pos = bisect_left(tails, value)
+        if pos == len(tails):
+            tails.append(value)
+            tail_idx.append(i)
+        else:
+            tails[pos] = value
+            tail_idx[pos] = i
+        parents[i] = tail_idx[pos - 1] if pos > 0 else -1
+    result = []
+    i = tail_idx[-1] if tail_idx else -1
+    while i != -1:
+        result.append(i)
+        i = parents[i]
+    return set(result)
+
+
+class HistoryMenu:
+    """Mantém os itens do histórico no menu aplicando só as diferenças."""
+
+    def __init__(self, menu, item_factory, empty_title):
+        # item_factory(title, callback, item_hash) -> item de menu
+        self.menu = menu
+        self.item_factory = item_factory
+        self.empty_title = empty_title
+        self._entries = []  # [(hash, título base, chave no menu)]
+
+    def _normalize(self, entries):
+        # Sem itens: mostra uma entrada fixa de histórico vazio
+        if not entries:
+            return [(None, self.empty_title, None)]
+        return entries
+
+    def build(self, entries):
+        """Adiciona as entradas ao final do menu (construção inicial)."""
+        self._entries = []
+        used = set()
+        for item_hash, title, callback in self._normalize(entries):
+            key = self._unique_key(title, used)
+            used.add(key)
+            self.menu.add(self.item_factory(key, callback, item_hash))
+            self._entries.append((item_hash, title, key))
+
+    def update(self, entries):
+        """Aplica no menu a diferença entre as entradas atuais e as novas."""
+        entries = self._normalize(entries)
+        if not self._entries:
+            self.build(entries)
+            return
+
+        # Posição de cada entrada antiga na nova lista (mesmo hash e título)
+        new_pos = {(h, title): i for i, (h, title, _) in enumerate(entries)}
+        kept = [(i, new_pos[(h, title)]) for i, (h, title, _) in enumerate(self._entries)
+                if (h, title) in new_pos]
+        # Entradas que mantêm a ordem relativa ficam; as demais são movidas
+        lis = stable_positions([pos for _, pos in kept])
+        stable = {kept[k][1]: self._entries[kept[k][0]][2] for k in lis}
+        stable_old = {kept[k][0] for k in lis}
+        stale = [key for i, (_, _, key) in enumerate(self._entries) if i not in stable_old]
+
+        # Inserções primeiro: a região do histórico nunca fica vazia
+        used = {key for _, _, key in self._entries}
+        head_key = self._entries[0][2]
+        prev_key = None
+        result = []
+        for i, (item_hash, title, callback) in enumerate(entries):
+            if i in stable:
+                key = stable[i]
+            else:
+                key = self._unique_key(title, used)
+                used.add(key)
+                menu_item = self.item_factory(key, callback, item_hash)
+                if prev_key is None:
+                    self.menu.insert_before(head_key, menu_item)
+                else:
+                    self.menu.insert_after(prev_key, menu_item)
+            prev_key = key
+            result.append((item_hash, title, key))
+
+        for key in stale:
+            del self.menu[key]
+        self._entries = result
+
+    @staticmethod
+    def _unique_key(title, used):
+        key = title
+        while key in used:
+            key += TITLE_DISAMBIGUATOR
+        return key
+
+
+# Prefixo da "hash" das entradas que abrem o submenu de uma seção
+SECTION_PREFIX = "section:"
+# Itens por página de uma seção
+SECTION_PAGE = 100
+
+
+class LazySection:
+    """Submenu de uma seção: montado na primeira abertura e refeito só se os itens mudarem."""
+
+    def __init__(self, menu_item, item_factory, make_entries, empty_title):
+        # make_entries(itens) -> entradas (hash, título, callback)
+        self.menu_item = menu_item
+        self.make_entries = make_entries
+        self.items = []
+        self.more = None  # entrada da página seguinte, se houver
+        self.builds = 0
+        self._shown = None  # hashes dos itens montados no submenu
+        self._menu = HistoryMenu(menu_item, item_factory, empty_title)
+        # Uma entrada provisória faz o item aparecer com a seta de submenu
+        self._menu.build([])
+
+    def open(self):
+        """Monta ou atualiza o submenu (chamado logo antes de ele aparecer)."""
+        hashes = [item.get("hash") for item in self.items]
+        if self.more is not None:
+            hashes.append(self.more[0])
+        if hashes == self._shown:
+            return False
+        entries = self.make_entries(self.items)
+        if self.more is not None:
+            entries.append(self.more)
+        if self._shown is None:
+            # Primeira abertura: troca a entrada provisória pelos itens de uma vez
+            self.menu_item.clear()
+            self._menu.build(entries)
+        else:
+            self._menu.update(entries)
+        self._shown = hashes
+        self.builds += 1
+        return True
+
+
+class HistorySections:
+    """Seções do histórico antigo no menu principal, uma entrada por seção."""
+
+    def __init__(self, section_factory, item_factory, make_entries, titles, empty_title,
+                 watch_open=None, page=SECTION_PAGE):
+        # section_factory(título) -> item de menu que aceita subitens;
+        # watch_open(item, abrir) liga a abertura do submenu a `abrir`;
+        # titles traz o título de cada seção e o da página seguinte ("more")
+        self.section_factory = section_factory
+        self.item_factory = item_factory
+        self.make_entries = make_entries
+        self.titles = titles
+        self.empty_title = empty_title
+        self.watch_open = watch_open
+        self.page = page
+        self.sections = {}  # seção (ou "seção:página") -> LazySection
+        self._pending = {}  # mesma chave -> (itens, entrada da página seguinte)
+
+    def entries(self, sections):
+        """Guarda os itens de cada página das seções e retorna as entradas dos cabeçalhos."""
+        self._pending = {}
+        for key, items in sections:
+            for start in range(0, len(items), self.page):
+                page_key = f"{key}:{start // self.page}" if start else key
+                more = None
+                if start + self.page < len(items):
+                    more = (f"{SECTION_PREFIX}{key}:{start // self.page + 1}", self.titles["more"], None)
+                self._pending[page_key] = (items[start:start + self.page], more)
+        for key in list(self.sections):
+            if key not in self._pending:
+                del self.sections[key]
+            else:
+                self.sections[key].items, self.sections[key].more = self._pending[key]
+        return [(SECTION_PREFIX + key, self.titles[key], None) for key, _ in sections]
+
+    def make_item(self, title, callback, item_hash):
+        """Fábrica de itens para o HistoryMenu: seções viram submenus, o resto vai para item_factory."""
+        if item_hash is not None and item_hash.startswith(SECTION_PREFIX):
+            return self.create(title, item_hash[len(SECTION_PREFIX):])
+        return self.item_factory(title, callback, item_hash)
+
+    def create(self, title, key):
+        """Cria o item de menu (com submenu vazio) da seção ou página dada."""
+        section = LazySection(self.section_factory(title), self.make_item,
+                              self.make_entries, self.empty_title)
+        section.items, section.more = self._pending.get(key, ([], None))
+        self.sections[key] = section
+        if self.watch_open is not None:
+            self.watch_open(section.menu_item, section.open)
+        return section.menu_item
+
+    def open(self, key):
+        """Abre a seção dada (como o menu faria); retorna se o submenu foi montado."""
+        return self.sections[key].open()
+
+
+class FakeMenuItem:
+    """Item de menu mínimo, compatível com o uso feito pelo HistoryMenu."""
+
+    def __init__(self, title):
+        self.title = title
+        self.callback = None
+
+    def set_callback(self, callback):
+        self.callback = callback
+
+
+class FakeMenu:
+    """Menu em memória que imita o rumps.Menu e conta as operações."""
+
+    def __init__(self):
+        self._keys = []
+        self._items = {}
+        self.ops = {"add": 0, "insert": 0, "remove": 0, "clear": 0}
+
+    def keys(self):
+        return list(self._keys)
+
+    def __getitem__(self, key):
+        return self._items[key]
+
+    def __contains__(self, key):
+        return key in self._items
+
+    def add(self, item):
+        self.ops["add"] += 1
+        self._keys.append(item.title)
+        self._items[item.title] = item
+
+    def insert_before(self, existing_key, item):
+        self.ops["insert"] += 1
+        self._keys.insert(self._keys.index(existing_key), item.title)
+        self._items[item.title] = item
+
+    def insert_after(self, existing_key, item):
+        self.ops["insert"] += 1
+        self._keys.insert(self._keys.index(existing_key) + 1, item.title)
+        self._items[item.title] = item
+
+    def __delitem__(self, key):
+        self.ops["remove"] += 1
+        self._keys.remove(key)
+        del self._items[key]
+
+    def clear(self):
+        self.ops["clear"] += 1
+        self._keys = []
+        self._items = {}
+
+    @property
+    def total_ops(self):
+        return sum(self.ops.values())
+
+
+class FakeSubmenuItem(FakeMenu):
+    """Item de menu com submenu (em memória)."""
+
+    def __init__(self, title):
+        super().__init__()
+        self.title = title
+        self.callback = None
+
+    def set_callback(self, callback):
+        self.callback = callback
+
+
+def fake_item_factory(title, callback, item_hash):
+    """Cria um FakeMenuItem no mesmo formato usado pelo aplicativo."""
+    item = FakeMenuItem(title)
+    item.set_callback(callback)
+    item._hash = item_hash
+    return item
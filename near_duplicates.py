@@ -0,0 +1,155 @@
+"""
+Detecção de textos quase iguais (SimHash).
+
+Cada texto vira uma impressão digital de 64 bits: o texto é normalizado
+(espaços e indentação colapsados), quebrado em trechos de SHINGLE
+caracteres e cada bit da impressão é o voto da maioria desse bit nos
+hashes dos trechos. Textos que diferem em poucos caracteres têm
+impressões a poucos bits de distância (Hamming).
+
+O índice divide a impressão em `max_distance + 1` blocos: duas
+impressões a no máximo `max_distance` bits de distância têm ao menos um
+bloco idêntico, então a busca só compara os itens que caem no mesmo
+balde de algum bloco, em vez do histórico inteiro.
+"""
+import hashlib
+
+BITS = 64
+# Tamanho dos trechos (em caracteres) que formam as características do texto
+SHINGLE = 4
+
+# Padrões da seção "near_duplicates" da configuração
+DEFAULT_NEAR_DUPLICATES = {
+    "enabled": False,
+    "max_distance": 6,   # bits diferentes aceitos entre as impressões
+    "min_chars": 32,     # textos curtos (versões, códigos) nunca são agrupados
+    "max_chars": 16384,  # textos maiores ficam fora (custo da impressão)
+}
+
+# _BIT_TABLES[k] leva cada byte ao valor (0 ou 1) do seu bit k
+_BIT_TABLES = [bytes((value >> k) & 1 for value in range(256)) for k in range(8)]
+
+
+def _digest(shingle):
+    return hashlib.blake2b(shingle.encode('utf-8'), digest_size=8).digest()
+
+
+def simhash(text):
+    """Impressão digital SimHash (inteiro de 64 bits) do texto."""
+    text = ' '.join(text.split())
+    if len(text) <= SHINGLE:
+        shingles = {text}
+    else:
+        shingles = {text[i:i + SHINGLE] for i in range(len(text) - SHINGLE + 1)}
+    digests = b''.join(map(_digest, shingles))
+    # Conta os votos de cada bit em C: uma coluna por byte do hash,
+    # traduzida para 0/1 e contada
+    majority = len(shingles)
+    fingerprint = 0
+    for j in range(8):
+        column = digests[j::8]
+        for k in range(8):
+            if column.translate(_BIT_TABLES[k]).count(1) * 2 > majority:
+                fingerprint |= 1 << (j * 8 + k)
+    return fingerprint
+
+
+def hamming(a, b):
+    return bin(a ^ b).count('1')
+
+
+class FingerprintIndex:
+    """Impressões de 64 bits dos itens do histórico, em baldes por bloco de bits."""
+
+    def __init__(self, max_distance):
+        self.max_distance = max_distance
+        # Blocos de tamanho quase igual cobrindo os 64 bits
+        count = max_distance + 1
+        bounds = [BITS * i // count for i in range(count + 1)]
+        self._blocks = [(start, (1 << (end - start)) - 1) for start, end in zip(bounds, bounds[1:])]
+        self._buckets = [{} for _ in self._blocks]  # por bloco: valor -> set de hashes
+        self._fingerprints = {}  # hash -> impressão
+        self.collapsed = 0
+
+    def __len__(self):
+        return len(self._fingerprints)
+
+    def __contains__(self, item_hash):
+        return item_hash in self._fingerprints
+
+    def add(self, item_hash, fingerprint):
+        if item_hash in self._fingerprints:
+            self.remove(item_hash)
+        self._fingerprints[item_hash] = fingerprint
+        for (shift, mask), buckets in zip(self._blocks, self._buckets):
+            key = fingerprint >> shift & mask
+            bucket = buckets.get(key)
+            if bucket is None:
+                buckets[key] = {item_hash}
+            else:
+                bucket.add(item_hash)
+
+    def remove(self, item_hash):
+        fingerprint = self._fingerprints.pop(item_hash, None)
+        if fingerprint is None:
+            return
+        for (shift, mask), buckets in zip(self._blocks, self._buckets):
+            key = fingerprint >> shift & mask
+            bucket = buckets[key]
+            bucket.discard(item_hash)
+            if not bucket:
+                del buckets[key]
+
+    def clear(self):
+        for buckets in self._buckets:
+            buckets.clear()
+        self._fingerprints.clear()
+
+    def replace(self, other):
+        """Passa a usar o conteúdo de `other` (mesma distância, montado à parte)."""
+        self._buckets, self._fingerprints = other._buckets, other._fingerprints
+
+    def find(self, fingerprint, exclude=None, accept=None):
+        """Hash do item mais parecido (a até `max_distance` bits) ou None.
+
+        `accept(hash)` confirma cada candidato, do mais próximo ao mais
+        distante, antes de ele ser escolhido.
+        """
+        candidates = {}
+        for (shift, mask), buckets in zip(self._blocks, self._buckets):
+            for item_hash in buckets.get(fingerprint >> shift & mask, ()):
+                if item_hash in candidates or item_hash == exclude:
+                    continue
+                candidates[item_hash] = hamming(fingerprint, self._fingerprints[item_hash])
+        close = [(distance, item_hash) for item_hash, distance in candidates.items()
+                 if distance <= self.max_distance]
+        for _, item_hash in sorted(close):
+            if accept is None or accept(item_hash):
+                return item_hash
+        return None
+
+
+class NearDuplicateIndex(FingerprintIndex):
+    """Impressões SimHash dos textos do histórico."""
+
+    def __init__(self, max_distance=DEFAULT_NEAR_DUPLICATES["max_distance"],
+                 min_chars=DEFAULT_NEAR_DUPLICATES["min_chars"],
+                 max_chars=DEFAULT_NEAR_DUPLICATES["max_chars"]):
+        super().__init__(max_distance)
+        self.min_chars = min_chars
+        self.max_chars = max_chars
+
+    @classmethod
+    def from_config(cls, config=None):
+        """Cria o índice a partir da seção "near_duplicates" (None se desativado)."""
+        merged = dict(DEFAULT_NEAR_DUPLICATES)
+        merged.update(config or {})
+        if not merged["enabled"]:
+            return None
+        return cls(merged["max_distance"], merged["min_chars"], merged["max_chars"])
+
+    def fingerprint(self, text):
+        """Impressão do texto, ou None se o tamanho estiver fora dos limites."""
+        if not self.min_chars <= len(text) <= self.max_chars:
+            return None
+        return simhash(text)
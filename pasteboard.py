@@ -0,0 +1,229 @@
+"""
+Acesso à área de transferência do macOS por trás de um backend substituível.
+
+O ClipboardWatcher guarda o changeCount do pasteboard e só consulta o
+conteúdo (texto, PNG nativo, pbpaste PNG/TIFF) quando esse contador muda.
+Um salto de mais de uma unidade entre duas verificações indica cópias
+que foram substituídas antes de serem vistas (`missed`, uma estimativa:
+alguns apps alteram o pasteboard mais de uma vez por cópia).
+O FakePasteboard permite medir e testar o custo de cada tick fora do macOS.
+"""
+import subprocess
+from abc import ABC, abstractmethod
+from collections import namedtuple
+
+from command_helper import run_command
+from content_hash import content_hash, text_hash
+
+# Tamanho mínimo para considerar dados de imagem válidos
+MIN_IMAGE_BYTES = 100
+
+# Textos que nunca entram no histórico
+IGNORED_TEXT_MARKERS = ("demorou demais", "# Por ora")
+IGNORED_TEXTS = ('#', '...', '# ...', '@')
+
+# Resultado de uma verificação que encontrou conteúdo novo
+# kind: "text" ou "image"; fmt: None, "png" ou "tiff"
+ClipboardChange = namedtuple("ClipboardChange", ["kind", "data", "hash", "fmt"])
+
+
+class PasteboardBackend(ABC):
+    """Interface mínima usada pelo observador da área de transferência.
+
+    Um backend sem os métodos abstratos falha ao ser criado, não no meio
+    de uma verificação.
+    """
+
+    @abstractmethod
+    def change_count(self):
+        """Retorna o contador de alterações do pasteboard."""
+
+    @abstractmethod
+    def read_text(self):
+        """Retorna o texto atual ou None."""
+
+    @abstractmethod
+    def read_png(self):
+        """Retorna os bytes PNG via API nativa ou None."""
+
+    def read_png_fallback(self):
+        """Retorna os bytes PNG via pbpaste ou None."""
+        return None
+
+    def read_tiff(self):
+        """Retorna os bytes TIFF via pbpaste ou None."""
+        return None
+
+
+def _pbpaste(uti, timeout=0.5):
+    """Lê um tipo específico da área de transferência com pbpaste."""
+    try:
+        result = run_command(['pbpaste', '-Prefer', uti], timeout=timeout)
+    except (subprocess.TimeoutExpired, OSError):
+        return None
+    if result.returncode == 0 and result.stdout:
+        return result.stdout
+    return None
+
+
+class MacPasteboard(PasteboardBackend):
+    """Backend real baseado no NSPasteboard geral do macOS."""
+
+    def __init__(self):
+        from AppKit import NSPasteboard
+        self._pb = NSPasteboard.generalPasteboard()
+
+    def change_count(self):
+        return self._pb.changeCount()
+
+    def read_text(self):
+        from AppKit import NSPasteboardTypeString
+        try:
+            text = self._pb.stringForType_(NSPasteboardTypeString)
+            if text is not None:
+                return str(text)
+        except Exception:
+            pass
+        # Fallback para o pyperclip
+        import pyperclip
+        return pyperclip.paste()
+
+    def read_png(self):
+        from AppKit import NSPasteboardTypePNG
+        png_data = self._pb.dataForType_(NSPasteboardTypePNG)
+        if png_data:
+            # Visão direta do buffer do NSData, sem copiar os bytes
+            return memoryview(png_data)
+        return None
+
+    def read_png_fallback(self):
+        return _pbpaste('public.png')
+
+    def read_tiff(self):
+        return _pbpaste('public.tiff')
+
+
+class FakePasteboard(PasteboardBackend):
+    """Pasteboard em memória para testes e benchmarks fora do macOS."""
+
+    def __init__(self):
+        self._count = 0
+        self._text = None
+        self._png = None
+        self._tiff = None
+        # Contadores de chamadas, usados para medir o custo de cada tick
+        self.calls = {"change_count": 0, "text": 0, "png": 0, "png_fallback": 0, "tiff": 0}
+
+    def set_text(self, text):
+        self._text, self._png, self._tiff = text, None, None
+        self._count += 1
+
+    def set_png(self, data):
+        self._text, self._png, self._tiff = None, data, None
+        self._count += 1
+
+    def set_tiff(self, data):
+        self._text, self._png, self._tiff = None, None, data
+        self._count += 1
+
+    def change_count(self):
+        self.calls["change_count"] += 1
+        return self._count
+
+    def read_text(self):
+        self.calls["text"] += 1
+        return self._text
+
+    def read_png(self):
+        self.calls["png"] += 1
+        return self._png
+
+    def read_png_fallback(self):
+        # Simula o pbpaste: um processo novo por chamada
+        self.calls["png_fallback"] += 1
+        return self._png
+
+    def read_tiff(self):
+        self.calls["tiff"] += 1
+        return self._tiff
+
+    @property
+    def spawns(self):
+        """Número de processos pbpaste que o backend real teria iniciado."""
+        return self.calls["png_fallback"] + self.calls["tiff"]
+
+
+def accept_text(normalized):
+    """Filtra textos indesejados."""
+    return (len(normalized) > 2 and
+            not any(marker in normalized for marker in IGNORED_TEXT_MARKERS) and
+            normalized.strip() not in IGNORED_TEXTS)
+
+
+class ClipboardWatcher:
+    """Consulta o pasteboard somente quando o changeCount muda."""
+
+    def __init__(self, backend, hash_images=True):
+        self.backend = backend
+        # Sem hash de imagens aqui, o hash fica para quem processa os bytes
+        self.hash_images = hash_images
+        self.last_change_count = None
+        self.last_hash = None
+        self.ticks = 0
+        self.probes = 0
+        self.missed = 0  # mudanças estimadas entre verificações, nunca vistas
+
+    def changed(self):
+        """Retorna True se o pasteboard mudou desde a última verificação."""
+        self.ticks += 1
+        count = self.backend.change_count()
+        if count == self.last_change_count:
+            return False
+        if self.last_change_count is not None and count > self.last_change_count + 1:
+            self.missed += count - self.last_change_count - 1
+        self.last_change_count = count
+        self.probes += 1
+        return True
+
+    def retry(self):
+        """Esquece o changeCount atual para que a próxima verificação releia tudo."""
+        self.last_change_count = None
+
+    def poll(self):
+        """Retorna um ClipboardChange com o conteúdo novo ou None."""
+        if not self.changed():
+            return None
+
+        # 1. Verifica se há texto
+        try:
+            text = self.backend.read_text()
+            if text and text.strip():
+                normalized = text.replace('\r\n', '\n').replace('\r', '\n')
+                normalized_hash = text_hash(normalized)
+                if normalized_hash != self.last_hash and accept_text(normalized):
+                    return self._found("text", normalized, normalized_hash, None)
+        except Exception as e:
+            print(f"Erro ao verificar texto no clipboard: {e}")
+
+        # 2. Verifica imagem: API nativa, depois pbpaste PNG e por fim TIFF
+        for reader, fmt in ((self.backend.read_png, "png"),
+                            (self.backend.read_png_fallback, "png"),
+                            (self.backend.read_tiff, "tiff")):
+            try:
+                data = reader()
+            except Exception:
+                continue
+            if data and len(data) > MIN_IMAGE_BYTES:
+                if not self.hash_images:
+                    # Hash calculado depois: o mesmo texto copiado em seguida é novo
+                    return self._found("image", data, None, fmt)
+                img_hash = content_hash(data)
+                if img_hash != self.last_hash:
+                    return self._found("image", data, img_hash, fmt)
+                # Mesma imagem por outro caminho: evita novos processos pbpaste
+                return None
+        return None
+
+    def _found(self, kind, data, item_hash, fmt):
+        self.last_hash = item_hash
+        return ClipboardChange(kind, data, item_hash, fmt)
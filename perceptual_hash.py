@@ -0,0 +1,86 @@
+"""
+Detecção de imagens visualmente iguais (dHash).
+
+Duas capturas da mesma janela raramente têm os mesmos bytes, mas têm a
+mesma aparência. O dHash reduz a imagem a 9x8 tons de cinza e guarda,
+para cada pixel, se ele é mais claro que o vizinho da direita: 64 bits
+que mudam pouco com recompressão, escala ou pequenas diferenças.
+
+A redução usa os atalhos do Pillow (draft/reduce), como as miniaturas;
+com só 72 pixels no final, comparar os vizinhos em Python custa menos
+que converter para um array. As impressões vão para o mesmo índice em
+baldes dos textos quase iguais.
+
+Em 9x8 pixels o texto desaparece: janelas diferentes com o mesmo layout
+têm a mesma impressão. Por isso cada candidato é confirmado comparando
+as miniaturas (64x64) pixel a pixel antes de as imagens serem juntadas.
+"""
+from near_duplicates import FingerprintIndex
+
+HASH_SIZE = 8
+
+# Padrões da seção "image_duplicates" da configuração
+DEFAULT_IMAGE_DUPLICATES = {
+    "enabled": False,
+    "max_distance": 4,     # bits diferentes aceitos entre as impressões
+    "max_difference": 3,   # diferença média (0-255) aceita entre as miniaturas
+}
+
+
+def dhash(path):
+    """Impressão dHash (inteiro de 64 bits) da imagem em `path`."""
+    from PIL import Image
+    with Image.open(path) as img:
+        # JPEG: decodifica direto em escala reduzida
+        img.draft('L', (HASH_SIZE * 8, HASH_SIZE * 8))
+        factor = min(img.width // (HASH_SIZE * 8), img.height // (HASH_SIZE * 8))
+        if factor > 1:
+            img = img.reduce(factor)
+        small = img.convert('L').resize((HASH_SIZE + 1, HASH_SIZE), Image.BOX)
+    pixels = small.tobytes()
+    fingerprint = 0
+    for row in range(HASH_SIZE):
+        offset = row * (HASH_SIZE + 1)
+        for col in range(offset, offset + HASH_SIZE):
+            fingerprint = fingerprint << 1 | (pixels[col] > pixels[col + 1])
+    return fingerprint
+
+
+def picture_difference(path_a, path_b):
+    """Diferença média (0-255) entre duas imagens pequenas em tons de cinza.
+
+    Retorna None se os tamanhos forem diferentes (proporções diferentes).
+    """
+    from PIL import Image, ImageChops, ImageStat
+    with Image.open(path_a) as a, Image.open(path_b) as b:
+        if a.size != b.size:
+            return None
+        difference = ImageChops.difference(a.convert('L'), b.convert('L'))
+    return ImageStat.Stat(difference).mean[0]
+
+
+class ImageDuplicateIndex(FingerprintIndex):
+    """Impressões dHash das imagens do histórico."""
+
+    def __init__(self, max_distance=DEFAULT_IMAGE_DUPLICATES["max_distance"],
+                 max_difference=DEFAULT_IMAGE_DUPLICATES["max_difference"]):
+        super().__init__(max_distance)
+        self.max_difference = max_difference
+
+    @classmethod
+    def from_config(cls, config=None):
+        """Cria o índice a partir da seção "image_duplicates" (None se desativado)."""
+        merged = dict(DEFAULT_IMAGE_DUPLICATES)
+        merged.update(config or {})
+        if not merged["enabled"]:
+            return None
+        return cls(merged["max_distance"], merged["max_difference"])
+
+    def same_picture(self, path_a, path_b):
+        """Confirma pelas miniaturas que duas imagens são visualmente iguais."""
+        try:
+            difference = picture_difference(path_a, path_b)
+        except OSError:
+            # Miniatura já removida do cache: na dúvida, mantém as duas
+            return False
+        return difference is not None and difference <= self.max_difference
@@ -1,30 +1,60 @@
 import rumps
-import pyperclip
 import subprocess
 import json
 import os
-import hashlib
-from datetime import datetime, timedelta
-from PIL import Image
-import io
-import base64
-import tempfile
-# Importações para APIs nativas do macOS
-from Foundation import NSString, NSUTF8StringEncoding
-from AppKit import NSPasteboard, NSPasteboardTypeString, NSImage, NSData, NSPasteboardTypePNG, NSPasteboardTypeTIFF
+import time
+# Importações para APIs nativas do macOS (já carregadas pelo rumps).
+# Pillow, sqlite3, o pool de threads das imagens e o servidor local só
+# são importados quando usados pela primeira vez.
+from Foundation import NSObject, NSString
+from AppKit import NSAlert, NSPasteboard, NSPasteboardTypeString, NSImage, NSPasteboardTypePNG
 import threading
+from pasteboard import ClipboardWatcher, MacPasteboard
+from history_store import HistoryJournal, HistoryWriter, migrate_json_history
+from menu_model import HistoryMenu, HistorySections, history_entries, split_history, text_preview
+from image_store import ImageStore
+from image_ingest import ImageIngest
+from thumbnails import MemoryLRU, ThumbnailCache
+from text_blobs import TextBlobStore
+from clipboard_engine import ClipboardEngine
+from retention import DEFAULT_RETENTION, RetentionPolicy
+from near_duplicates import DEFAULT_NEAR_DUPLICATES, NearDuplicateIndex
+from perceptual_hash import DEFAULT_IMAGE_DUPLICATES, ImageDuplicateIndex, dhash
+from poll_scheduler import DEFAULT_POLLING, AdaptivePoller
+from command_helper import DEFAULT_COMMAND_HELPER, HelperRunner, run_command, set_runner
+from instrumentation import STATS
 
 # Configurações
-HISTORY_FILE = os.path.expanduser("~/.power_paste_history.json")
+HISTORY_FILE = os.path.expanduser("~/.power_paste_history.json")  # Formato legado
+HISTORY_JOURNAL_FILE = os.path.expanduser("~/.power_paste/history.log")
+HISTORY_DB_FILE = os.path.expanduser("~/.power_paste/history.db")
 TEMP_IMAGE_DIR = os.path.expanduser("~/.power_paste_temp_images")
+THUMBNAIL_DIR = os.path.expanduser("~/.power_paste/thumbnails")
+TEXT_BLOB_DIR = os.path.expanduser("~/.power_paste/blobs")
+THUMBNAIL_DISPLAY_SIZE = (32, 32)  # Tamanho da miniatura no menu
+THUMBNAIL_MEMORY_ITEMS = 128  # Miniaturas mantidas em memória
 LANGUAGE_FILE = os.path.expanduser("~/.power_paste/language")
 CONFIG_FILE = os.path.expanduser("~/.power_paste/config.json")
+STATS_FILE = os.path.expanduser("~/.power_paste/stats.json")
+STATS_INTERVAL = 10  # Segundos entre gravações do arquivo de estatísticas
+IPC_SOCKET_FILE = os.path.expanduser("~/.power_paste/power_paste.sock")
+IPC_COPY_TIMEOUT = 5  # Segundos que um pedido de cópia espera pela thread principal
 MAX_ITEMS_TO_SHOW = 25  # Limita o número de itens no menu
-LAST_ITEM_HASH = None  # Rastreia o último item processado
+MAX_SEARCH_RESULTS = 20  # Limita o número de resultados da busca
 DEFAULT_CONFIG = {
     "max_items": 25,
+    "history_sections": True,  # Itens além de max_items em submenus por período
     "start_at_login": True,
-    "language": "pt_BR"
+    "language": "pt_BR",
+    "history_backend": "journal",  # "journal" ou "sqlite"
+    "history_write_debounce_ms": 500,  # Agrupa gravações do histórico nessa janela
+    "diagnostics": False,  # Mede os caminhos quentes e grava STATS_FILE
+    "ipc_server": True,  # Atende o cliente `power-paste` em IPC_SOCKET_FILE
+    "retention": DEFAULT_RETENTION,  # Idade, quantidade e MB guardados (total e por tipo)
+    "near_duplicates": DEFAULT_NEAR_DUPLICATES,  # Agrupa textos quase iguais (SimHash)
+    "image_duplicates": DEFAULT_IMAGE_DUPLICATES,  # Agrupa imagens visualmente iguais (dHash)
+    "clipboard_polling": DEFAULT_POLLING,  # Intervalo adaptativo da verificação da área de transferência
+    "command_helper": DEFAULT_COMMAND_HELPER  # Processo auxiliar persistente para osascript/pbcopy/pbpaste
 }
 
 # Dicionário de traduções
@@ -67,6 +97,22 @@ TRANSLATIONS = {
         "language_en_US": "🇺🇸 Inglês (English)",
         "start_at_login_select": "Iniciar o Power Paste automaticamente?",
         "max_items_select": "Escolha quantos itens manter no histórico:",
+        "search": "Buscar no Histórico...",
+        "search_title": "Buscar no Histórico",
+        "search_message": "Digite o texto que deseja encontrar:",
+        "search_button": "Buscar",
+        "search_results": "Resultados da busca:",
+        "search_no_results": "Nenhum item encontrado",
+        "image_processing": "Processando imagem...",
+        "section_earlier_today": "Hoje mais cedo",
+        "section_yesterday": "Ontem",
+        "section_this_week": "Esta semana",
+        "section_older": "Mais antigos",
+        "section_more": "Mais...",
+        "diagnostics": "Diagnóstico",
+        "diagnostics_title": "Diagnóstico (último minuto)",
+        "diagnostics_empty": "Nenhuma medição no último minuto.",
+        "diagnostics_disabled": "O diagnóstico está desativado. Defina \"diagnostics\": true em ~/.power_paste/config.json e reinicie o Power Paste.",
         "yes": "Sim",
         "no": "Não"
     },
@@ -108,6 +154,22 @@ TRANSLATIONS = {
         "language_en_US": "🇺🇸 Inglês (English)",
         "start_at_login_select": "Iniciar o Power Paste automaticamente?",
         "max_items_select": "Escolha quantos itens manter no histórico:",
+        "search": "Pesquisar no Histórico...",
+        "search_title": "Pesquisar no Histórico",
+        "search_message": "Escreva o texto que pretende encontrar:",
+        "search_button": "Pesquisar",
+        "search_results": "Resultados da pesquisa:",
+        "search_no_results": "Nenhum item encontrado",
+        "image_processing": "A processar imagem...",
+        "section_earlier_today": "Hoje mais cedo",
+        "section_yesterday": "Ontem",
+        "section_this_week": "Esta semana",
+        "section_older": "Mais antigos",
+        "section_more": "Mais...",
+        "diagnostics": "Diagnóstico",
+        "diagnostics_title": "Diagnóstico (último minuto)",
+        "diagnostics_empty": "Nenhuma medição no último minuto.",
+        "diagnostics_disabled": "O diagnóstico está desativado. Defina \"diagnostics\": true em ~/.power_paste/config.json e reinicie o Power Paste.",
         "yes": "Sim",
         "no": "Não"
     },
@@ -149,6 +211,22 @@ TRANSLATIONS = {
         "language_en_US": "🇺🇸 English",
         "start_at_login_select": "Start Power Paste automatically?",
         "max_items_select": "Choose how many items to keep in history:",
+        "search": "Search History...",
+        "search_title": "Search History",
+        "search_message": "Type the text you want to find:",
+        "search_button": "Search",
+        "search_results": "Search results:",
+        "search_no_results": "No items found",
+        "image_processing": "Processing image...",
+        "section_earlier_today": "Earlier today",
+        "section_yesterday": "Yesterday",
+        "section_this_week": "This week",
+        "section_older": "Older",
+        "section_more": "More...",
+        "diagnostics": "Diagnostics",
+        "diagnostics_title": "Diagnostics (last minute)",
+        "diagnostics_empty": "No measurements in the last minute.",
+        "diagnostics_disabled": "Diagnostics are disabled. Set \"diagnostics\": true in ~/.power_paste/config.json and restart Power Paste.",
         "yes": "Yes",
         "no": "No"
     }
@@ -171,32 +249,31 @@ def load_language():
             print(f"Erro ao carregar arquivo de idioma: {e}")
     return CURRENT_LANGUAGE
 
-# Carrega configurações
+# Carrega configurações (e o idioma) uma única vez, na inicialização
 def load_config():
-    global MAX_ITEMS_TO_SHOW
-    
-    # Certifique-se que o diretório existe
-    os.makedirs(os.path.dirname(CONFIG_FILE), exist_ok=True)
+    global MAX_ITEMS_TO_SHOW, CURRENT_LANGUAGE
     
     # Tenta carregar o arquivo de configuração existente
     if os.path.exists(CONFIG_FILE):
         try:
             with open(CONFIG_FILE, 'r') as f:
                 config = json.load(f)
-                # Atualiza configurações globais
-                if 'max_items' in config:
-                    MAX_ITEMS_TO_SHOW = config['max_items']
-                if 'language' in config:
-                    # Salva no arquivo de idioma para compatibilidade com versões antigas
-                    with open(LANGUAGE_FILE, 'w') as lang_file:
-                        lang_file.write(config['language'])
-                return config
+            # Atualiza configurações globais
+            if 'max_items' in config:
+                MAX_ITEMS_TO_SHOW = config['max_items']
+            if config.get('language') in TRANSLATIONS:
+                CURRENT_LANGUAGE = config['language']
+            else:
+                load_language()
+            return config
         except Exception as e:
             print(f"Erro ao carregar configurações: {e}")
     
-    # Se não conseguir carregar, cria um arquivo de configuração padrão
-    save_config(DEFAULT_CONFIG)
-    return DEFAULT_CONFIG
+    # Se não conseguir carregar, cria a configuração padrão mantendo o
+    # idioma escolhido em versões antigas
+    config = dict(DEFAULT_CONFIG, language=load_language())
+    save_config(config)
+    return config
 
 # Salva configurações
 def save_config(config):
@@ -204,6 +281,10 @@ def save_config(config):
         os.makedirs(os.path.dirname(CONFIG_FILE), exist_ok=True)
         with open(CONFIG_FILE, 'w') as f:
             json.dump(config, f, indent=4)
+        if 'language' in config:
+            # Salva no arquivo de idioma para compatibilidade com versões antigas
+            with open(LANGUAGE_FILE, 'w') as lang_file:
+                lang_file.write(config['language'])
         return True
     except Exception as e:
         print(f"Erro ao salvar configurações: {e}")
@@ -249,18 +330,12 @@ def set_start_at_login(enable=True):
             end tell
             '''
         
-        subprocess.run(['osascript', '-e', script], check=True)
+        run_command(['osascript', '-e', script], check=True)
         return True
     except Exception as e:
         print(f"Erro ao configurar inicialização automática: {e}")
         return False
 
-# Carrega o idioma na inicialização
-load_language()
-
-# Carrega configurações
-config = load_config()
-
 # Funções de manipulação da área de transferência usando APIs nativas
 def copy_text_to_clipboard_native(text):
     """
@@ -281,8 +356,7 @@ def copy_text_to_clipboard_native(text):
     # Método 2: Via pbcopy (backup)
     if not success:
         try:
-            process = subprocess.Popen(['pbcopy'], stdin=subprocess.PIPE)
-            process.communicate(text.encode('utf-8'))
+            run_command(['pbcopy'], input=text, check=True)
             success = True
         except Exception as e:
             print(f"Erro ao copiar texto (pbcopy): {e}")
@@ -292,7 +366,7 @@ def copy_text_to_clipboard_native(text):
         try:
             escaped_text = text.replace('"', '\\"').replace("'", "\\'")
             script = f'set the clipboard to "{escaped_text}"'
-            subprocess.run(['osascript', '-e', script], check=True)
+            run_command(['osascript', '-e', script], check=True)
             success = True
         except Exception as e:
             print(f"Erro ao copiar texto (AppleScript): {e}")
@@ -315,7 +389,7 @@ def copy_image_to_clipboard_native(image_path):
         set theImage to (POSIX file "{abs_path}")
         set the clipboard to (read theImage as «class PNGf»)
         '''
-        result = subprocess.run(['osascript', '-e', script], capture_output=True)
+        result = run_command(['osascript', '-e', script])
         if result.returncode == 0:
             success = True
         
@@ -329,7 +403,7 @@ def copy_image_to_clipboard_native(image_path):
             set theImage to (POSIX file "{abs_path}")
             set the clipboard to (read theImage as «class TIFF»)
             '''
-            result = subprocess.run(['osascript', '-e', script], capture_output=True)
+            result = run_command(['osascript', '-e', script])
             if result.returncode == 0:
                 success = True
             
@@ -354,8 +428,7 @@ def copy_image_to_clipboard_native(image_path):
         try:
             with open(abs_path, 'rb') as f:
                 img_data = f.read()
-            process = subprocess.Popen(['pbcopy'], stdin=subprocess.PIPE)
-            process.communicate(img_data)
+            run_command(['pbcopy'], input=img_data, check=True)
             success = True
         except Exception:
             pass
@@ -370,21 +443,83 @@ def copy_selected_text_to_clipboard(text):
         return copy_text_to_clipboard_native(text)
     return False
 
+def create_history_store(backend):
+    """Cria o armazenamento do histórico conforme a configuração."""
+    if backend == "sqlite":
+        from history_sqlite import SQLiteHistoryStore
+        return SQLiteHistoryStore(HISTORY_DB_FILE)
+    return HistoryJournal(HISTORY_JOURNAL_FILE)
+
+def escape_applescript(text):
+    """Escapa barras e aspas para uso dentro de strings AppleScript."""
+    return text.replace('\\', '\\\\').replace('"', '\\"')
+
+class SubmenuDelegate(NSObject):
+    """Delegate do submenu de uma seção: monta os itens antes de ele aparecer."""
+
+    def menuNeedsUpdate_(self, menu):
+        try:
+            with STATS.timer("menu.section"):
+                self.on_open()
+        except Exception as e:
+            print(f"Erro ao montar submenu: {e}")
+
+
 class PowerPasteApp(rumps.App):
     def __init__(self):
         # Inicializa atributos essenciais logo no início
-        self.history = []  # Inicializa o histórico como lista vazia
+        self.store = None
+        self.images = ImageStore(TEMP_IMAGE_DIR)
+        self.thumbnails = ThumbnailCache(THUMBNAIL_DIR)
+        self.blobs = TextBlobStore(TEXT_BLOB_DIR)
+        self.thumbnail_images = MemoryLRU(THUMBNAIL_MEMORY_ITEMS, self.load_thumbnail_image)
+        self.ingest = ImageIngest(self.images, self.thumbnails)
+        self.ipc = None  # Servidor local de comandos
+        self.poller = None  # Intervalo adaptativo (None = timer fixo de 1 s)
+        self.command_runner = None  # Processo auxiliar (None = um processo por comando)
+        # Núcleo sem interface: observador, histórico e arquivos
+        # (observa só quando há mudança no changeCount)
+        self.engine = ClipboardEngine(
+            ClipboardWatcher(MacPasteboard(), hash_images=False), None,
+            self.images, self.blobs, self.ingest, self.thumbnails
+        )
         
         try:
-            # Carrega o idioma antes de inicializar o app
-            load_language()
-            
-            # Carrega as configurações
+            # Carrega as configurações e o idioma antes de inicializar o app
             self.config = load_config()
             
-            # Configura inicialização automática se necessário
+            # Instrumentação dos caminhos quentes (desativada por padrão)
+            STATS.enable(bool(self.config.get('diagnostics')) or
+                         os.environ.get('POWER_PASTE_STATS') == '1')
+            
+            # Escolhe o backend de armazenamento do histórico; as gravações
+            # acontecem em uma thread própria, agrupadas em lotes
+            self.store = HistoryWriter(
+                create_history_store(self.config.get('history_backend', 'journal')),
+                debounce=self.config.get('history_write_debounce_ms', 500) / 1000.0
+            )
+            self.engine.store = self.store
+            # Textos grandes são gravados pela mesma thread, antes dos registros
+            self.blobs.schedule = self.store.call
+            self.engine.retention.policy = RetentionPolicy.from_config(self.config.get('retention'))
+            self.engine.near_duplicates = NearDuplicateIndex.from_config(self.config.get('near_duplicates'))
+            self.engine.image_duplicates = ImageDuplicateIndex.from_config(self.config.get('image_duplicates'))
+            if self.engine.image_duplicates is not None:
+                # A impressão é calculada no processamento, junto com a miniatura
+                self.ingest.fingerprint = dhash
+            self.poller = AdaptivePoller.from_config(self.config.get('clipboard_polling'))
+            
+            # osascript, pbcopy e pbpaste passam por um processo auxiliar
+            # persistente, iniciado fora do caminho de inicialização
+            self.command_runner = HelperRunner.from_config(self.config.get('command_helper'))
+            if self.command_runner is not None:
+                set_runner(self.command_runner)
+                threading.Thread(target=self.command_runner.start, daemon=True).start()
+            
+            # Configura inicialização automática se necessário (o osascript
+            # é lento, então roda fora do caminho de inicialização)
             if self.config.get('start_at_login', True):
-                set_start_at_login(True)
+                threading.Thread(target=set_start_at_login, args=(True,), daemon=True).start()
             
             # Verifica qual arquivo de ícone usar (preferindo o .icns se disponível)
             icon_file = "icon.icns" if os.path.exists("icon.icns") else "icon.png"
@@ -402,17 +537,32 @@ class PowerPasteApp(rumps.App):
             # Garante que o diretório temporário exista
             self.ensure_temp_dir()
             
-            # Carrega o histórico
-            historical_data = self.load_history() 
-            if historical_data:
-                self.history = historical_data
+            # Carrega o histórico e conta as referências aos arquivos
+            self.engine.load(self.load_history())
+            usage = self.images.disk_usage()
+            print(f"Imagens: {usage['files']} arquivos, {usage['bytes']} bytes, "
+                  f"{usage['pending_gc']} aguardando coleta")
             
             # Constrói o menu inicial
             self.build_menu()
             
-            # Configura o timer para verificar a área de transferência
-            self.timer = rumps.Timer(self.check_clipboard, 1)
-            self.timer.start()
+            # Verifica a área de transferência: com o intervalo adaptativo cada
+            # verificação agenda a próxima; sem ele, um timer fixo de 1 s
+            if self.poller is not None:
+                self.schedule_clipboard_check()
+            else:
+                self.timer = rumps.Timer(self.check_clipboard, 1)
+                self.timer.start()
+            
+            # Estatísticas gravadas periodicamente (só com o diagnóstico ativo)
+            if STATS.enabled:
+                self.stats_timer = rumps.Timer(self.write_stats, STATS_INTERVAL)
+                self.stats_timer.start()
+            
+            # Servidor local para o cliente de linha de comando (fora do
+            # caminho de inicialização, como a inicialização automática)
+            if self.config.get('ipc_server', True):
+                threading.Thread(target=self.start_ipc_server, daemon=True).start()
             
         except Exception as e:
             print(f"Erro na inicialização: {e}")
@@ -428,38 +578,52 @@ class PowerPasteApp(rumps.App):
             # Certifica que o menu existe
             self.menu = []
         
-        # Adiciona os itens do histórico
-        self.build_history_menu()
+        # Adiciona os itens do histórico (atualizados depois só por diferença);
+        # os mais antigos ficam em submenus montados só quando abertos
+        self.history_sections = HistorySections(
+            rumps.MenuItem, self.make_menu_item, self.menu_entries,
+            {key: _(f"section_{key}") for key in ("earlier_today", "yesterday", "this_week", "older", "more")},
+            _("clipboard_empty"), self.watch_submenu
+        )
+        self.history_menu = HistoryMenu(self.menu, self.history_sections.make_item, _("clipboard_empty"))
+        with STATS.timer("menu.build"):
+            self.history_menu.build(self.build_history_menu())
         
         # Adiciona os itens do menu básico (com separador)
         self.menu.add(rumps.separator)  # Usa separador nativo do rumps
         
+        search_item = rumps.MenuItem(title=_("search"))
+        diagnostics_item = rumps.MenuItem(title=_("diagnostics"))
         clear_history = rumps.MenuItem(title=_("clear_history"))
         about_item = rumps.MenuItem(title=_("about"))
         quit_item = rumps.MenuItem(title=_("quit"))
         
         # Conecta os callbacks
+        search_item.set_callback(self.search_history)
+        diagnostics_item.set_callback(self.show_diagnostics)
         clear_history.set_callback(self.clear_history)
         about_item.set_callback(self.show_about)
         quit_item.set_callback(self.quit_app)
         
         # Adiciona items ao menu
+        self.menu.add(search_item)
+        self.menu.add(diagnostics_item)
         self.menu.add(clear_history)
         self.menu.add(about_item)
         self.menu.add(quit_item)
     
+    @property
+    def history(self):
+        return self.engine.history
+
     def quit_app(self, _):
-        # Limpa a pasta temporária
-        try:
-            if os.path.exists(TEMP_IMAGE_DIR):
-                for f in os.listdir(TEMP_IMAGE_DIR):
-                    try:
-                        os.remove(os.path.join(TEMP_IMAGE_DIR, f))
-                    except:
-                        pass
-        except:
-            pass
-        
+        # Para de aceitar comandos locais antes de fechar o histórico
+        if self.ipc is not None:
+            self.ipc.stop()
+        # Termina as imagens pendentes, grava o histórico e coleta os órfãos
+        self.engine.close()
+        if self.command_runner is not None:
+            self.command_runner.close()
         rumps.quit_application()
     
     def ensure_temp_dir(self):
@@ -468,151 +632,155 @@ class PowerPasteApp(rumps.App):
             os.makedirs(TEMP_IMAGE_DIR)
 
     def load_history(self):
-        """Carrega o histórico do arquivo."""
+        """Carrega o histórico (migrando formatos anteriores se necessário)."""
         try:
-            if os.path.exists(HISTORY_FILE):
-                with open(HISTORY_FILE, 'r') as f:
-                    history = json.load(f)
-                    # Ordena por timestamp (mais recente primeiro)
-                    return sorted(
-                        history, 
-                        key=lambda x: datetime.strptime(x.get("timestamp", "2000-01-01 00:00:00"), "%Y-%m-%d %H:%M:%S"), 
-                        reverse=True
-                    )
+            backend = self.store.store
+            if not isinstance(backend, HistoryJournal):
+                if not backend.exists():
+                    # Importa o journal (ou o JSON legado) para o SQLite
+                    journal = HistoryJournal(HISTORY_JOURNAL_FILE)
+                    migrate_json_history(HISTORY_FILE, journal)
+                    backend.rewrite(journal.load())
+                    print("Histórico importado para o SQLite")
+            elif migrate_json_history(HISTORY_FILE, backend):
+                print("Histórico JSON migrado para o journal")
+            # O armazenamento já guarda os itens na ordem de inserção
+            return self.store.load()
         except (json.JSONDecodeError, ValueError, KeyError, Exception) as e:
             print(f"Erro ao carregar histórico: {e}")
             # Em caso de erro, retorna lista vazia
             return []
-        # Se não existir arquivo ou qualquer outro caso, retorna lista vazia
-        return []
 
     def save_history(self):
-        """Salva o histórico no arquivo."""
-        try:
-            with open(HISTORY_FILE, 'w') as f:
-                json.dump(self.history, f, indent=2)
-        except Exception as e:
-            print(f"Erro ao salvar histórico: {e}")
+        """Reescreve o armazenamento com o histórico atual (compactação completa)."""
+        self.engine.save()
 
     def clean_history(self, _=None):
-        """Limpa todo o histórico."""
+        """Remove do histórico imagens e textos grandes cujo arquivo não existe mais."""
         if not self.history:
             return
-            
-        # Remove itens duplicados baseados no hash
-        seen_hashes = set()
-        unique_items = []
-        
-        for item in self.history:
-            item_hash = item.get("hash")
-            if not item_hash or item_hash in seen_hashes:
-                continue
-                
-            # Verifica se é uma imagem e se o arquivo existe
-            if item.get("type") == "image":
-                img_path = item.get("content", "")
-                if img_path and not os.path.exists(img_path):
-                    continue
-            
-            seen_hashes.add(item_hash)
-            unique_items.append(item)
+        self.engine.clean()
+
+    def make_menu_item(self, title, callback, item_hash):
+        """Cria um item de menu do histórico associado ao hash do item."""
+        menu_item = rumps.MenuItem(title)
+        menu_item._hash = item_hash  # Associa o hash ao invés do objeto completo
+        menu_item.set_callback(callback)
         
-        # Atualiza o histórico
-        self.history = unique_items
-        self.save_history()
+        # Imagens mostram a miniatura (nunca a imagem em tamanho real)
+        item = self.history.get(item_hash)
+        if item is not None and item.get("type") == "image" and not item.get("processing"):
+            thumbnail = self.thumbnail_images.get(item_hash)
+            if thumbnail is not None:
+                menu_item._menuitem.setImage_(thumbnail)
+        return menu_item
+
+    def watch_submenu(self, menu_item, on_open):
+        """Chama `on_open` sempre que o submenu do item estiver para abrir."""
+        delegate = SubmenuDelegate.alloc().init()
+        delegate.on_open = on_open
+        menu_item._menu.setDelegate_(delegate)
+        # O NSMenu não retém o delegate
+        menu_item._submenu_delegate = delegate
+
+    def load_thumbnail_image(self, image_hash):
+        """Carrega a miniatura do cache em disco como NSImage."""
+        path = self.thumbnails.get(image_hash)
+        if path is None:
+            # Item antigo sem miniatura: gera em segundo plano
+            item = self.history.get(image_hash)
+            if item is not None and item.get("content"):
+                self.ingest.generate_thumbnail(image_hash, item["content"])
+            return None
+        image = NSImage.alloc().initWithContentsOfFile_(path)
+        if image:
+            image.setSize_(THUMBNAIL_DISPLAY_SIZE)
+        return image
 
     def rebuild_menu(self):
-        """Reconstrói o menu completo da aplicação."""
-        # Limpa o menu atual
-        self.menu.clear()
-        
-        # Adiciona itens do histórico
-        self.build_history_menu()
-        
-        # Adiciona separador e opções de gerenciamento
-        self.menu.add(rumps.separator)  # Usa separador nativo do rumps
-        
-        clear_history = rumps.MenuItem(title=_("clear_history"))
-        about_item = rumps.MenuItem(title=_("about"))
-        quit_item = rumps.MenuItem(title=_("quit"))
-        
-        # Conecta os callbacks
-        clear_history.set_callback(self.clear_history)
-        about_item.set_callback(self.show_about)
-        quit_item.set_callback(self.quit_app)
-        
-        # Adiciona items ao menu
-        self.menu.add(clear_history)
-        self.menu.add(about_item)
-        self.menu.add(quit_item)
+        """Atualiza os itens do histórico no menu aplicando só as diferenças."""
+        with STATS.timer("menu.update"):
+            self.history_menu.update(self.build_history_menu())
+
+    def write_stats(self, _=None):
+        """Grava as estatísticas em STATS_FILE (lido por ferramentas externas)."""
+        try:
+            STATS.write(STATS_FILE)
+        except Exception as e:
+            print(f"Erro ao gravar estatísticas: {e}")
+
+    def show_diagnostics(self, sender=None):
+        """Mostra o resumo das medições do último minuto."""
+        if not STATS.enabled:
+            rumps.alert(title=_("diagnostics"), message=_("diagnostics_disabled"))
+            return
+        self.write_stats()
+        rumps.alert(title=_("diagnostics_title"), message=STATS.summary() or _("diagnostics_empty"))
 
     def build_history_menu(self):
-        """Constrói a parte do menu com os itens do histórico."""
-        # Verifica se há itens no histórico
-        if not hasattr(self, 'history') or not self.history:
-            empty_item = rumps.MenuItem(_("clipboard_empty"))
-            empty_item.set_callback(None)  # Torna não clicável
-            self.menu.add(empty_item)
+        """Monta as entradas (hash, título, callback) do histórico no menu principal."""
+        # Os N itens mais recentes (o histórico já está em ordem cronológica)
+        if self.config.get('history_sections', True):
+            visible, sections = split_history(self.history, MAX_ITEMS_TO_SHOW, time.time())
         else:
-            # Limita para os N itens mais recentes e garante que estão ordenados por data
-            items_to_show = sorted(
-                self.history[:MAX_ITEMS_TO_SHOW],
-                key=lambda x: datetime.strptime(x.get("timestamp", "2000-01-01 00:00:00"), "%Y-%m-%d %H:%M:%S"),
-                reverse=True  # Ordem decrescente (mais recentes primeiro)
-            )
-            
-            # Adiciona os itens ao menu
-            for idx, item in enumerate(items_to_show):
-                # Obtém o timestamp formatado
-                try:
-                    item_timestamp = datetime.strptime(
-                        item.get("timestamp", "2000-01-01 00:00:00"), 
-                        "%Y-%m-%d %H:%M:%S"
-                    )
-                    display_time = item_timestamp.strftime("%H:%M")
-                except (ValueError, KeyError):
-                    display_time = "--:--"
-                
-                # Formata o item com base no tipo
-                if item.get("type") == "text":
-                    text_content = item.get("content", "")
-                    # Limpa o texto para o menu
-                    preview = text_content.replace('\n', ' ').replace('\r', ' ')
-                    preview = ' '.join(preview.split())
-                    
-                    if len(preview) > 40:
-                        preview = preview[:40] + "..."
-                    
-                    title = f"{display_time} | {preview}"
-                    
-                    # Cria o item de menu para texto
-                    menu_item = rumps.MenuItem(title)
-                    menu_item._idx = idx  # Associa um índice ao invés do objeto completo
-                    menu_item.set_callback(self.paste_text_item)
-                    self.menu.add(menu_item)
-                    
-                elif item.get("type") == "image":
-                    # Cria item direto para abrir no Preview
-                    title = f"{display_time} | 🖼️ {_('image_preview') if CURRENT_LANGUAGE != 'en_US' else 'Image'}"
-                    menu_item = rumps.MenuItem(title)
-                    menu_item._idx = idx
-                    menu_item.set_callback(self.open_image_in_preview)
-                    self.menu.add(menu_item)
-                else:
-                    # Tipo desconhecido
-                    title = f"{display_time} | {_('unknown_item')}"
-                    menu_item = rumps.MenuItem(title)
-                    self.menu.add(menu_item)
+            visible, sections = self.history.newest(MAX_ITEMS_TO_SHOW), []
+        return self.menu_entries(visible) + self.history_sections.entries(sections)
+
+    def menu_entries(self, items):
+        """Entradas de menu dos itens dados (menu principal ou submenu de seção)."""
+        labels = {
+            "processing": f"⏳ {_('image_processing')}",
+            "image": f"🖼️ {_('image_preview') if CURRENT_LANGUAGE != 'en_US' else 'Image'}",
+            "unknown": _('unknown_item'),
+        }
+        return history_entries(items, labels, self.paste_text_item, self.open_image_in_preview)
+
+    def item_text(self, item):
+        """Retorna o texto completo do item (lendo do disco se estiver fora de linha)."""
+        return self.engine.item_text(item)
+
+    def start_ipc_server(self):
+        """Abre o socket local usado pelo cliente `power-paste`."""
+        try:
+            from ipc_server import HistoryRequests, IPCServer
+            server = IPCServer(IPC_SOCKET_FILE, HistoryRequests(self.engine, self.copy_item))
+            if server.start():
+                self.ipc = server
+        except Exception as e:
+            print(f"Erro ao iniciar servidor local: {e}")
+
+    def copy_item(self, item):
+        """Copia um item do histórico (pedido do cliente local, fora da thread principal)."""
+        if item.get("type") == "image":
+            # O AppleScript roda em um processo separado: não precisa da thread principal
+            return copy_image_to_clipboard_native(item.get("content", ""))
+        
+        # O texto é lido aqui; só a escrita no NSPasteboard vai para a thread principal
+        text = self.item_text(item)
+        if not text:
+            return False
+        from concurrent.futures import Future
+        from PyObjCTools import AppHelper
+        done = Future()
+        
+        def copy_on_main_thread():
+            try:
+                done.set_result(copy_text_to_clipboard_native(text))
+            except Exception as e:
+                done.set_exception(e)
+        
+        AppHelper.callAfter(copy_on_main_thread)
+        return done.result(timeout=IPC_COPY_TIMEOUT)
 
     def paste_text_item(self, sender):
         """Mostra uma janela para visualizar e copiar o texto selecionado."""
         try:
-            idx = getattr(sender, '_idx', None)
-            if idx is None or idx >= len(self.history):
+            item = self.history.get(getattr(sender, '_hash', None))
+            if item is None:
                 return
                 
-            item = self.history[idx]
-            text = item.get("content", "")
+            # Textos grandes são lidos do disco só agora
+            text = self.item_text(item)
             
             if not text:
                 return
@@ -626,11 +794,10 @@ class PowerPasteApp(rumps.App):
     def open_image_in_preview(self, sender):
         """Abre a imagem diretamente no Preview."""
         try:
-            idx = getattr(sender, '_idx', None)
-            if idx is None or idx >= len(self.history):
+            item = self.history.get(getattr(sender, '_hash', None))
+            if item is None:
                 return
                 
-            item = self.history[idx]
             content = item.get("content", "")
             
             if not content:
@@ -680,7 +847,7 @@ class PowerPasteApp(rumps.App):
             '''
             
             # Executa o script e verifica o resultado
-            subprocess.run(["osascript", "-e", script], check=False)
+            run_command(["osascript", "-e", script])
             
             # Copia o texto para a área de transferência de qualquer forma
             if copy_text_to_clipboard_native(text):
@@ -700,6 +867,57 @@ class PowerPasteApp(rumps.App):
                     _("copy_success")
                 )
     
+    def search_history(self, sender=None):
+        """Pede um texto, busca no histórico e copia o resultado escolhido."""
+        try:
+            window = rumps.Window(
+                message=_("search_message"),
+                title=_("search_title"),
+                ok=_("search_button"),
+                cancel=_("cancel"),
+                dimensions=(320, 24)
+            )
+            response = window.run()
+            if not response.clicked or not response.text.strip():
+                return
+            
+            # Busca aproximada em memória; o backend fica como alternativa
+            results = self.engine.search(response.text, limit=MAX_SEARCH_RESULTS)
+            if not results:
+                rumps.notification("Power Paste", _("notice"), _("search_no_results"))
+                return
+            
+            # Monta a lista de prévias numeradas para o AppleScript
+            titles = []
+            for pos, item in enumerate(results, 1):
+                preview = item.get("preview") or text_preview(item.get("content", ""), 60)
+                titles.append(f'"{pos}. {escape_applescript(preview)}"')
+            
+            script = f'''
+            tell application "System Events"
+                set theChoice to choose from list {{{", ".join(titles)}}} ¬
+                    with title "{_('search_title')}" ¬
+                    with prompt "{_('search_results')}" ¬
+                    OK button name "{_('copy')}" ¬
+                    cancel button name "{_('cancel')}"
+                if theChoice is false then
+                    return "CANCEL"
+                else
+                    return item 1 of theChoice
+                end if
+            end tell
+            '''
+            result = run_command(['osascript', '-e', script], text=True)
+            choice = result.stdout.strip()
+            if choice == "CANCEL" or '.' not in choice:
+                return
+            
+            item = results[int(choice.split('.', 1)[0]) - 1]
+            if copy_text_to_clipboard_native(self.item_text(item)):
+                rumps.notification("Power Paste", _("notice"), _("copy_success"))
+        except Exception as e:
+            print(f"Erro ao buscar no histórico: {e}")
+    
     def clear_history(self, _=None):
         """Limpa todo o histórico."""
         if not self.history:
@@ -718,20 +936,12 @@ class PowerPasteApp(rumps.App):
         end tell
         '''
         
-        result = subprocess.run(['osascript', '-e', script], 
-                               capture_output=True, text=True)
+        result = run_command(['osascript', '-e', script], text=True)
         
         if result.stdout.strip() == "yes":
-            # Limpa o histórico
-            self.history = []
-            self.save_history()
-            
-            # Limpa arquivos temporários de imagens
-            for file in os.listdir(TEMP_IMAGE_DIR):
-                try:
-                    os.remove(os.path.join(TEMP_IMAGE_DIR, file))
-                except:
-                    pass
+            # Limpa o histórico, os arquivos e as miniaturas
+            self.engine.clear()
+            self.thumbnail_images.clear()
             
             self.rebuild_menu()
             
@@ -745,10 +955,6 @@ class PowerPasteApp(rumps.App):
     def show_about(self, _):
         """Mostra uma janela 'Sobre' nativa do macOS"""
         try:
-            # Importa os módulos necessários do PyObjC
-            from AppKit import NSAlert, NSImage, NSString
-            from Foundation import NSMakeRect, NSURL
-            
             # Cria um alerta nativo do macOS
             alert = NSAlert.alloc().init()
             alert.setAlertStyle_(0)  # Estilo informativo
@@ -839,8 +1045,7 @@ class PowerPasteApp(rumps.App):
             '''
             
             # Obtém idioma
-            result_language = subprocess.run(['osascript', '-e', script_language], 
-                                            capture_output=True, text=True)
+            result_language = run_command(['osascript', '-e', script_language], text=True)
             selected_language = result_language.stdout.strip()
             
             if selected_language == "CANCEL":
@@ -873,8 +1078,7 @@ class PowerPasteApp(rumps.App):
             '''
             
             # Obtém configuração de inicialização
-            result_startup = subprocess.run(['osascript', '-e', script_startup], 
-                                          capture_output=True, text=True)
+            result_startup = run_command(['osascript', '-e', script_startup], text=True)
             selected_startup = result_startup.stdout.strip()
             
             if selected_startup == "CANCEL":
@@ -914,8 +1118,7 @@ class PowerPasteApp(rumps.App):
             '''
             
             # Obtém número máximo de itens
-            result_max_items = subprocess.run(['osascript', '-e', script_max_items], 
-                                            capture_output=True, text=True)
+            result_max_items = run_command(['osascript', '-e', script_max_items], text=True)
             selected_max_items = result_max_items.stdout.strip()
             
             if selected_max_items == "CANCEL":
@@ -940,7 +1143,7 @@ class PowerPasteApp(rumps.App):
                     display notification "{_('settings_saved')}" with title "Power Paste"
                 end tell
                 '''
-                subprocess.run(['osascript', '-e', notify_script], check=False)
+                run_command(['osascript', '-e', notify_script])
                 
                 # Se mudou de idioma, precisa reiniciar para aplicar
                 if selected_language != current_language:
@@ -958,8 +1161,7 @@ class PowerPasteApp(rumps.App):
                     end tell
                     '''
                     
-                    restart_result = subprocess.run(['osascript', '-e', script_restart], 
-                                                  capture_output=True, text=True)
+                    restart_result = run_command(['osascript', '-e', script_restart], text=True)
                     
                     if restart_result.stdout.strip() == "RESTART":
                         # Reinicia o aplicativo
@@ -968,6 +1170,7 @@ class PowerPasteApp(rumps.App):
                             app_path = "/Applications/Power Paste.app"
                         
                         # Encerra esta instância e inicia uma nova
+                        self.store.close()
                         subprocess.Popen(['open', app_path])
                         rumps.quit_application()
                 else:
@@ -983,159 +1186,28 @@ class PowerPasteApp(rumps.App):
 
     def check_clipboard(self, _):
         """Verifica a área de transferência por novos conteúdos."""
-        global LAST_ITEM_HASH
-        
-        try:
-            # 1. Verifica se há texto
-            text = pyperclip.paste()
-            if text and text.strip():
-                # Normaliza e gera hash
-                normalized = text.replace('\r\n', '\n').replace('\r', '\n')
-                text_hash = hashlib.md5(normalized.encode('utf-8', 'ignore')).hexdigest()
-                
-                # Verifica se é diferente do último item
-                if text_hash != LAST_ITEM_HASH:
-                    # Filtra textos indesejados
-                    if (len(normalized) > 2 and 
-                        "demorou demais" not in normalized and 
-                        "# Por ora" not in normalized and
-                        not (normalized.strip() in ['#', '...', '# ...', '@'])):
-                        
-                        # Adiciona ao histórico
-                        self.add_history_item("text", normalized, text_hash)
-                        print(f"Novo texto adicionado ao histórico: {normalized[:30]}...")
-                        return
-        except Exception as e:
-            print(f"Erro ao verificar texto no clipboard: {e}")
-        
-        # Continua verificando imagens...
-        # 2. Verifica se há imagem - primeiro tenta com APIs nativas
-        try:
-            pb = NSPasteboard.generalPasteboard()
-            if pb.dataForType_(NSPasteboardTypePNG):
-                png_data = pb.dataForType_(NSPasteboardTypePNG)
-                data_bytes = png_data.bytes().tobytes()
-                
-                if data_bytes and len(data_bytes) > 100:
-                    img_hash = hashlib.md5(data_bytes).hexdigest()
-                    
-                    if img_hash != LAST_ITEM_HASH:
-                        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                        filename = f"img_{timestamp}.png"
-                        path = os.path.join(TEMP_IMAGE_DIR, filename)
-                        
-                        with open(path, 'wb') as f:
-                            f.write(data_bytes)
-                            
-                        self.add_history_item("image", path, img_hash)
-                        return
-        except:
-            pass
-            
-        # 3. Tenta obter imagem via comandos pbpaste como fallback
-        try:
-            process = subprocess.Popen(
-                ['pbpaste', '-Prefer', 'public.png'], 
-                stdout=subprocess.PIPE, 
-                stderr=subprocess.PIPE
-            )
-            data, _ = process.communicate(timeout=0.5)
-            
-            if process.returncode == 0 and data and len(data) > 100:
-                # Gera hash dos dados
-                img_hash = hashlib.md5(data).hexdigest()
-                
-                # Verifica se é diferente do último item
-                if img_hash != LAST_ITEM_HASH:
-                    # Salva a imagem
-                    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                    filename = f"img_{timestamp}.png"
-                    path = os.path.join(TEMP_IMAGE_DIR, filename)
-                    
-                    with open(path, 'wb') as f:
-                        f.write(data)
-                        
-                    # Adiciona ao histórico
-                    self.add_history_item("image", path, img_hash)
-                    return
-                    
-        except:
-            pass
-            
-        # 4. Tenta TIFF se PNG falhar
-        try:
-            process = subprocess.Popen(
-                ['pbpaste', '-Prefer', 'public.tiff'], 
-                stdout=subprocess.PIPE, 
-                stderr=subprocess.PIPE
-            )
-            data, _ = process.communicate(timeout=0.5)
-            
-            if process.returncode == 0 and data and len(data) > 100:
-                # Gera hash dos dados
-                img_hash = hashlib.md5(data).hexdigest()
-                
-                # Verifica se é diferente do último item
-                if img_hash != LAST_ITEM_HASH:
-                    try:
-                        # Converte para PNG
-                        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                        filename = f"img_{timestamp}.png"
-                        path = os.path.join(TEMP_IMAGE_DIR, filename)
-                        
-                        img = Image.open(io.BytesIO(data))
-                        if img.mode not in ('RGBA', 'LA'):
-                            img = img.convert('RGBA')
-                        img.save(path, "PNG")
-                        
-                        # Adiciona ao histórico
-                        self.add_history_item("image", path, img_hash)
-                    except:
-                        pass
-        except:
-            pass
-
-    def add_history_item(self, item_type, content, item_hash):
-        """Adiciona um novo item ao histórico."""
-        global LAST_ITEM_HASH
+        watcher = self.engine.watcher
+        probes, missed = watcher.probes, watcher.missed
+        if self.engine.tick():
+            self.rebuild_menu()
         
+        if self.poller is not None:
+            # Mudanças vistas e perdidas ajustam o intervalo da próxima verificação
+            missed = watcher.missed - missed
+            if missed:
+                STATS.count("clipboard.missed", missed)
+            self.poller.record(watcher.probes > probes, missed, busy=self.ingest.in_flight > 0)
+    
+    def schedule_clipboard_check(self):
+        """Agenda a próxima verificação no intervalo atual do agendador."""
+        from PyObjCTools import AppHelper
+        AppHelper.callLater(self.poller.interval, self.poll_clipboard)
+    
+    def poll_clipboard(self):
         try:
-            # Verifica se já existe um item com esse hash
-            for existing_item in self.history:
-                if existing_item.get("hash") == item_hash:
-                    # Item já existe, não adiciona duplicata
-                    print(f"Item ignorado (duplicado): {item_type}, hash: {item_hash[:8]}")
-                    return
-            
-            # Cria o item
-            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            item = {
-                "type": item_type,
-                "content": content,
-                "timestamp": timestamp,
-                "hash": item_hash
-            }
-            
-            # Adiciona ao início do histórico
-            self.history.insert(0, item)
-            
-            # Remove itens antigos (mais de 7 dias)
-            cutoff = datetime.now() - timedelta(days=7)
-            self.history = [i for i in self.history if 
-                            datetime.strptime(i.get("timestamp", "2000-01-01 00:00:00"), 
-                                            "%Y-%m-%d %H:%M:%S") >= cutoff]
-            
-            # Atualiza o hash global
-            LAST_ITEM_HASH = item_hash
-            
-            # Salva e atualiza o menu
-            self.save_history()
-            self.rebuild_menu()
-            
-            # Log para depuração
-            print(f"Item adicionado ao histórico: {item_type}, hash: {item_hash[:8]}")
-        except Exception as e:
-            print(f"Erro ao adicionar item ao histórico: {e}")
+            self.check_clipboard(None)
+        finally:
+            self.schedule_clipboard_check()
 
 if __name__ == "__main__":
     app = PowerPasteApp()
@@ -0,0 +1,159 @@
+"""
+Política de retenção do histórico: idade, quantidade e bytes.
+
+Os limites valem para o histórico inteiro e, opcionalmente, por tipo de
+item (texto e imagem). O índice guarda, para cada tipo, um OrderedDict
+do item mais antigo ao mais recente com o tamanho de cada um, e mantém
+os totais atualizados a cada inclusão e remoção. Despejar é tirar a
+cabeça de uma dessas filas: O(1) por item, sem percorrer o histórico.
+O item recém-copiado nunca é despejado, mesmo que sozinho passe de uma
+cota.
+"""
+from collections import OrderedDict
+
+DAY = 24 * 60 * 60
+MB = 1024 * 1024
+
+# Limites padrão (None = sem limite); os tamanhos da configuração são em MB
+DEFAULT_RETENTION = {
+    "days": 7,
+    "max_items": 5000,
+    "max_mb": 1024,
+    "text": {"max_items": None, "max_mb": None},
+    "image": {"max_items": 500, "max_mb": 512},
+}
+
+
+def _mb(value):
+    return None if value is None else int(value * MB)
+
+
+class RetentionPolicy:
+    """Limites de retenção; `quotas` é {tipo: (máx. de itens, máx. de bytes)}."""
+
+    def __init__(self, ttl=DEFAULT_RETENTION["days"] * DAY, max_items=None, max_bytes=None,
+                 quotas=None):
+        self.ttl = ttl
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.quotas = dict(quotas or {})
+
+    @classmethod
+    def from_config(cls, config=None):
+        """Cria a política a partir da seção "retention" da configuração."""
+        merged = dict(DEFAULT_RETENTION)
+        merged.update(config or {})
+        quotas = {}
+        for item_type in ("text", "image"):
+            limits = dict(DEFAULT_RETENTION[item_type])
+            limits.update(merged.get(item_type) or {})
+            quotas[item_type] = (limits["max_items"], _mb(limits["max_mb"]))
+        days = merged["days"]
+        return cls(ttl=None if days is None else days * DAY, max_items=merged["max_items"],
+                   max_bytes=_mb(merged["max_mb"]), quotas=quotas)
+
+
+class RetentionIndex:
+    """Itens do histórico por tipo, em ordem cronológica, com os totais."""
+
+    def __init__(self, policy=None):
+        self.policy = policy or RetentionPolicy()
+        self._queues = {}      # tipo -> OrderedDict hash -> (timestamp, bytes)
+        self._type_of = {}     # hash -> tipo
+        self._type_bytes = {}  # tipo -> bytes
+        self.total_bytes = 0
+        self.evicted = 0
+
+    def __len__(self):
+        return len(self._type_of)
+
+    def __contains__(self, item_hash):
+        return item_hash in self._type_of
+
+    def add(self, item_hash, item_type, timestamp, size):
+        """Registra o item como o mais recente do seu tipo."""
+        if item_hash in self._type_of:
+            self.remove(item_hash)
+        queue = self._queues.get(item_type)
+        if queue is None:
+            queue = self._queues[item_type] = OrderedDict()
+        queue[item_hash] = (timestamp, size)
+        self._type_of[item_hash] = item_type
+        self._type_bytes[item_type] = self._type_bytes.get(item_type, 0) + size
+        self.total_bytes += size
+
+    def remove(self, item_hash):
+        """Esquece o item (removido do histórico por outro motivo)."""
+        item_type = self._type_of.pop(item_hash, None)
+        if item_type is None:
+            return
+        _, size = self._queues[item_type].pop(item_hash)
+        self._type_bytes[item_type] -= size
+        self.total_bytes -= size
+
+    def clear(self):
+        self._queues.clear()
+        self._type_of.clear()
+        self._type_bytes.clear()
+        self.total_bytes = 0
+
+    def count(self, item_type):
+        queue = self._queues.get(item_type)
+        return len(queue) if queue else 0
+
+    def bytes(self, item_type):
+        return self._type_bytes.get(item_type, 0)
+
+    def evict(self, now, keep=None):
+        """Retorna os hashes despejados (do mais antigo ao mais novo) para cumprir a política.
+
+        `keep` é o hash do item que acabou de entrar, que nunca é despejado.
+        """
+        policy = self.policy
+        victims = []
+
+        # Idade: a cabeça de cada tipo é o item mais antigo dele
+        if policy.ttl is not None:
+            cutoff = now - policy.ttl
+            for item_type, queue in self._queues.items():
+                while queue:
+                    item_hash, (timestamp, _) = next(iter(queue.items()))
+                    if timestamp >= cutoff or item_hash == keep:
+                        break
+                    victims.append(self._pop(item_type))
+
+        # Cotas por tipo
+        for item_type, (max_items, max_bytes) in policy.quotas.items():
+            queue = self._queues.get(item_type)
+            while queue and ((max_items is not None and len(queue) > max_items)
+                             or (max_bytes is not None and self._type_bytes[item_type] > max_bytes)):
+                if next(iter(queue)) == keep:
+                    break
+                victims.append(self._pop(item_type))
+
+        # Limites globais: o mais antigo entre as cabeças dos tipos
+        while ((policy.max_items is not None and len(self._type_of) > policy.max_items)
+               or (policy.max_bytes is not None and self.total_bytes > policy.max_bytes)):
+            heads = [(next(iter(queue.values()))[0], item_type)
+                     for item_type, queue in self._queues.items()
+                     if queue and next(iter(queue)) != keep]
+            if not heads:
+                break
+            victims.append(self._pop(min(heads)[1]))
+
+        self.evicted += len(victims)
+        return victims
+
+    def usage(self):
+        """Quantidade e bytes por tipo e no total."""
+        report = {item_type: {"items": len(queue), "bytes": self._type_bytes.get(item_type, 0)}
+                  for item_type, queue in self._queues.items()}
+        report["total"] = {"items": len(self._type_of), "bytes": self.total_bytes}
+        return report
+
+    def _pop(self, item_type):
+        item_hash, (_, size) = self._queues[item_type].popitem(last=False)
+        del self._type_of[item_hash]
+        self._type_bytes[item_type] -= size
+        self.total_bytes -= size
+        return item_hash
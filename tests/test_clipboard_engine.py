@@ -0,0 +1,135 @@
+import os
+import time
+
+from clipboard_engine import ClipboardEngine
+from content_hash import content_hash, legacy_hash
+from history_store import HistoryJournal
+from image_ingest import ImageIngest
+from image_store import ImageStore
+from near_duplicates import NearDuplicateIndex
+from pasteboard import ClipboardWatcher, FakePasteboard
+from text_blobs import TextBlobStore
+
+NOW = 1746100000
+
+
+def make_engine(workdir, **options):
+    images = ImageStore(os.path.join(workdir, "images"))
+    pasteboard = FakePasteboard()
+    engine = ClipboardEngine(ClipboardWatcher(pasteboard, hash_images=False),
+                             HistoryJournal(os.path.join(workdir, "history.log")), images,
+                             TextBlobStore(os.path.join(workdir, "blobs")), ImageIngest(images),
+                             clock=lambda: NOW, **options)
+    return engine, pasteboard
+
+
+def wait_for_images(engine):
+    deadline = time.monotonic() + 5
+    while engine.ingest.in_flight and time.monotonic() < deadline:
+        engine.tick()
+        time.sleep(0.01)
+    engine.tick()
+
+
+def test_recopied_legacy_image_replaces_md5_item(tmp_path, capsys):
+    engine, pasteboard = make_engine(str(tmp_path))
+    data = b"\x89PNG\r\n\x1a\n" + os.urandom(4096)
+    # Item gravado por uma versão anterior: hash MD5 e arquivo com outro nome
+    old_path = os.path.join(str(tmp_path), "images", "img_20250501_120000.png")
+    os.makedirs(os.path.dirname(old_path))
+    with open(old_path, "wb") as f:
+        f.write(data)
+    engine.load([{"type": "image", "content": old_path, "hash": legacy_hash(data),
+                  "timestamp": NOW - 60}])
+    assert engine.ingest.legacy_hashes
+
+    pasteboard.set_png(data)
+    engine.tick()
+    wait_for_images(engine)
+
+    assert [item["hash"] for item in engine.history] == [content_hash(data)]
+    engine.close()
+    assert not os.path.exists(old_path)
+    assert [item["hash"] for item in engine.store.load()] == [content_hash(data)]
+
+
+def test_no_legacy_hash_without_legacy_images(tmp_path, capsys):
+    engine, pasteboard = make_engine(str(tmp_path))
+    engine.load([])
+    assert not engine.ingest.legacy_hashes
+    engine.close()
+
+
+def text_items(count):
+    return [{"type": "text", "content": f"anotação número {i} sobre o projeto",
+             "hash": f"b2-{i:032x}", "timestamp": NOW - i} for i in range(count)]
+
+
+def test_search_index_is_built_in_background_and_kept_up_to_date(tmp_path, capsys):
+    engine, pasteboard = make_engine(str(tmp_path))
+    engine.load(text_items(200))
+    assert engine.fuzzy_ready.wait(5)
+    assert engine.search("número 17")[0]["hash"] == f"b2-{17:032x}"
+
+    # Mudanças feitas durante a montagem são reaplicadas na troca
+    with engine.lock:
+        engine.build_fuzzy_index()
+        assert engine.fuzzy is None
+        pasteboard.set_text("lembrete: comprar café")
+        engine.tick()
+        engine.forget(engine.history.remove(f"b2-{17:032x}"))
+    assert engine.fuzzy_ready.wait(5)
+    assert engine.search("comprar cafe")[0]["content"] == "lembrete: comprar café"
+    assert all(item["hash"] != f"b2-{17:032x}" for item in engine.search("número 17"))
+    engine.close()
+
+
+def test_search_uses_store_while_index_is_built(tmp_path, capsys):
+    engine, pasteboard = make_engine(str(tmp_path))
+    engine.store.rewrite(text_items(50))
+    engine.load(engine.store.load())
+    engine.fuzzy_ready.wait(5)
+    with engine.lock:
+        engine.build_fuzzy_index()
+        # A troca espera o lock: o índice ainda não está pronto
+        results = engine.search("número 3 sobre")
+    engine.fuzzy_ready.wait(5)
+    assert results and results[0]["hash"] == f"b2-{3:032x}"
+    engine.close()
+
+
+def test_copies_are_not_blocked_while_index_is_built(tmp_path, capsys):
+    engine, pasteboard = make_engine(str(tmp_path))
+    engine.load(text_items(3000))
+    # O tick segue enquanto o índice é montado; as cópias entram depois da troca
+    copies = 0
+    while not engine.fuzzy_ready.is_set() or copies < 100:
+        pasteboard.set_text(f"cópia durante a montagem {copies}")
+        engine.tick()
+        copies += 1
+        if copies == 1:
+            assert not engine.fuzzy_ready.is_set()
+    assert engine.search("durante a montagem 42")[0]["content"] == "cópia durante a montagem 42"
+    engine.close()
+
+
+def test_near_duplicates_are_indexed_in_background(tmp_path, capsys):
+    engine, pasteboard = make_engine(str(tmp_path), near_duplicates=NearDuplicateIndex())
+    with engine.lock:
+        engine.load(text_items(50))
+        # Montagem em andamento: a cópia quase igual entra sem agrupar
+        assert not engine.duplicates_ready.is_set()
+        engine.add_item("text", "anotação número 7 sobre o projeto!", "b2-new")
+        assert engine.history.get(f"b2-{7:032x}") is not None
+    assert engine.duplicates_ready.wait(5)
+    # Impressões calculadas na montagem, inclusive a do item anotado durante ela
+    assert all("simhash" in item for item in engine.history)
+    assert "b2-new" in engine.near_duplicates
+
+    engine.add_item("text", "anotação número 9 sobre o projeto.", "b2-newer")
+    assert engine.history.get(f"b2-{9:032x}") is None
+    assert engine.near_duplicates.collapsed == 1
+    engine.close()
+
+    reloaded = engine.store.load()
+    assert all("simhash" in item for item in reloaded)
@@ -0,0 +1,119 @@
+import subprocess
+import threading
+import time
+
+import pytest
+
+from command_helper import MAX_START_FAILURES, HelperRunner, default_command
+
+
+@pytest.fixture
+def runner():
+    runner = HelperRunner(command=default_command() + ["--stand-in"])
+    yield runner
+    runner.close()
+
+
+def process_gone(pid, wait=2):
+    # Sem processo ou só esperando ser recolhido (zumbi); o SIGKILL não é instantâneo
+    deadline = time.monotonic() + wait
+    while True:
+        state = subprocess.run(["ps", "-o", "stat=", "-p", str(pid)],
+                               capture_output=True, text=True).stdout.strip()
+        if not state or state.startswith("Z"):
+            return True
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+
+
+def test_pool_reuses_one_helper(runner):
+    for i in range(20):
+        runner.run(["pbcopy"], input=f"texto {i}")
+        assert runner.run(["pbpaste"], text=True).stdout == f"texto {i}"
+    assert runner.spawns == 1
+    assert runner.requests == 40
+    assert runner.restarts == 0
+
+
+def test_concurrent_requests_use_at_most_pool_size(runner):
+    threads = [threading.Thread(target=runner.run, args=(["sleep", "0.2"],), kwargs={"timeout": 5})
+               for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert runner.spawns == runner.size == 2
+    assert len(runner._idle) == 2
+
+
+def test_dead_helper_is_replaced(runner):
+    runner.run(["pbcopy"], input="antes")
+    helper = runner._idle[0]
+    helper.process.kill()
+    helper.process.wait()
+    # O pedido é reenviado a um auxiliar novo
+    assert runner.run(["osascript", "-e", "return 1"], text=True).returncode == 0
+    assert runner.spawns == 2
+    assert runner.restarts == 1
+
+
+def test_timeout_kills_helper_and_its_children(runner, tmp_path):
+    runner.start()
+    helper = runner._idle[0]
+    pid_file = tmp_path / "pid"
+    start = time.monotonic()
+    with pytest.raises(subprocess.TimeoutExpired):
+        # Comando externo: o auxiliar cria um processo e fica esperando
+        runner.run(["sh", "-c", f"echo $$ > {pid_file}; exec sleep 30"], timeout=0.5)
+    assert time.monotonic() - start < 5
+    assert helper.process.poll() is not None
+    assert process_gone(int(pid_file.read_text()))
+    assert runner._alive == 0 and not runner._idle
+
+    # O pedido seguinte inicia outro auxiliar
+    assert runner.run(["pbpaste"]).returncode == 0
+    assert runner.spawns == 2
+    assert runner.restarts == 1
+
+
+def test_falls_back_to_subprocess_after_start_failures(capsys):
+    runner = HelperRunner(command=["false"])
+    try:
+        for _ in range(MAX_START_FAILURES + 2):
+            assert runner.run(["echo", "olá"], text=True).stdout == "olá\n"
+        assert runner.spawns == 0
+        assert runner.failures == MAX_START_FAILURES
+        # Depois do limite, nenhuma nova tentativa de iniciar o auxiliar
+        assert runner._fallback.spawns == MAX_START_FAILURES + 2
+        assert capsys.readouterr().out.count("Erro ao iniciar processo auxiliar") == MAX_START_FAILURES
+    finally:
+        runner.close()
+
+
+def test_closed_runner_closes_helpers(runner):
+    runner.start()
+    helper = runner._idle[0]
+    runner.close()
+    assert helper.process.poll() is not None
+    assert not runner._idle
+
+
+def test_busy_pool_wait_is_bounded_by_timeout():
+    runner = HelperRunner(command=default_command() + ["--stand-in"], size=1)
+    try:
+        runner.start()
+        busy = threading.Thread(target=runner.run, args=(["sleep", "1.5"],), kwargs={"timeout": 5})
+        busy.start()
+        time.sleep(0.1)
+        start = time.monotonic()
+        with pytest.raises(subprocess.TimeoutExpired):
+            runner.run(["pbpaste"], timeout=0.3)
+        assert time.monotonic() - start < 0.8
+        busy.join()
+        # Ninguém foi encerrado: o mesmo auxiliar atende o pedido seguinte
+        assert runner.run(["pbpaste"], timeout=1).returncode == 0
+        assert runner.spawns == 1
+        assert runner.restarts == 0
+    finally:
+        runner.close()
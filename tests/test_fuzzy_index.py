@@ -0,0 +1,63 @@
+import random
+
+from fuzzy_index import MIN_SCORE, TrigramIndex, normalize, trigrams
+
+WORDS = ("pasteboard", "histórico", "relatório", "cópia", "imagem", "busca", "índice",
+         "menu", "arquivo", "projeto", "reunião", "código", "senha", "endereço")
+
+
+def make_text(rng):
+    return " ".join(f"{rng.choice(WORDS)}{rng.randrange(100)}" for _ in range(rng.randint(2, 12)))
+
+
+def expected(texts, order, query, limit=20):
+    """Mesma ordenação do índice, por força bruta: contagem, depois o mais recente."""
+    grams = trigrams(normalize(query))
+    needed = max(1, int(len(grams) * MIN_SCORE + 0.999))
+    scored = []
+    for rank, item_hash in enumerate(order):
+        count = len(grams & trigrams(normalize(texts[item_hash])))
+        if count >= needed:
+            scored.append((-count, -rank, item_hash, count / len(grams)))
+    scored.sort()
+    return [(item_hash, score) for _, _, item_hash, score in scored[:limit]]
+
+
+def test_query_matches_brute_force_after_adds_and_removes():
+    rng = random.Random(7)
+    index = TrigramIndex()
+    texts, order = {}, []
+    # Poucos hashes e muitas mudanças: passa por várias renumerações
+    for step in range(8000):
+        if rng.random() < 0.6 or not texts:
+            item_hash = f"h{rng.randrange(300)}"
+            text = texts.get(item_hash) or make_text(rng)
+            texts[item_hash] = text
+            index.add(item_hash, text)
+            if item_hash in order:
+                order.remove(item_hash)
+            order.append(item_hash)
+        else:
+            item_hash = rng.choice(order)
+            order.remove(item_hash)
+            index.remove(item_hash, texts.pop(item_hash))
+        if step % 1000 == 0:
+            index.warm(64)
+        if step % 40 == 0:
+            text = texts[rng.choice(order)]
+            begin = rng.randrange(max(1, len(text) - 10))
+            query = text[begin:begin + rng.randint(4, 10)]
+            assert index.query(query) == expected(texts, order, query)
+    assert len(index) == len(texts)
+    assert index._next_id <= 2 * len(texts) + 1025
+
+
+def test_items_without_matches_are_not_returned():
+    index = TrigramIndex()
+    # Cada item tem 3 dos 9 trigramas de "abcdefgh"; a busca pede 5
+    for item_hash, text in (("a", "abc"), ("b", "bcdef"), ("c", "zefgh"), ("d", "sem nada")):
+        index.add(item_hash, text)
+    index.add("e", "qualquer")
+    index.remove("e", "qualquer")
+    assert index.query("abcdefgh") == []
+    assert [item_hash for item_hash, _ in index.query("bcdef")] == ["b"]
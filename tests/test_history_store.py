@@ -0,0 +1,76 @@
+import os
+
+from history_store import HistoryJournal
+
+NOW = 1746100000
+
+
+def text_item(name):
+    return {"type": "text", "content": f"texto {name}", "hash": f"b2-{name}", "timestamp": NOW}
+
+
+def hashes(items):
+    return [item["hash"] for item in items]
+
+
+def tear_last_write(path, keep):
+    """Simula uma queda no meio da gravação: só `keep` bytes do último registro."""
+    with open(path, 'rb') as f:
+        data = f.read()
+    last = data.rstrip(b'\n').rfind(b'\n') + 1
+    with open(path, 'wb') as f:
+        f.write(data[:last + keep])
+
+
+def test_append_after_torn_write_survives_reload(tmp_path, capsys):
+    path = os.path.join(str(tmp_path), "history.log")
+    journal = HistoryJournal(path)
+    journal.load()
+    journal.append(text_item("a"))
+    journal.append(text_item("b"))
+    journal.close()
+    tear_last_write(path, 10)
+
+    journal = HistoryJournal(path)
+    assert hashes(journal.load()) == ["b2-a"]
+    journal.append(text_item("c"))
+    journal.close()
+
+    journal = HistoryJournal(path)
+    assert hashes(journal.load()) == ["b2-c", "b2-a"]
+    journal.close()
+    with open(path, 'rb') as f:
+        assert f.read().endswith(b'\n')
+
+
+def test_torn_header_starts_a_new_log(tmp_path, capsys):
+    path = os.path.join(str(tmp_path), "history.log")
+    with open(path, 'wb') as f:
+        f.write(b'{"op":"ba')
+    journal = HistoryJournal(path)
+    assert journal.load() == []
+    journal.append(text_item("a"))
+    journal.close()
+
+    journal = HistoryJournal(path)
+    assert hashes(journal.load()) == ["b2-a"]
+    journal.close()
+
+
+def test_torn_write_after_compaction(tmp_path, capsys):
+    path = os.path.join(str(tmp_path), "history.log")
+    journal = HistoryJournal(path)
+    journal.load()
+    journal.rewrite([text_item("b"), text_item("a")])
+    journal.append(text_item("c"))
+    journal.close()
+    tear_last_write(path, 5)
+
+    journal = HistoryJournal(path)
+    assert hashes(journal.load()) == ["b2-b", "b2-a"]
+    journal.append(text_item("d"))
+    journal.close()
+
+    journal = HistoryJournal(path)
+    assert hashes(journal.load()) == ["b2-d", "b2-b", "b2-a"]
+    journal.close()
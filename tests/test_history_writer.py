@@ -0,0 +1,57 @@
+import os
+
+from clipboard_engine import ClipboardEngine
+from history_store import HistoryJournal, HistoryWriter
+from image_ingest import ImageIngest
+from image_store import ImageStore
+from pasteboard import ClipboardWatcher, FakePasteboard
+from text_blobs import TextBlobStore
+
+COPIES = 1000
+
+
+def make_engine(workdir, debounce=0.5):
+    journal = HistoryJournal(os.path.join(workdir, "history.log"))
+    writer = HistoryWriter(journal, debounce=debounce)
+    pasteboard = FakePasteboard()
+    images = ImageStore(os.path.join(workdir, "images"))
+    engine = ClipboardEngine(ClipboardWatcher(pasteboard, hash_images=False), writer, images,
+                             TextBlobStore(os.path.join(workdir, "blobs")), ImageIngest(images),
+                             clock=lambda: 1746100000)
+    return engine, pasteboard, journal, writer
+
+
+def copy_burst(engine, pasteboard, count):
+    hashes = []
+    for i in range(count):
+        pasteboard.set_text(f"cópia número {i} da rajada")
+        assert engine.tick()
+        hashes.append(engine.history.newest(1)[0]["hash"])
+    return hashes
+
+
+def test_burst_is_written_in_a_few_batches(tmp_path, capsys):
+    engine, pasteboard, journal, writer = make_engine(str(tmp_path))
+    hashes = copy_burst(engine, pasteboard, COPIES)
+    engine.close()
+    # Uma gravação por janela de agrupamento, não uma por cópia
+    assert 1 <= journal.writes <= 10, journal.writes
+    reloaded = HistoryJournal(journal.path).load()
+    assert [item["hash"] for item in reloaded] == hashes[::-1]
+
+
+def test_flush_persists_queued_items(tmp_path, capsys):
+    # Janela longa: nada seria gravado sem o flush
+    engine, pasteboard, journal, writer = make_engine(str(tmp_path), debounce=60)
+    hashes = copy_burst(engine, pasteboard, 50)
+    writer.flush()
+    assert journal.writes == 1
+    assert [item["hash"] for item in HistoryJournal(journal.path).load()] == hashes[::-1]
+
+    # Recópia e remoção ainda na fila: o close grava as duas
+    pasteboard.set_text("cópia número 3 da rajada")
+    engine.tick()
+    engine.forget(engine.history.remove(hashes[10]))
+    engine.close()
+    expected = [hashes[3]] + [h for h in hashes[::-1] if h not in (hashes[3], hashes[10])]
+    assert [item["hash"] for item in HistoryJournal(journal.path).load()] == expected
@@ -0,0 +1,93 @@
+import random
+
+from history_model import History
+from menu_model import (TITLE_DISAMBIGUATOR, FakeMenu, FakeMenuItem, HistoryMenu,
+                        fake_item_factory, history_entries)
+
+LABELS = {"processing": "processando", "image": "imagem", "unknown": "?"}
+FIXED = ("separator", "clear", "quit")
+VISIBLE = 20
+
+
+def make_item(n, timestamp):
+    # Prévias repetidas de propósito: títulos iguais precisam de chaves diferentes
+    return {"type": "text", "content": f"texto {n % 7}", "hash": f"b2-{n:032x}", "timestamp": timestamp}
+
+
+def make_menu(history):
+    menu = FakeMenu()
+    model = HistoryMenu(menu, fake_item_factory, "vazio")
+    model.build(history_entries(history.newest(VISIBLE), LABELS))
+    for title in FIXED:
+        menu.add(FakeMenuItem(title))
+    menu.ops = dict.fromkeys(menu.ops, 0)
+    return menu, model
+
+
+def shown(menu):
+    """(hash, título) de cada item do histórico no menu, na ordem do menu."""
+    keys = menu.keys()[:-len(FIXED)]
+    return [(menu[key]._hash, key.rstrip(TITLE_DISAMBIGUATOR)) for key in keys]
+
+
+def expected(history):
+    return [(item_hash, title) for item_hash, title, _ in
+            history_entries(history.newest(VISIBLE), LABELS)]
+
+
+def test_menu_matches_entries_after_random_changes():
+    rng = random.Random(7)
+    clock = 1746100000
+    history = History(make_item(n, clock - n * 60) for n in range(40))
+    menu, model = make_menu(history)
+    next_id = 40
+    for _ in range(300):
+        clock += 60
+        action = rng.random()
+        if action < 0.4:
+            history.add(make_item(next_id, clock))
+            next_id += 1
+        elif action < 0.7 and len(history):
+            # Recópia: o item volta ao topo com outro horário
+            item = rng.choice(list(history))
+            item["timestamp"] = clock
+            history.add(item)
+        elif len(history) > 1:
+            history.remove(rng.choice(list(history))["hash"])
+        model.update(history_entries(history.newest(VISIBLE), LABELS))
+        assert shown(menu) == expected(history)
+    # Os itens fixos continuam no fim, na ordem original
+    assert menu.keys()[-len(FIXED):] == list(FIXED)
+
+
+def test_recopy_moves_one_item():
+    clock = 1746100000
+    history = History(make_item(n, clock - n * 60) for n in range(VISIBLE))
+    menu, model = make_menu(history)
+    for n in (5, 19, 1):
+        item = history.get(f"b2-{n:032x}")
+        item["timestamp"] = clock + n
+        history.add(item)
+        menu.ops = dict.fromkeys(menu.ops, 0)
+        model.update(history_entries(history.newest(VISIBLE), LABELS))
+        assert menu.ops == {"add": 0, "insert": 1, "remove": 1, "clear": 0}
+        assert shown(menu) == expected(history)
+
+
+def test_new_copy_on_full_menu_inserts_and_drops_one():
+    clock = 1746100000
+    history = History(make_item(n, clock - n * 60) for n in range(VISIBLE + 5))
+    menu, model = make_menu(history)
+    history.add(make_item(100, clock + 60))
+    model.update(history_entries(history.newest(VISIBLE), LABELS))
+    assert menu.ops == {"add": 0, "insert": 1, "remove": 1, "clear": 0}
+    assert shown(menu) == expected(history)
+
+
+def test_empty_history_shows_placeholder():
+    history = History(make_item(n, 1746100000 - n) for n in range(3))
+    menu, model = make_menu(history)
+    for item in list(history):
+        history.remove(item["hash"])
+    model.update(history_entries(history.newest(VISIBLE), LABELS))
+    assert menu.keys() == ["vazio", *FIXED]
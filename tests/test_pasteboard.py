@@ -0,0 +1,39 @@
+import pytest
+
+from pasteboard import ClipboardWatcher, FakePasteboard, PasteboardBackend
+
+PNG = b"\x89PNG\r\n\x1a\n" + bytes(range(256))
+
+
+def test_same_text_after_image_is_seen_again():
+    for hash_images in (False, True):
+        pasteboard = FakePasteboard()
+        watcher = ClipboardWatcher(pasteboard, hash_images=hash_images)
+        pasteboard.set_text("texto A")
+        assert watcher.poll().kind == "text"
+        pasteboard.set_png(PNG)
+        assert watcher.poll().kind == "image"
+        pasteboard.set_text("texto A")
+        change = watcher.poll()
+        assert change is not None and change.data == "texto A"
+
+
+def test_same_text_copied_twice_in_a_row_is_ignored():
+    pasteboard = FakePasteboard()
+    watcher = ClipboardWatcher(pasteboard, hash_images=False)
+    pasteboard.set_text("texto A")
+    assert watcher.poll() is not None
+    pasteboard.set_text("texto A")
+    assert watcher.poll() is None
+
+
+def test_incomplete_backend_fails_when_created():
+    class NoText(PasteboardBackend):
+        def change_count(self):
+            return 0
+
+        def read_png(self):
+            return None
+
+    with pytest.raises(TypeError):
+        NoText()
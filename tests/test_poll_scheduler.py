@@ -0,0 +1,80 @@
+import random
+
+import pytest
+
+from pasteboard import ClipboardWatcher, FakePasteboard
+from poll_scheduler import AdaptivePoller
+
+
+def copy_times(seed, hours, idle_minutes, burst=6, gap_min=0.2, gap_max=3.0):
+    """Rajadas de cópias separadas por pausas, como em `benchmark.py polling`."""
+    rng = random.Random(seed)
+    copies = []
+    now = 0.0
+    while True:
+        now += rng.expovariate(1 / (idle_minutes * 60))
+        if now >= hours * 3600:
+            return copies
+        for _ in range(rng.randint(1, burst)):
+            copies.append(now)
+            now += rng.uniform(gap_min, gap_max)
+
+
+def simulate(copies, hours, adaptive):
+    pasteboard = FakePasteboard()
+    watcher = ClipboardWatcher(pasteboard)
+    clock = [0.0]
+    poller = AdaptivePoller(clock=lambda: clock[0]) if adaptive else None
+    interval = 1.0 if poller is None else poller.interval
+    index = seen = 0
+    while clock[0] < hours * 3600:
+        clock[0] += interval
+        while index < len(copies) and copies[index] <= clock[0]:
+            pasteboard.set_text(f"cópia número {index}")
+            index += 1
+        missed = watcher.missed
+        change = watcher.poll()
+        if change is not None:
+            seen += 1
+        if poller is not None:
+            interval = poller.record(change is not None, watcher.missed - missed)
+    return watcher.ticks, len(copies) - seen
+
+
+@pytest.mark.parametrize("idle_minutes", [3, 10, 30])
+def test_adaptive_polling_checks_less_without_losing_more(idle_minutes):
+    # Vários dias inteiros: em poucas horas as cópias perdidas variam demais
+    fixed_ticks = fixed_lost = ticks = lost = 0
+    for seed in range(8):
+        copies = copy_times(seed, 24, idle_minutes)
+        result = simulate(copies, 24, adaptive=False)
+        fixed_ticks, fixed_lost = fixed_ticks + result[0], fixed_lost + result[1]
+        result = simulate(copies, 24, adaptive=True)
+        ticks, lost = ticks + result[0], lost + result[1]
+    assert ticks < fixed_ticks * 0.95
+    assert lost <= fixed_lost
+
+
+def test_benchmark_day_checks_less_without_losing_more():
+    # Mesmo dia de `benchmark.py polling` (semente 42, 8 h)
+    copies = copy_times(42, 8, 10)
+    fixed_ticks, fixed_lost = simulate(copies, 8, adaptive=False)
+    ticks, lost = simulate(copies, 8, adaptive=True)
+    assert ticks < fixed_ticks * 0.8
+    assert lost <= fixed_lost
+
+
+def test_interval_backs_off_to_ceilings():
+    clock = [0.0]
+    poller = AdaptivePoller(clock=lambda: clock[0])
+    assert poller.record(changed=True) == poller.min_interval
+    intervals = []
+    while clock[0] < 120:
+        clock[0] += poller.interval
+        intervals.append((clock[0], poller.record(changed=False)))
+    assert max(i for t, i in intervals if t < poller.deep_idle_seconds) == poller.idle_interval
+    assert intervals[-1][1] == poller.max_interval
+
+
+def test_disabled_in_config():
+    assert AdaptivePoller.from_config({"enabled": False}) is None
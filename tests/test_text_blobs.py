@@ -0,0 +1,41 @@
+import os
+
+from history_store import HistoryJournal, HistoryWriter
+from text_blobs import TextBlobStore
+
+TEXT = "início çã " + "x" * 100000
+
+
+def test_read_limit_and_full(tmp_path):
+    blobs = TextBlobStore(str(tmp_path))
+    assert blobs.write("b2-a", TEXT) == len(TEXT.encode('utf-8'))
+    assert blobs.read("b2-a") == TEXT
+    # Corte no meio de um caractere acentuado: o pedaço é descartado
+    assert blobs.read("b2-a", limit=11) == "início ç"
+
+
+def test_scheduled_writes_follow_queue_order(tmp_path):
+    journal = HistoryJournal(str(tmp_path / "history.log"))
+    writer = HistoryWriter(journal, debounce=60)
+    blobs = TextBlobStore(str(tmp_path / "blobs"), schedule=writer.call)
+    path = blobs.path_for("b2-a")
+
+    blobs.write("b2-a", TEXT)
+    # Ainda na fila: a leitura vem da memória
+    assert not os.path.exists(path)
+    assert blobs.exists("b2-a")
+    assert blobs.read("b2-a", limit=7) == "início"
+    writer.flush()
+    assert os.path.exists(path)
+    assert blobs.read("b2-a") == TEXT
+
+    # Apagado e copiado de novo antes da gravação: o arquivo continua lá
+    blobs.delete("b2-a")
+    blobs.write("b2-a", TEXT)
+    writer.flush()
+    assert blobs.read("b2-a") == TEXT
+
+    blobs.delete("b2-a")
+    writer.flush()
+    assert not blobs.exists("b2-a")
+    writer.close()
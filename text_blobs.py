@@ -0,0 +1,131 @@
+"""
+Armazenamento fora de linha dos textos grandes.
+
+Textos acima de TEXT_BLOB_THRESHOLD caracteres são gravados em arquivos
+próprios (<hash>.txt). O item do histórico guarda só a prévia e os
+metadados; o corpo é lido por mmap apenas quando o usuário seleciona o
+item, e só o trecho pedido é copiado para fora do mapeamento.
+
+Com `schedule` (a fila do HistoryWriter), gravações e remoções rodam na
+thread de gravação, na mesma ordem das mutações do histórico: o arquivo
+é gravado antes do registro que aponta para ele. Até lá o corpo fica em
+memória e as leituras vêm de lá.
+"""
+import itertools
+import mmap
+import os
+import threading
+
+# Tamanho (em caracteres) a partir do qual o texto sai do histórico
+TEXT_BLOB_THRESHOLD = 64 * 1024
+
+
+class TextBlobStore:
+    """Diretório com o corpo dos textos grandes, um arquivo por item."""
+
+    def __init__(self, directory, threshold=TEXT_BLOB_THRESHOLD, schedule=None):
+        self.directory = directory
+        self.threshold = threshold
+        # schedule(função): executa a função na thread de gravação (None = na hora)
+        self.schedule = schedule
+        self._pending = {}  # hash -> (versão, bytes) ainda não gravados
+        self._versions = itertools.count()
+        self._lock = threading.Lock()
+
+    def path_for(self, item_hash):
+        return os.path.join(self.directory, f"{item_hash}.txt")
+
+    def should_store(self, text):
+        return len(text) > self.threshold
+
+    def write(self, item_hash, text):
+        """Grava (ou agenda a gravação do) corpo do texto e retorna o tamanho em bytes."""
+        data = text.encode('utf-8')
+        if self.schedule is None:
+            self._write_file(item_hash, data)
+            return len(data)
+        entry = (next(self._versions), data)
+        with self._lock:
+            self._pending[item_hash] = entry
+        self.schedule(lambda: self._store(item_hash, entry))
+        return len(data)
+
+    def _store(self, item_hash, entry):
+        # Roda na thread de gravação
+        with self._lock:
+            if self._pending.get(item_hash) is not entry:
+                # Apagado ou gravado de novo depois: a operação seguinte cuida dele
+                return
+        self._write_file(item_hash, entry[1])
+        with self._lock:
+            if self._pending.get(item_hash) is entry:
+                del self._pending[item_hash]
+
+    def _write_file(self, item_hash, data):
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path_for(item_hash)
+        if not os.path.exists(path):
+            tmp_path = path + '.tmp'
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+
+    def read(self, item_hash, limit=None):
+        """Lê o corpo (ou só os primeiros `limit` bytes) via mmap."""
+        with self._lock:
+            entry = self._pending.get(item_hash)
+        if entry is not None:
+            return entry[1][:limit].decode('utf-8', 'ignore')
+        with open(self.path_for(item_hash), 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return ""
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm, memoryview(mm) as view:
+                # Decodifica direto do mapeamento, sem copiar o arquivo para bytes
+                return str(view[:limit], 'utf-8', 'ignore')
+
+    def exists(self, item_hash):
+        with self._lock:
+            if item_hash in self._pending:
+                return True
+        return os.path.exists(self.path_for(item_hash))
+
+    def delete(self, item_hash):
+        with self._lock:
+            self._pending.pop(item_hash, None)
+        if self.schedule is None:
+            self._remove(item_hash)
+        else:
+            self.schedule(lambda: self._remove(item_hash))
+
+    def _remove(self, item_hash):
+        with self._lock:
+            if item_hash in self._pending:
+                # Copiado de novo depois de apagado: a gravação agendada vem em seguida
+                return
+        try:
+            os.remove(self.path_for(item_hash))
+        except OSError:
+            pass
+
+    def rebuild(self, items):
+        """Apaga arquivos que não pertencem a nenhum item do histórico."""
+        if not os.path.isdir(self.directory):
+            return 0
+        referenced = {f"{item['hash']}.txt" for item in items if item.get("blob")}
+        removed = 0
+        for name in os.listdir(self.directory):
+            if name not in referenced:
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                    removed += 1
+                except OSError:
+                    pass
+        return removed
+
+    def clear(self):
+        with self._lock:
+            self._pending.clear()
+        if self.schedule is None:
+            self.rebuild(())
+        else:
+            self.schedule(lambda: self.rebuild(()))
@@ -0,0 +1,149 @@
+"""
+Miniaturas das imagens do histórico.
+
+As miniaturas são geradas uma vez, no processamento da imagem, usando os
+atalhos do Pillow (draft/reduce) para não decodificar a imagem inteira em
+resolução máxima. Ficam em um cache LRU em disco limitado por tamanho; o
+menu usa um LRU em memória só com as miniaturas visíveis.
+"""
+import os
+import threading
+from collections import OrderedDict
+
+# Tamanho gerado em disco (o dobro do exibido, para telas Retina)
+THUMBNAIL_SIZE = (64, 64)
+# Limite do cache em disco
+THUMBNAIL_CACHE_BYTES = 20 * 1024 * 1024
+
+
+def make_thumbnail(src_path, dst_path, size=THUMBNAIL_SIZE):
+    """Gera uma miniatura PNG de `src_path` em `dst_path`."""
+    from PIL import Image
+    with Image.open(src_path) as img:
+        # JPEG: decodifica direto em escala reduzida
+        img.draft('RGB', (size[0] * 2, size[1] * 2))
+        # Demais formatos: redução inteira, bem mais barata que o resample
+        factor = min(img.width // (size[0] * 2), img.height // (size[1] * 2))
+        if factor > 1:
+            img = img.reduce(factor)
+        img.thumbnail(size)
+        if img.mode not in ('RGBA', 'RGB'):
+            img = img.convert('RGBA')
+        img.save(dst_path, "PNG")
+
+
+class ThumbnailCache:
+    """Cache LRU de miniaturas em disco, limitado pelo total de bytes."""
+
+    def __init__(self, directory, max_bytes=THUMBNAIL_CACHE_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # hash -> tamanho, do menos ao mais usado
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        if not os.path.isdir(self.directory):
+            return
+        files = []
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and entry.name.endswith('.png'):
+                stat = entry.stat()
+                files.append((stat.st_mtime, entry.name[:-4], stat.st_size))
+        # Ordem de uso aproximada pela data de modificação
+        for _, image_hash, size in sorted(files):
+            self._entries[image_hash] = size
+            self._bytes += size
+
+    def path_for(self, image_hash):
+        return os.path.join(self.directory, f"{image_hash}.png")
+
+    @property
+    def total_bytes(self):
+        return self._bytes
+
+    def get(self, image_hash):
+        """Retorna o caminho da miniatura (marcando como usada) ou None."""
+        with self._lock:
+            if image_hash not in self._entries:
+                return None
+            self._entries.move_to_end(image_hash)
+        path = self.path_for(image_hash)
+        try:
+            # Mantém a ordem de uso entre execuções
+            os.utime(path)
+        except OSError:
+            with self._lock:
+                self._bytes -= self._entries.pop(image_hash, 0)
+            return None
+        return path
+
+    def generate(self, image_hash, src_path):
+        """Gera a miniatura de `src_path` se ainda não estiver no cache."""
+        with self._lock:
+            if image_hash in self._entries:
+                return self.path_for(image_hash)
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path_for(image_hash)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            make_thumbnail(src_path, tmp_path)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        size = os.path.getsize(path)
+        with self._lock:
+            self._bytes -= self._entries.pop(image_hash, 0)
+            self._entries[image_hash] = size
+            self._bytes += size
+            self._evict()
+        return path
+
+    def clear(self):
+        with self._lock:
+            for image_hash in list(self._entries):
+                try:
+                    os.remove(self.path_for(image_hash))
+                except OSError:
+                    pass
+            self._entries.clear()
+            self._bytes = 0
+
+    def _evict(self):
+        # Deve ser chamado com o lock adquirido
+        while self._bytes > self.max_bytes and len(self._entries) > 1:
+            image_hash, size = self._entries.popitem(last=False)
+            self._bytes -= size
+            try:
+                os.remove(self.path_for(image_hash))
+            except OSError:
+                pass
+
+
+class MemoryLRU:
+    """Cache LRU em memória com capacidade fixa; `loader(chave)` cria os valores."""
+
+    def __init__(self, capacity, loader):
+        self.capacity = capacity
+        self.loader = loader
+        self._values = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        if key in self._values:
+            self._values.move_to_end(key)
+            self.hits += 1
+            return self._values[key]
+        self.misses += 1
+        value = self.loader(key)
+        if value is not None:
+            self._values[key] = value
+            if len(self._values) > self.capacity:
+                self._values.popitem(last=False)
+        return value
+
+    def clear(self):
+        self._values.clear()